@@ -50,9 +50,9 @@ class BMP180Driver:
         self._AC1 = unpack(">h", raw_data[0:2])[0]
         self._AC2 = unpack(">h", raw_data[2:4])[0]
         self._AC3 = unpack(">h", raw_data[4:6])[0]
-        self._AC4 = unpack(">h", raw_data[6:8])[0]
-        self._AC5 = unpack(">h", raw_data[8:10])[0]
-        self._AC6 = unpack(">h", raw_data[10:12])[0]
+        self._AC4 = unpack(">H", raw_data[6:8])[0]     # AC4~AC6 are unsigned
+        self._AC5 = unpack(">H", raw_data[8:10])[0]
+        self._AC6 = unpack(">H", raw_data[10:12])[0]
         self._B1 = unpack(">h", raw_data[12:14])[0]
         self._B2 = unpack(">h", raw_data[14:16])[0]
         self._MB = unpack(">h", raw_data[16:18])[0]
@@ -91,7 +91,8 @@ class BMP180Driver:
 
         byte_data = self.i2c.readfrom_mem(self.address, 0xF6, 3)
 
-        return unpack(">h", byte_data)[0] >> (8 - over_sample_setting_flag)
+        # MSB, LSB and XLSB. Result is 16 to 19 bits by over-sampling setting
+        return ((byte_data[0] << 16) | (byte_data[1] << 8) | byte_data[2]) >> (8 - over_sample_setting_flag)
 
 
     def get_temperature(self) -> float:
@@ -147,6 +148,6 @@ class BMP180Driver:
         X1 = ( (p >> 8) * (p >> 8) * 3038 ) >> 16
         X2 = (-7357 * p) >> 16
 
-        return ( p + (X1 + X2 + 3791) ) >> 4
+        return p + ( (X1 + X2 + 3791) >> 4 )
 
 
@@ -95,14 +95,17 @@ class GPIO4_HAL(General_HAL):
             'DB7': DB7
         }
 
-    def init_manually(self) -> None:
+    def init_manually(self, is_powered:bool = False) -> None:
         """
         **Initialization HD44780 in 4pin mode**
 
         Inner reset circuit will work if the power conditions correctly, if not sure that always init manually
         before run.
+        :param is_powered: True is skipping the wait after Vcc, when it's already waited, like by
+        lcd_async.async_init().
         """
-        sleep_ms(40)  # wait more than 40ms after Vcc to 2.7V
+        if not is_powered:
+            sleep_ms(40)  # wait more than 40ms after Vcc to 2.7V
 
         self.write_4bit(RS_level=0,
                          DB7_level=0,
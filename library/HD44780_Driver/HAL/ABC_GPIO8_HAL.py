@@ -102,14 +102,17 @@ class GPIO8_HAL(General_HAL):
             'DB7': DB7
         }
 
-    def init_manually(self) -> None:
+    def init_manually(self, is_powered:bool = False) -> None:
         """
         **Initialization by instructions in 8pins**
 
         Inner reset circuit will work if the power conditions correctly,
         but if not that must reset manually by instructions.
+        :param is_powered: True is skipping the wait after Vcc, when it's already waited, like by
+        lcd_async.async_init().
         """
-        sleep_ms(40)    # wait for more than 40ms after Vcc to 2.7V
+        if not is_powered:
+            sleep_ms(40)    # wait for more than 40ms after Vcc to 2.7V
 
         self.write_8bit(RS_level=0,
                          DB7_level=0,
@@ -126,7 +126,7 @@ class HD44780_Driver:
         """
         data = self.board.read(RS_level=0, delay_cycles=0)
         busy_flag = bool(data & 0x80)
-        address = data << 1
+        address = data & 0x7F     # DB6~DB0
         return busy_flag, address
 
     def write_data_to_ram(self, data: int) -> None:
@@ -0,0 +1,235 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**Async front end of lcd_api**
+
+Commands are queued in a bounded ring buffer and one writer task runs them in batches, so the
+coroutines that update the display won't wait for the bus. All commands are run in the order they
+are queued, which means no cursor race between tasks.
+"""
+
+from .lcd_1602_api import lcd_api
+from array import array
+from asyncio import Event, sleep
+from micropython import const
+from time import ticks_us
+
+_OP_MOVE = const(0)
+_OP_PRINT = const(1)
+_OP_BYTES = const(2)
+_OP_CUSTOM_CHAR = const(3)
+_OP_CHAR_ROWS = const(4)
+_OP_CLEAR = const(5)
+_OP_HOME = const(6)
+_OP_SHIFT = const(7)
+_OP_BACKLIGHT = const(8)
+
+
+class lcd_async:
+    """
+    **Async front end of lcd_api**
+
+    Use it as an lcd_api and run lcd_async.async_run() as a task. Only commands below are queued,
+    for others use lcd_async.api directly after flush().
+
+    Redundant commands are coalesced: continuous cursor_move_to() keeps only the last one, and a
+    write_custom_char_rows() replaces the queued one of the same index. If the queue is full, queued
+    commands are run at once.
+    """
+
+    api:lcd_api = None
+    batch:int = 8
+
+    on_batch = None
+    """**Function on_batch(start_us, commands) called after every batch of writer task.** start_us is
+    ticks_us() before the batch. None is not measuring."""
+
+    _ops:bytearray = None
+    _args:array = None
+    _objs:list = None
+    _head:int = 0
+    _count:int = 0
+
+    _data:bytearray = None
+    _data_head:int = 0
+
+    _event:Event = None
+
+    def __init__(self, api:lcd_api, size:int = 32, data_size:int = 64, batch:int = 8) -> None:
+        """
+        **Constructor of async front end**
+
+        :param api: lcd_api object to run commands.
+        :param size: max commands queued.
+        :param data_size: bytes to copy content of print_bytes().
+        :param batch: commands run by writer task before yielding to other tasks.
+        """
+        self.api = api
+        self.batch = batch
+
+        self._ops = bytearray(size)
+        self._args = array('H', bytes(4 * size))
+        self._objs = [None] * size
+        self._data = bytearray(data_size)
+        self._event = Event()
+
+
+    def _push(self, op:int, a:int = 0, b:int = 0, obj = None) -> None:
+        size = len(self._ops)
+        if self._count == size:
+            self.flush()
+
+        i = (self._head + self._count) % size
+        self._ops[i] = op
+        self._args[i << 1] = a
+        self._args[(i << 1) + 1] = b
+        self._objs[i] = obj
+        self._count += 1
+
+        self._event.set()
+
+
+    def _last(self) -> int:
+        """
+        :return: ring index of last queued command, or -1 if empty.
+        """
+        if self._count == 0: return -1
+        return (self._head + self._count - 1) % len(self._ops)
+
+
+    def _run_one(self) -> None:
+        i = self._head
+        op = self._ops[i]
+        a = self._args[i << 1]
+        b = self._args[(i << 1) + 1]
+        obj = self._objs[i]
+        self._objs[i] = None
+
+        self._head = (i + 1) % len(self._ops)
+        self._count -= 1
+
+        if op == _OP_MOVE: self.api.cursor_move_to(a, b)
+        elif op == _OP_PRINT: self.api.print(obj, bool(b))
+        elif op == _OP_BYTES: self.api.print_bytes(self._data, a, a + b)
+        elif op == _OP_CUSTOM_CHAR: self.api.print_custom_char(a, bool(b))
+        elif op == _OP_CHAR_ROWS: self.api.write_custom_char_rows(obj, a, b)
+        elif op == _OP_CLEAR: self.api.clear()
+        elif op == _OP_HOME: self.api.cursor_to_home()
+        elif op == _OP_SHIFT:
+            if a: self.api.content_move_right()
+            else: self.api.content_move_left()
+        elif op == _OP_BACKLIGHT: self.api.turn_on_backlight_or_off(bool(a))
+
+        if self._count == 0:
+            self._data_head = 0     # all copied content is printed
+
+
+    def flush(self, limit:int = -1) -> None:
+        """
+        **Run queued commands now**
+
+        :param limit: max commands to run. -1 is all.
+        """
+        while self._count > 0 and limit != 0:
+            self._run_one()
+            limit -= 1
+
+
+    def pending(self) -> int:
+        """
+        :return: count of queued commands.
+        """
+        return self._count
+
+
+    async def async_init(self) -> None:
+        """
+        **Initialize HD44780 of an lcd_api constructed with is_init=False**
+
+        The wait after Vcc is awaited instead of blocking, so other tasks like initializing sensors run
+        meanwhile. Commands queued before are kept, start the writer task after it returns.
+        """
+        await sleep(0.04)  # wait more than 40ms after Vcc to 2.7V
+        self.api.init(is_powered=True)
+
+
+    async def async_run(self) -> None:
+        """
+        **Writer task, run queued commands forever**
+        """
+        while True:
+            await self._event.wait()
+            self._event.clear()
+
+            while self._count > 0:
+                if self.on_batch is None:
+                    self.flush(self.batch)
+                else:
+                    start, count = ticks_us(), self._count
+                    self.flush(self.batch)
+                    self.on_batch(start, count - self._count)
+
+                await sleep(0)
+
+
+    def cursor_move_to(self, row:int, col:int) -> None:
+        last = self._last()
+        if last >= 0 and self._ops[last] == _OP_MOVE:   # the last move is no use
+            self._args[last << 1] = row
+            self._args[(last << 1) + 1] = col
+            return
+
+        self._push(_OP_MOVE, row, col)
+
+    def print(self, content:str, auto_return:bool = False) -> None:
+        self._push(_OP_PRINT, 0, 1 if auto_return else 0, content)
+
+    def print_bytes(self, content:bytes, start:int = 0, end:int|None = None) -> None:
+        """
+        Content is copied, so the buffer could be reused at once.
+        """
+        end = len(content) if end is None else end
+        length = end - start
+
+        if self._count == len(self._ops) or self._data_head + length > len(self._data):
+            self.flush()    # data area is reset after all printed
+            if length > len(self._data):
+                self.api.print_bytes(content, start, end)
+                return
+
+        offset = self._data_head
+        for i in range(length):
+            self._data[offset + i] = content[start + i]
+        self._data_head += length
+
+        self._push(_OP_BYTES, offset, length)
+
+    def print_custom_char(self, index:int, auto_return:bool = False) -> None:
+        self._push(_OP_CUSTOM_CHAR, index, 1 if auto_return else 0)
+
+    def write_custom_char_rows(self, rows:bytes, index:int, offset:int = 0) -> None:
+        size = len(self._ops)
+        for n in range(self._count):
+            i = (self._head + n) % size
+            if self._ops[i] == _OP_CHAR_ROWS and self._args[i << 1] == index:  # superseded upload
+                self._args[(i << 1) + 1] = offset
+                self._objs[i] = rows
+                return
+
+        self._push(_OP_CHAR_ROWS, index, offset, rows)
+
+    def clear(self) -> None:
+        self._push(_OP_CLEAR)
+
+    def cursor_to_home(self) -> None:
+        self._push(_OP_HOME)
+
+    def content_move_left(self) -> None:
+        self._push(_OP_SHIFT, 0)
+
+    def content_move_right(self) -> None:
+        self._push(_OP_SHIFT, 1)
+
+    def turn_on_backlight_or_off(self, is_on:bool) -> None:
+        self._push(_OP_BACKLIGHT, 1 if is_on else 0)
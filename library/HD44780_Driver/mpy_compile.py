@@ -1,5 +1,9 @@
 import argparse
-import re
+import ast
+import hashlib
+import importlib.metadata
+import json
+import sys
 import os
 from pathlib import Path
 import mpy_cross
@@ -10,85 +14,611 @@ parser.description = "merge file to single .py and compiled .mpy file."
 parser.add_argument("-s", "--source",
                     help="source file path.",
                     default=os.getcwd())
+parser.add_argument("--root",
+                    help="Directory of absolute imports, like program/ for `import lib.HD44780_Driver`. "
+                         "Default is source file's directory.",
+                    default=None)
 parser.add_argument("-o", "--output",
                     help="Output file path. Default is ./build/output.py",
                     default="./build/output.py")
 parser.add_argument("--opt",
                     help="Set optimistic mode. As same as mpy-cross -O[N]. Default is 3.",
-                    default="3",
+                    default=3,
+                    type=int,
                     choices=[0, 1, 2, 3])
 parser.add_argument("--encoding",
                     help="Set encoding when write and read. Default is UTF-8.",
                     default="UTF-8")
+parser.add_argument("--force",
+                    help="Ignore build cache and rebuild all.",
+                    action="store_true")
+parser.add_argument("--shake",
+                    help="Remove classes, functions and tables not used by source file before compiling.",
+                    action="store_true")
+parser.add_argument("--uses",
+                    help="Files of your app using the output, like main.py. Names and attributes used by them "
+                         "are kept, and unused methods are removed too.",
+                    nargs="+",
+                    default=[])
+parser.add_argument("--keep",
+                    help="Names or methods always kept when shaking.",
+                    nargs="+",
+                    default=[])
 
 args = parser.parse_args()
 
-relative_import_pattern = re.compile(r'(?<=from\s)\.\S+(?=\simport\s)|(?<=import\s)\.\S+')
+MANIFEST_SUFFIX = ".manifest.json"
+"""Build cache is saved next to output, like ./build/output.manifest.json"""
 
-def resolve_dependence(source_file: Path) -> dict[str, dict|None]:
-    dependence_tree = {}
+file_hashes: dict[str, str] = {}
+"""Content hash of every file read in this build"""
 
-    with open(source_file, "r", encoding=args.encoding) as file:
-        for line in file.readlines():
-            line = line.strip()
-            if line.startswith('"""') or line.startswith('#'): continue
+cached_modules: dict[str, dict] = {}
+"""Parsed imports and bindings of each source in last build, as path: {"hash": ..., "imports": [...], ...}"""
 
-            matches = relative_import_pattern.search(line)
-            if matches is None: continue
 
-            called_lib_path = Path(source_file.parent, "." + matches.group(0).replace('.', '/') + ".py")
-            dependence_tree[str(called_lib_path)] = None if len(d:=resolve_dependence(called_lib_path)) == 0 else d
+def hash_file(path: str) -> str:
+    if path not in file_hashes:
+        with open(path, "rb") as file:
+            file_hashes[path] = hashlib.sha256(file.read()).hexdigest()
+    return file_hashes[path]
 
-    return dependence_tree
 
+def bound_names(node: ast.AST, result: list[list]) -> None:
+    """
+    Names bound in the module namespace by a statement, as [name, const value or None]. Imports are excluded,
+    they're found by parse_module(). Bodies of functions and classes are skipped, except their global statements.
+    """
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        result.append([node.name, None])
+        for child in ast.walk(node):
+            if isinstance(child, ast.Global):
+                result.extend([name, None] for name in child.names)
+        return
 
-def get_file_insert_order(dependence_tree: dict[str, dict|None]) -> list[str]:
-    result = []
-    for key, value in dependence_tree.items():
-        if value is None:
-            result.append(key)
-        else:
-            result.extend(get_file_insert_order(value))
-            result.append(key)
-    return result
+    if isinstance(node, (ast.Import, ast.ImportFrom)): return
 
-        
+    if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name) and \
+            isinstance(node.value, ast.Call) and isinstance(node.value.func, ast.Name) and \
+            node.value.func.id == "const":
+        result.append([node.targets[0].id, ast.unparse(node.value)])     # same const in two modules is fine
+        return
 
-def merge_files(file_path:list[str], output_path:str) -> None:
+    if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+        result.append([node.id, None])
+        return
+
+    for child in ast.iter_child_nodes(node):
+        if not isinstance(child, ast.expr) or isinstance(child, (ast.Name, ast.Tuple, ast.List, ast.Starred)):
+            bound_names(child, result)
+
+
+def parse_module(path: str) -> dict:
+    """
+    Find all imports and names bound of a file. An unchanged file is not parsed again, it's read from the cache.
+
+    :return: {"imports": [{"line", "end", "col", "level", "module", "names": [[name, asname]], "is_from"}],
+              "bindings": [[name, const value or None]]}
+    """
+    cache = cached_modules.get(path)
+    if cache is not None and cache["hash"] == hash_file(path):
+        return cache
+
+    with open(path, "r", encoding=args.encoding) as file:
+        tree = ast.parse(file.read(), path)
+
+    imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            imports.append({"line": node.lineno, "end": node.end_lineno, "col": node.col_offset,
+                            "level": getattr(node, "level", 0), "module": getattr(node, "module", None),
+                            "names": [[alias.name, alias.asname] for alias in node.names],
+                            "is_from": isinstance(node, ast.ImportFrom)})
+
+    bindings = []
+    for node in tree.body:
+        bound_names(node, bindings)
+
+    cache = cached_modules[path] = {"hash": hash_file(path), "imports": imports, "bindings": bindings}
+    return cache
+
+
+def find_module(directory: Path, name: str) -> Path|None:
+    """
+    :return: file of module, like directory/a/b.py or directory/a/b/__init__.py for a.b, or None if not found.
+    """
+    base = directory.joinpath(*name.split('.')) if name else directory
+    for path in (base.with_name(base.name + ".py"), base / "__init__.py"):
+        if name and path.is_file(): return path.resolve()
+    return None
+
+
+def module_name(path: str, root: Path) -> str:
+    name = Path(os.path.relpath(path, root)).with_suffix("")
+    if name.name == "__init__": name = name.parent
+    return ".".join(name.parts)
+
+
+def resolve_import(path: str, record: dict, root: Path) -> list[dict]:
+    """
+    Find in-project modules of an import statement.
+
+    :return: [{"kind": "from" or "module", "target": path, "name": imported name, "asname": bound name}].
+        kind "from" is importing names from a module, which could be merged. kind "module" is binding the
+        module object, like `import heap` or `from lib import heap`, so the module must exist at runtime.
+        Empty list is an external module, like machine.
+    """
+    if not record["is_from"]:
+        results = []
+        for name, asname in record["names"]:
+            target = find_module(root, name)
+            if target is not None:
+                results.append({"kind": "module", "target": str(target), "name": name,
+                                "asname": asname or name.split('.')[0]})
+        return results
+
+    if record["level"] > 0:
+        directory = Path(path).parent.joinpath(*[".."] * (record["level"] - 1))
+    else:
+        directory = root
+
+    module = record["module"] or ""
+    target = find_module(directory, module)
+    if target is None and record["level"] > 0 and module:
+        raise RuntimeError(f"{path}:{record['line']}: cannot find module {'.' * record['level']}{module}")
+
+    results = []
+    for name, asname in record["names"]:
+        submodule = find_module(directory, f"{module}.{name}" if module else name)
+        if submodule is not None:
+            results.append({"kind": "module", "target": str(submodule), "name": name, "asname": asname or name})
+        elif target is not None:
+            results.append({"kind": "from", "target": str(target), "name": name, "asname": asname or name})
+    return results
+
+
+def build_graph(source: Path, root: Path) -> tuple[list[str], dict[str, list]]:
+    """
+    Find all in-project modules imported by source, directly or not.
+
+    :return: (modules in topological order, dependencies first; in-project imports of each module as
+        [(import record, resolved imports)])
+    :raise RuntimeError: if there is an import cycle.
+    """
+    order, graph, visiting = [], {}, []
+
+    def visit(path: str) -> None:
+        if path in graph: return
+        if path in visiting:
+            cycle = visiting[visiting.index(path):] + [path]
+            raise RuntimeError("import cycle: " + " -> ".join(module_name(p, root) for p in cycle))
+
+        visiting.append(path)
+        edges = []
+        for record in parse_module(path)["imports"]:
+            resolved = resolve_import(path, record, root)
+            if resolved:
+                edges.append((record, resolved))
+                for item in resolved:
+                    visit(item["target"])
+        visiting.pop()
+
+        graph[path] = edges
+        order.append(path)
+
+    visit(str(source.resolve()))
+    return order, graph
+
+
+def split_modules(order: list[str], graph: dict[str, list], entry: str) -> tuple[list[str], set[str]]:
+    """
+    Decide modules to merge into one file and modules left as files.
+
+    A module bound as an object must exist at runtime, and so must every module it imports. Merging such a
+    module too would load it twice, the merged copy and the file, so it's left as file.
+    :return: (modules to merge in topological order, modules left as files)
+    """
+    kept = {item["target"] for path in order for _, resolved in graph[path]
+            for item in resolved if item["kind"] == "module"}
+
+    pending = list(kept)
+    while pending:
+        for _, resolved in graph[pending.pop()]:
+            for item in resolved:
+                if item["target"] not in kept:
+                    kept.add(item["target"])
+                    pending.append(item["target"])
+
+    if entry in kept:
+        raise RuntimeError(f"{entry} is imported as a module by another module, it can't be merged")
+
+    merged = {entry}
+    pending = [entry]
+    while pending:
+        for _, resolved in graph[pending.pop()]:
+            for item in resolved:
+                if item["target"] not in kept and item["target"] not in merged:
+                    merged.add(item["target"])
+                    pending.append(item["target"])
+
+    return [path for path in order if path in merged], kept
+
+
+def find_collisions(merged: list[str], graph: dict[str, list], root: Path) -> list[str]:
+    """
+    Find names bound to different objects by different modules, which merged into one namespace would
+    overwrite each other. Importing the same name from the same module or declaring a same const is fine, so
+    is a name bound twice by one module, like a global set to None and imported by a function later.
+
+    :return: messages of collisions.
+    """
+    owners: dict[str, dict] = {}    # name: {origin: module}
+    merged_set = set(merged)
+
+    for path in merged:
+        origins = [(name, f"const {value}" if value is not None else f"defined in {module_name(path, root)}")
+                   for name, value in parse_module(path)["bindings"]]
+
+        resolved_records = {id(record): resolved for record, resolved in graph[path]}
+        for record in parse_module(path)["imports"]:
+            resolved = {item["name"]: item for item in resolved_records.get(id(record), [])}
+
+            for name, asname in record["names"]:
+                item = resolved.get(name)
+                if item is not None and item["kind"] == "from" and item["target"] in merged_set:
+                    if asname is not None:
+                        origins.append((asname, f"alias of {module_name(item['target'], root)}.{name}"))
+                    continue    # the name is defined by the merged module
+
+                if item is not None and item["kind"] == "module":
+                    origins.append((item["asname"], f"module {module_name(item['target'], root)}"))
+                elif record["is_from"]:
+                    module = module_name(item["target"], root) if item is not None else \
+                        "." * record["level"] + (record["module"] or "")
+                    origins.append((asname or name, f"{module}.{name}"))
+                else:
+                    origins.append((asname or name.split('.')[0], f"module {name}"))
+
+        for name, origin in origins:
+            owners.setdefault(name, {}).setdefault(origin, module_name(path, root))
+
+    return [f"{name}: " + ", ".join(f"{origin} (in {module})" for origin, module in origin_modules.items())
+            for name, origin_modules in owners.items() if len(set(origin_modules.values())) > 1]
+
+
+def import_edits(merged: list[str], graph: dict[str, list], root: Path) -> dict[str, dict[int, str|None]]:
+    """
+    Lines to change in merged modules. Imports of merged modules are removed, an alias is assigned instead.
+    Imports of modules left as files are rewritten to absolute imports from root, the merged file is in
+    another directory. A removed import in a block is replaced by pass.
+    """
+    merged_set = set(merged)
+    edits = {}
+
+    for path in merged:
+        file_edits = edits[path] = {}
+        for record, resolved in graph[path]:
+            indent = " " * record["col"]
+            lines = []
+
+            if not record["is_from"]:   # keep external modules of the same statement, like machine of `import a, machine`
+                resolved_names = {item["name"] for item in resolved}
+                lines.extend(f"{indent}import {name}" + (f" as {asname}\n" if asname else "\n")
+                             for name, asname in record["names"] if name not in resolved_names)
+
+            for item in resolved:
+                if item["kind"] == "from" and item["target"] in merged_set:
+                    if item["asname"] != item["name"]:
+                        lines.append(f"{indent}{item['asname']} = {item['name']}\n")
+                elif item["kind"] == "module":
+                    module = module_name(item["target"], root)
+                    unaliased = not record["is_from"] and dict(record["names"])[item["name"]] is None
+                    # `import a.b` binds a, so it's kept as is, `as a` would bind a.b instead
+                    lines.append(f"{indent}import {module}\n" if unaliased or item["asname"] == module else
+                                 f"{indent}import {module} as {item['asname']}\n")
+                else:
+                    module = module_name(item["target"], root)
+                    lines.append(f"{indent}from {module} import {item['name']}" +
+                                 (f" as {item['asname']}\n" if item["asname"] != item["name"] else "\n"))
+
+            if not lines and record["col"] > 0:
+                lines.append(f"{indent}pass\n")
+
+            for number in range(record["line"], record["end"] + 1):
+                file_edits[number] = None
+            if lines:
+                file_edits[record["line"]] = "".join(lines)
+
+    return edits
+
+
+def merge_files(file_path:list[str], output_path:str, edits:dict[str, dict[int, str|None]]|None = None) -> None:
+    """
+    :param edits: lines to change of each file, as path: {line number: new line, or None to remove}.
+    """
     visited_files = {}
     with open(output_path, "w", encoding=args.encoding) as output_file:
         for path in file_path:
 
             if path in visited_files: continue
             visited_files[path] = None
+            file_edits = {} if edits is None else edits.get(path, {})
 
             with open(path, "r", encoding=args.encoding) as file:
                 output_file.write(f"# ==== {path} ====\r")
 
-                for line in file.readlines():
-                    if relative_import_pattern.search(line) is not None: continue
+                for number, line in enumerate(file.readlines(), 1):
+                    if number in file_edits:
+                        if file_edits[number] is None: continue
+                        line = file_edits[number]
                     output_file.write(line)
 
                 output_file.write("\r# ===================================\r\r")
 
 
+PURE_CALLS = ("const", "bytes", "bytearray", "array", "tuple", "frozenset")
+"""Calls without side effect, assignments of them could be removed"""
+
+
+def is_pure(node: ast.AST) -> bool:
+    if isinstance(node, (ast.Constant, ast.Name)): return True
+    if isinstance(node, (ast.Tuple, ast.List, ast.Set)): return all(map(is_pure, node.elts))
+    if isinstance(node, ast.Dict):
+        return all(key is None or is_pure(key) for key in node.keys) and all(map(is_pure, node.values))
+    if isinstance(node, ast.BinOp): return is_pure(node.left) and is_pure(node.right)
+    if isinstance(node, ast.UnaryOp): return is_pure(node.operand)
+    if isinstance(node, ast.Call):
+        return isinstance(node.func, ast.Name) and node.func.id in PURE_CALLS and \
+            all(map(is_pure, node.args)) and not node.keywords
+    return False
+
+
+def defined_names(node: ast.stmt) -> list[str]|None:
+    """
+    Names defined by a top-level statement which could be removed, or None if it must be kept.
+    """
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)): return [node.name]
+
+    if isinstance(node, ast.Assign) and is_pure(node.value) and \
+            all(isinstance(target, ast.Name) for target in node.targets):
+        return [target.id for target in node.targets]
+
+    if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name) and \
+            (node.value is None or is_pure(node.value)):
+        return [node.target.id]
+
+    if isinstance(node, ast.Import):
+        return [(alias.asname or alias.name).split('.')[0] for alias in node.names]
+
+    if isinstance(node, ast.ImportFrom) and node.level == 0 and node.names[0].name != '*':
+        return [alias.asname or alias.name for alias in node.names]
+
+    return None
+
+
+def is_method(node: ast.stmt) -> bool:
+    return isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+
+
+def is_dunder(name: str) -> bool:
+    return name.startswith("__") and name.endswith("__")
+
+
+def first_line(node: ast.stmt) -> int:
+    return min([node.lineno] + [decorator.lineno for decorator in getattr(node, "decorator_list", [])])
+
+
+def shake_tree(file_path: list[str], entry: str, uses: list[str], keep: list[str]) -> tuple[dict, dict]:
+    """
+    Find what could be removed from merged files.
+
+    All statements of entry are kept, and everything they use is kept, repeatedly. Removed are only
+    top-level classes, functions, imports and assignments of constant values (tables) no kept code names.
+    If uses is given, it's the whole app, so methods whose names are never accessed as attribute are removed
+    too. Names in strings are counted as used, in case of getattr().
+
+    :return: (edits to pass to merge_files(), removed names of each file)
+    """
+    names, attributes = set(keep), set(keep)
+
+    def use(node: ast.AST) -> None:
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name): names.add(child.id)
+            elif isinstance(child, ast.alias): names.add(child.name)     # `from .a import b as c` needs b
+            elif isinstance(child, ast.Attribute): attributes.add(child.attr)
+            elif isinstance(child, ast.Constant) and isinstance(child.value, str):
+                names.add(child.value)
+                attributes.add(child.value)
+
+    for path in uses:
+        with open(path, "r", encoding=args.encoding) as file:
+            use(ast.parse(file.read(), path))
+
+    trees = {}
+    definitions: dict[str, list[ast.stmt]] = {}
+    for path in dict.fromkeys(file_path):
+        with open(path, "r", encoding=args.encoding) as file:
+            trees[path] = ast.parse(file.read(), path)
+
+        for node in trees[path].body:
+            if path == entry and isinstance(node, ast.ImportFrom):     # names imported by entry are exported
+                names.update(alias.asname or alias.name for alias in node.names)
+
+            node_names = None if path == entry else defined_names(node)
+            if node_names is None:
+                use(node)
+            else:
+                for name in node_names:
+                    definitions.setdefault(name, []).append(node)
+
+    kept = set()
+    classes = []
+    changed = True
+    while changed:
+        changed = False
+
+        for name in list(names):
+            for node in definitions.get(name, ()):
+                if id(node) in kept: continue
+                kept.add(id(node))
+                changed = True
+
+                if isinstance(node, ast.ClassDef) and uses:
+                    for child in node.bases + node.keywords + node.decorator_list: use(child)
+                    for member in node.body:
+                        if not is_method(member): use(member)
+                    classes.append(node)
+                else:
+                    use(node)
+
+        for node in classes:
+            for member in node.body:
+                if not is_method(member) or id(member) in kept: continue
+                if member.name in attributes or is_dunder(member.name):
+                    kept.add(id(member))
+                    use(member)
+                    changed = True
+
+    edits, removed = {}, {}
+    for path, tree in trees.items():
+        file_edits = edits[path] = {}
+        removed_names = removed[path] = []
+
+        def remove(node: ast.stmt, name: str) -> None:
+            removed_names.append(name)
+            for number in range(first_line(node), node.end_lineno + 1):
+                file_edits[number] = None
+
+        for node in tree.body:
+            if path == entry or defined_names(node) is None: continue
+
+            if id(node) not in kept:
+                remove(node, node.name if hasattr(node, "name") else ", ".join(defined_names(node)))
+                continue
+
+            if node in classes:
+                methods = [member for member in node.body if is_method(member) and id(member) not in kept]
+                for member in methods:
+                    remove(member, f"{node.name}.{member.name}")
+                if methods and len(methods) == len(node.body):     # keep class body not empty
+                    file_edits[first_line(methods[0])] = " " * methods[0].col_offset + "pass\n"
+
+    return edits, removed
+
+
+def build_options() -> dict:
+    """
+    Everything except sources that changes outputs. Any change of them makes a full rebuild.
+    """
+    try:
+        mpy_cross_version = importlib.metadata.version("mpy-cross")
+    except importlib.metadata.PackageNotFoundError:
+        mpy_cross_version = None
+
+    return {"opt": args.opt,
+            "encoding": args.encoding,
+            "root": args.root,
+            "shake": args.shake,
+            "uses": {path: hash_file(path) for path in args.uses},
+            "keep": args.keep,
+            "mpy_cross": mpy_cross_version,
+            "script": hash_file(__file__)}
+
+
+def load_manifest(manifest_path: Path) -> dict|None:
+    try:
+        with open(manifest_path, "r", encoding="UTF-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def is_up_to_date(manifest: dict|None, options: dict, sources: list[str]) -> bool:
+    if manifest is None or manifest.get("options") != options: return False
+    if list(manifest.get("sources", {})) != sources: return False
+
+    for path, digest in manifest["sources"].items():
+        if hash_file(path) != digest: return False
+
+    for path, digest in manifest.get("outputs", {}).items():    # deleted or edited outputs
+        if not os.path.isfile(path) or hash_file(path) != digest: return False
+
+    return True
+
+
+def save_manifest(manifest_path: Path, options: dict, sources: list[str], outputs: list[str]) -> None:
+    for path in outputs:
+        file_hashes.pop(path, None)     # outputs were just written
+
+    manifest = {"options": options,
+                "sources": {path: hash_file(path) for path in sources},
+                "outputs": {path: hash_file(path) for path in outputs},
+                "modules": cached_modules}
+
+    with open(manifest_path, "w", encoding="UTF-8") as file:
+        json.dump(manifest, file, indent=2)
+
+
 def main():
-    source = Path(os.path.join(os.getcwd(), args.source))
+    source = Path(os.path.join(os.getcwd(), args.source)).resolve()
     output = Path(os.path.join(os.getcwd(), args.output))
+    root = Path(args.root).resolve() if args.root is not None else source.parent
 
-    if source.is_dir(): RuntimeError("Source path is a directory")
+    if source.is_dir(): raise RuntimeError("Source path is a directory")
     if output.is_dir():
         output = Path(os.path.join(str(output), source.name))
 
     output.parent.mkdir(parents=True, exist_ok=True)
-    output.touch(exist_ok=True)
+    manifest_path = output.with_suffix(MANIFEST_SUFFIX)
+    manifest = None if args.force else load_manifest(manifest_path)
+    if manifest is not None and manifest.get("options", {}).get("script") == hash_file(__file__):
+        cached_modules.update(manifest.get("modules", {}))
+
+    order, graph = build_graph(source, root)
+    merge_files_order, kept = split_modules(order, graph, str(source))
+    options = build_options()
+
+    if is_up_to_date(manifest, options, merge_files_order):
+        print(f"{output.with_suffix('.mpy')} is up to date, {len(merge_files_order)} files unchanged.")
+        return
+
+    collisions = find_collisions(merge_files_order, graph, root)
+    if collisions:
+        raise RuntimeError("names collide when merged into one namespace, rename or alias them:\n  " +
+                           "\n  ".join(collisions))
+
+    if kept:
+        print("Imported as modules, so left as files and imported from root: " +
+              ", ".join(sorted(module_name(path, root) for path in kept)))
+
+    edits = import_edits(merge_files_order, graph, root)
+
+    if args.shake:
+        shake_edits, removed = shake_tree(merge_files_order, str(source), args.uses, args.keep)
+        merge_files(merge_files_order, str(output), edits)
+        merged_size = output.stat().st_size
+
+        for path, file_edits in shake_edits.items():
+            edits[path].update(file_edits)
+        merge_files(merge_files_order, str(output), edits)
+        shaken_size = output.stat().st_size
+
+        print(f"Tree shaking removed {merged_size - shaken_size} of {merged_size} bytes "
+              f"({(merged_size - shaken_size) / merged_size:.1%}).")
+        for path, names in removed.items():
+            if names: print(f"  {path}: {', '.join(names)}")
+    else:
+        merge_files(merge_files_order, str(output), edits)
 
-    dependence_tree = {str(source): resolve_dependence(source)}
-    merge_files_order = get_file_insert_order(dependence_tree) + [str(source)]
-    merge_files(merge_files_order, str(output))
+    returncode = mpy_cross.run("-o", str(output.with_suffix('.mpy')), f"-O{args.opt}",  str(output)).wait()
+    if returncode != 0:     # no manifest, so the next build runs again
+        raise RuntimeError(f"mpy-cross exited with {returncode}, {output.with_suffix('.mpy')} is not built")
 
-    mpy_cross.run("-o", str(output.with_suffix('.mpy')), f"-O{args.opt}",  str(output))
+    save_manifest(manifest_path, options, merge_files_order, [str(output), str(output.with_suffix('.mpy'))])
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        main()
+    except RuntimeError as error:
+        sys.exit(f"error: {error}")
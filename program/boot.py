@@ -3,6 +3,13 @@
 #esp.osdebug(None)
 import os, machine
 #os.dupterm(None, 1) # disable REPL on UART(0)
+try:
+    os.stat("ota.json")     # an update is pending, swap or roll it back before main.py runs, see ota.py
+except OSError:
+    pass
+else:
+    import ota
+    ota.boot()
 import gc
 #import webrepl
 #webrepl.start()
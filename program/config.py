@@ -0,0 +1,191 @@
+from json import load, loads, dump
+from os import rename
+
+
+CONFIG_FILE = "config.json"
+
+# key: (type, min, max). Length is checked for str, value for int, nothing for bool.
+_RULES = {
+    "ssid": (str, 1, 32),
+    "password": (str, 0, 64),
+    "mqtt_broker_ip": (str, 1, 253),
+    "mqtt_broker_port": (int, 1, 65535),
+    "i2c_scl": (int, 0, 16),
+    "i2c_sda": (int, 0, 16),
+    "i2c_freq": (int, 10000, 400000),
+    "lcd_address": (int, 0x08, 0x77),
+    "bmp180_address": (int, 0x08, 0x77),
+    "period_sec": (int, 1, 3600),
+    "bmp180_oss": (int, 0, 3),
+    "lcd_batch": (int, 1, 32),
+    "moisture_offset_min": (int, 0, 1024),
+    "moisture_offset_max": (int, 0, 1024),
+    "backlight_timeout_sec": (int, 1, 86400),
+    "diagnostics_enabled": (bool, 0, 1),
+    "diagnostics_interval_sec": (int, 10, 86400),
+}
+
+RUNTIME_KEYS = ("period_sec", "bmp180_oss", "lcd_batch", "backlight_timeout_sec")
+"""**Keys applied at once by main.py when set by a command**, others need a reboot"""
+
+
+class Config:
+    """
+    **Settings of one device**
+
+    Defaults are class attributes, so an instance only holds the keys set, and only keys of _RULES could be
+    set. A wrong key, type or value raises ValueError, instead of running with a typo silently ignored.
+    """
+
+    ssid:str = "SSID"
+    password:str = "PASSWORD"
+    mqtt_broker_ip:str = "192.168.31.194"
+    mqtt_broker_port:int = 1883
+
+    i2c_scl:int = 14
+    i2c_sda:int = 2
+    i2c_freq:int = 100000
+    lcd_address:int = 0x27
+    bmp180_address:int = 0x77
+
+    period_sec:int = 10
+    """**Sleep of every cycle of the main loop**"""
+    bmp180_oss:int = 0
+    """**Over-sampling mode of pressure**, one of BMP180Driver.OVERSAMPLING_*"""
+    lcd_batch:int = 8
+    """**Commands run by the LCD writer task before yielding**, see lcd_async"""
+
+    moisture_offset_min:int = 150
+    """**ADC value in water, used if the soil moisture sensor is not calibrated**"""
+    moisture_offset_max:int = 250
+    """**ADC value in air, used if the soil moisture sensor is not calibrated**"""
+
+    backlight_timeout_sec:int = 60
+    diagnostics_enabled:bool = True
+    diagnostics_interval_sec:int = 300
+
+    def __init__(self, values:dict|None = None) -> None:
+        """
+        **Constructor of config**
+
+        :param values: key: value to set, others are defaults.
+        :raise ValueError: a key is unknown, or its value is of a wrong type or out of range.
+        """
+        if values:
+            for key, value in values.items():
+                self.set(key, value)
+            self.check()
+
+
+    def set(self, key:str, value) -> None:
+        """
+        **Set a key after validating it**
+
+        Keys depending on each other are not checked, call check() after setting all.
+        :raise ValueError: a key is unknown, or its value is of a wrong type or out of range.
+        """
+        rule = _RULES.get(key)
+        if rule is None:
+            raise ValueError(f"Unknown config key {key}.")
+
+        kind, low, high = rule
+        if type(value) is not kind:     # bool is not accepted as int
+            raise ValueError(f"{key} must be {kind.__name__}.")
+
+        if kind is not bool and not low <= (len(value) if kind is str else value) <= high:
+            raise ValueError(f"{key} must be {'length ' if kind is str else ''}in {low}~{high}.")
+
+        setattr(self, key, value)
+
+
+    def check(self) -> None:
+        """
+        **Validate keys depending on each other**
+
+        :raise ValueError: if they conflict.
+        """
+        if self.i2c_scl == self.i2c_sda:
+            raise ValueError("i2c_scl and i2c_sda must be different pins.")
+        if self.lcd_address == self.bmp180_address:
+            raise ValueError("lcd_address and bmp180_address must be different.")
+        if self.moisture_offset_min >= self.moisture_offset_max:
+            raise ValueError("moisture_offset_min must be less than moisture_offset_max.")
+
+
+    def update(self, values:dict, keys:tuple|None = None) -> None:
+        """
+        **Set keys at once, all or none**
+
+        :param keys: keys allowed to set, like RUNTIME_KEYS. None is all.
+        :raise ValueError: like Config(), or a key is not allowed, then nothing is set.
+        """
+        if keys is not None:
+            for key in values:
+                if key not in keys:
+                    raise ValueError(f"{key} can't be set at runtime.")
+
+        merged = self.to_dict()
+        merged.update(values)
+        Config(merged)      # validate all before setting any
+
+        for key, value in values.items():
+            setattr(self, key, value)
+
+
+    def to_dict(self) -> dict:
+        """
+        :return: keys set, not defaults.
+        """
+        return {key: getattr(self, key) for key in _RULES if key in self.__dict__}
+
+
+def save_config(config:Config, path:str = CONFIG_FILE) -> None:
+    """
+    **Persist keys set to the config file**
+
+    Written to a temporary file then renamed, so a reset while writing won't leave a broken file.
+    :param path: config file path.
+    """
+    with open(path + ".tmp", "w") as file:
+        dump(config.to_dict(), file)
+
+    rename(path + ".tmp", path)
+
+
+def parse_command(message:bytes) -> (object, dict):
+    """
+    **Parse a command, like {"id": 1, "set": {"period_sec": 30}} or {"id": 2, "update": "http://..."}**
+
+    A command has one of them. "set" is keys to set, checked by Config.update(). "update" is the URL of an OTA
+    manifest, see ota.py.
+    "id" is optional, it's sent back in the response to match.
+    :return: (id or None, the command with "set" or "update").
+    :raise ValueError: the message is not a JSON object of either "set" or "update", not both.
+    """
+    command = loads(message)
+    if not isinstance(command, dict) or ("set" in command) == ("update" in command) or \
+            ("set" in command and not isinstance(command["set"], dict)) or \
+            ("update" in command and not isinstance(command["update"], str)):
+        raise ValueError('Command must be one of {"set": {"period_sec": 30}} or {"update": "http://..."}.')
+
+    return command.get("id"), command
+
+
+def load_config(path:str = CONFIG_FILE) -> Config:
+    """
+    **Parse the config file, once at boot**
+
+    The file is a JSON object of keys to set, like {"ssid": "Home", "lcd_address": 63}. If it's missing, all
+    keys are defaults.
+    :param path: config file path.
+    :raise ValueError: the file is broken or a key is wrong, see Config.set().
+    """
+    try:
+        with open(path, "r") as file:
+            values = load(file)
+    except OSError:
+        return Config()
+
+    if not isinstance(values, dict):
+        raise ValueError(f"{path} must be a JSON object.")
+    return Config(values)
@@ -0,0 +1,89 @@
+from micropython import const
+from time import ticks_us, ticks_diff
+import instrumentation as instrument
+import gc
+
+
+_THRESHOLD_FRACTION = const(4)
+
+idle_collect_bytes:int = 4096
+"""**Bytes allocated since the last collection to collect at an idle point**"""
+
+collections:int = 0
+max_pause_us:int = 0
+
+_alloc_after_collect:int = 0
+
+
+def init(idle_bytes:int = 4096) -> None:
+    """
+    **Start the GC policy**
+
+    Call it after long-lived objects like drivers, buffers and tasks are allocated, so they are packed
+    at the bottom of the heap. Then collect once and set gc.threshold(), so an automatic collection is
+    triggered when a quarter of free heap is allocated, instead of when the heap is full and fragmented.
+    :param idle_bytes: bytes allocated since the last collection to collect at an idle point.
+    """
+    global idle_collect_bytes
+    idle_collect_bytes = idle_bytes
+
+    collect()
+    gc.threshold(gc.mem_free() // _THRESHOLD_FRACTION + gc.mem_alloc())
+
+
+def collect() -> int:
+    """
+    **Collect now and record the pause**
+
+    :return: pause in microseconds.
+    """
+    global collections, max_pause_us, _alloc_after_collect
+
+    span = instrument.begin()
+    start = ticks_us()
+    gc.collect()
+    pause = ticks_diff(ticks_us(), start)
+    instrument.end(instrument.STAGE_GC, span)
+
+    collections += 1
+    if pause > max_pause_us:
+        max_pause_us = pause
+    _alloc_after_collect = gc.mem_alloc()
+
+    return pause
+
+
+def collect_at_idle() -> bool:
+    """
+    **Collect at an idle point if enough is allocated**
+
+    Call it where nothing is timing critical, like before the main loop sleeps, so the automatic
+    collection won't pause in the middle of an I2C transaction.
+    :return: True if collected.
+    """
+    if gc.mem_alloc() - _alloc_after_collect < idle_collect_bytes: return False
+
+    collect()
+    return True
+
+
+def largest_free_block() -> int:
+    """
+    **Probe the largest block that could be allocated**
+
+    Binary search by allocating and dropping bytearrays, which may trigger a collection. Call it rarely,
+    like when reporting. Fragmentation is 1 - largest_free_block() / gc.mem_free().
+    :return: bytes of the largest free block.
+    """
+    low, high = 0, gc.mem_free()
+
+    while low < high:
+        size = (low + high + 1) >> 1
+        try:
+            block = bytearray(size)
+            del block
+            low = size
+        except MemoryError:
+            high = size - 1
+
+    return low
@@ -0,0 +1,150 @@
+from array import array
+from micropython import const
+from time import ticks_us, ticks_diff
+import gc
+
+
+STAGE_BMP180 = const(0)
+STAGE_MOISTURE = const(1)
+STAGE_DISPLAY = const(2)
+STAGE_LCD_IO = const(3)
+STAGE_MQTT_CONNECT = const(4)
+STAGE_MQTT_PUBLISH = const(5)
+STAGE_CYCLE = const(6)
+STAGE_GC = const(7)
+
+STAGE_NAMES = ("bmp180", "moisture", "display", "lcd_io", "mqtt_connect", "mqtt_publish", "cycle", "gc")
+
+COUNTER_UPLOADS = const(0)
+COUNTER_UPLOAD_ERRORS = const(1)
+COUNTER_WIFI_LOST = const(2)
+COUNTER_LCD_COMMANDS = const(3)
+
+COUNTER_NAMES = ("uploads", "upload_errors", "wifi_lost", "lcd_commands")
+
+TOPIC = "micropy/diagnostics"
+
+enabled:bool = False
+"""**Switch of all measurement.** When False, begin() and end() only check this flag."""
+
+_TOTAL_LIMIT_US = const(1 << 29)   # keep totals in small int, reading a bigger one allocates
+
+# All stats are preallocated, so measuring allocates nothing. Spans are kept per window, which is
+# reset after every published payload, and counters are kept since boot.
+_span_count = array('I', bytes(4 * len(STAGE_NAMES)))
+_span_total_us = array('I', bytes(4 * len(STAGE_NAMES)))
+_span_max_us = array('I', bytes(4 * len(STAGE_NAMES)))
+_counters = array('I', bytes(4 * len(COUNTER_NAMES)))
+
+_heap_free:int = 0
+_heap_free_min:int = -1
+_heap_alloc:int = 0
+_heap_largest:int = -1
+
+
+def enable(is_enabled:bool) -> None:
+    global enabled
+    enabled = is_enabled
+
+
+def begin() -> int:
+    """
+    **Start a span**
+
+    :return: start ticks to pass to end(), or 0 if disabled.
+    """
+    return ticks_us() if enabled else 0
+
+
+def end(stage:int, start:int) -> None:
+    """
+    **End a span started by begin()**
+
+    :param stage: one of STAGE_*.
+    :param start: returned by begin().
+    """
+    if not enabled or start == 0: return
+
+    elapsed = ticks_diff(ticks_us(), start)
+    if elapsed < 0: return
+
+    total = _span_total_us[stage]
+    n = _span_count[stage]
+    if n and total + elapsed > _TOTAL_LIMIT_US:   # halve the count of spans so far, their mean is kept
+        half = (n + 1) >> 1
+        total = total // n * half
+        _span_count[stage] = half
+
+    _span_count[stage] += 1
+    _span_total_us[stage] = total + elapsed
+    if elapsed > _span_max_us[stage]:
+        _span_max_us[stage] = elapsed
+
+
+def count(counter:int, n:int = 1) -> None:
+    """
+    **Add to a counter**
+
+    :param counter: one of COUNTER_*.
+    """
+    if enabled:
+        _counters[counter] += n
+
+
+def sample_heap(largest:int = -1) -> None:
+    """
+    **Snapshot free and allocated heap, keep the min free since boot**
+
+    :param largest: the largest free block from heap.largest_free_block(). -1 is keeping the last one.
+    """
+    global _heap_free, _heap_free_min, _heap_alloc, _heap_largest
+
+    if not enabled: return
+
+    if largest >= 0:
+        _heap_largest = largest
+    _heap_free = gc.mem_free()
+    _heap_alloc = gc.mem_alloc()
+    if _heap_free_min < 0 or _heap_free < _heap_free_min:
+        _heap_free_min = _heap_free
+
+
+def span_stats(stage:int) -> (int, int, int):
+    """
+    :return: (count, mean_us, max_us) of a stage in this window.
+    """
+    n = _span_count[stage]
+    return n, (_span_total_us[stage] // n if n else 0), _span_max_us[stage]
+
+
+def counter(counter:int) -> int:
+    return _counters[counter]
+
+
+def reset_window() -> None:
+    """
+    **Clear span stats, counters and heap min are kept**
+    """
+    for i in range(len(STAGE_NAMES)):
+        _span_count[i] = 0
+        _span_total_us[i] = 0
+        _span_max_us[i] = 0
+
+
+def payload(uptime_ms:int) -> str:
+    """
+    **Compact JSON of all stats**
+
+    Every stage is [count, mean_us, max_us], stages not run in this window are omitted. Like
+    {"up":3600,"heap":{"free":21000,"min":18000,"alloc":9000,"largest":12000},"span":{"bmp180":[6,19600,19800]},
+    "cnt":{"uploads":6}}. largest is -1 if not probed.
+    :param uptime_ms: uptime to report in seconds.
+    """
+    spans = ",".join(f'"{STAGE_NAMES[i]}":[{_span_count[i]},{_span_total_us[i] // _span_count[i]},{_span_max_us[i]}]'
+                     for i in range(len(STAGE_NAMES)) if _span_count[i] > 0)
+    counters = ",".join(f'"{COUNTER_NAMES[i]}":{_counters[i]}' for i in range(len(COUNTER_NAMES)))
+
+    return (f'{{"up":{uptime_ms // 1000},'
+            f'"heap":{{"free":{_heap_free},"min":{max(_heap_free_min, 0)},"alloc":{_heap_alloc},'
+            f'"largest":{_heap_largest}}},'
+            f'"span":{{{spans}}},"cnt":{{{counters}}}}}')
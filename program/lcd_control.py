@@ -1,6 +1,7 @@
 from lib.HD44780_Driver.lcd_1602_api import lcd_api
-from framebuf import FrameBuffer, MONO_HLSB
-from asyncio import sleep, CancelledError
+from asyncio import sleep, sleep_ms, CancelledError
+from lcd_layout import Field, Layout, fixed, percent
+from time import ticks_ms, ticks_diff
 
 
 WIFI_ICON = bytes([
@@ -114,34 +115,139 @@ MOISTURE_ICON = bytes([
 ])
 
 
+def _to_rows(*icons: bytes) -> bytes:
+    """
+    Convert 5*8 MONO_HLSB icons to CGRAM rows in one contiguous bytes, 8 rows per frame.
+    """
+    return bytes(row >> 3 for icon in icons for row in icon[0:8])
+
+
+def _scroll_frames(icon: bytes) -> tuple:
+    """
+    Frames of icon that scrolling up below first 2 rows.
+    """
+    return tuple(icon[0:2] + bytes(icon[j] if (j:=(start + i - 1)) < 8 else 0 for i in range(1, 7))
+                 for start in range(1, 8))
+
+
+BLANK_ROWS = bytes(8)
+
+# Frames are pre-calculated once, play them by lcd_api.write_custom_char_rows() without allocating.
+UI_ICON_FRAMES = _to_rows(WIFI_ICON, BLANK_ROWS, TEMPERATURE_ICON, CELSIUS_ICON, PRESSURE_ICON, PA_ICON,
+                          MOISTURE_ICON)   # frame n is for CGRAM n
+
+WIFI_FRAMES = _to_rows(WIFI_ICON, WIFI_CONNECTED_LOW_ICON, WIFI_CONNECTED_HIGH_ICON, WIFI_DISCONNECT_ICON)
+WIFI_FRAME_LOW = 1
+WIFI_FRAME_HIGH = 2
+WIFI_FRAME_DISCONNECT = 3
+
+UPLOADING_FRAMES = _to_rows(*_scroll_frames(UPLOADING_ICON))
+
+
+async def async_play_animation(api:lcd_api, frames:bytes, index:int, fps:float, first:int = 0,
+                               count:int|None = None, loop:bool = True, restore:bytes|None = None):
+    """
+    **Play pre-calculated frames on a custom char**
+
+    Cancel the task to stop, and the custom char will be restored if restore is given.
+    :param frames: CGRAM rows of frames, 8 rows per frame. See _to_rows().
+    :param index: CGRAM index to play on.
+    :param fps: frames per second.
+    :param first: first frame to play.
+    :param count: frames to play. None is playing to the last frame.
+    :param loop: True is playing forever, False is stopping after the last frame.
+    :param restore: CGRAM rows written when cancelled. None is keeping the current frame.
+    """
+    interval_ms = int(1000 / fps)
+    last = (len(frames) >> 3) if count is None else first + count
+
+    try:
+        while True:
+            for frame in range(first, last):
+                api.write_custom_char_rows(frames, index, frame << 3)
+                await sleep_ms(interval_ms)
+
+            if not loop: break
+
+    except CancelledError:
+        if restore is not None:
+            api.write_custom_char_rows(restore, index)
+
+
+# | ============================================================================== |
+# | 1   | 2  | 3  | 4  | 5  | 6  | 7  | 8  | 9  | 10 | 11 | 12 | 13 | 14 | 15 | 16 |
+# | ============================================================================== |
+# | 🌡️ | X  | X  | .  | X  | ℃  | ⊤  | X  | X  | X  | X  | X  | X  | Pa | ⬆  | 🛜 |
+# | 💧 | X  | X  | .  | X  | %  |    |    |    |    |    |    |    |    |    |    |
+# | ============================================================================== |
+TEMP_FIELD = Field(0, 1, 4, fixed(1, -999, 9999), icon=2, unit=3)
+PRESSURE_FIELD = Field(0, 7, 6, fixed(0, 0, 999999), icon=4, unit=5)   # sea level is 101325Pa
+MOISTURE_FIELD = Field(1, 1, 4, percent(1), icon=6, unit="%")
+
+MAIN_LAYOUT = Layout((TEMP_FIELD, PRESSURE_FIELD, MOISTURE_FIELD),
+                     statics=((0, 14, 1), (0, 15, 0)))  # uploading and WI-FI icons
+
+# Every DDRAM line has 40 columns but only 16 are visible. The diagnostic page is pre-rendered at column
+# 16~31 and shown by shifting display, no need to rewrite cells when switching.
+# | ============================================================================== |
+# | 17  | 18 | 19 | 20 | 21 | 22 | 23 | 24 | 25 | 26 | 27 | 28 | 29 | 30 | 31 | 32 |
+# | ============================================================================== |
+# | R   | S  | S  | I  |    | X  | X  | X  | X  | d  | B  | m  |    |    |    |    |
+# | U   | p  |    | X  | X  | X  | X  | .  | X  | h  |    |    |    |    |    |    |
+# | ============================================================================== |
+PAGE_COLUMNS = 16
+RSSI_FIELD = Field(0, 21, 4, fixed(0, -99, 0), unit="dBm")
+UPTIME_FIELD = Field(1, 19, 6, fixed(1, 0, 9999), unit="h")
+
+DIAGNOSTIC_LAYOUT = Layout((RSSI_FIELD, UPTIME_FIELD),
+                           statics=((0, 16, "RSSI"), (1, 16, "Up")))
+
+PAGES = (MAIN_LAYOUT, DIAGNOSTIC_LAYOUT)
+_page = 0
+
+
 def init_ui(api:lcd_api):
-    api.write_custom_char(FrameBuffer(bytearray(WIFI_ICON), 5, 8, MONO_HLSB), 0)
-    api.write_custom_char(FrameBuffer(bytearray([0, 0, 0, 0, 0, 0, 0, 0]), 5, 8, MONO_HLSB), 1)
-    api.write_custom_char(FrameBuffer(bytearray(TEMPERATURE_ICON), 5, 8, MONO_HLSB), 2)
-    api.write_custom_char(FrameBuffer(bytearray(CELSIUS_ICON), 5, 8, MONO_HLSB), 3)
-    api.write_custom_char(FrameBuffer(bytearray(PRESSURE_ICON), 5, 8, MONO_HLSB), 4)
-    api.write_custom_char(FrameBuffer(bytearray(PA_ICON), 5, 8, MONO_HLSB), 5)
-    api.write_custom_char(FrameBuffer(bytearray(MOISTURE_ICON), 5, 8, MONO_HLSB), 6)
-    # | ============================================================================== |
-    # | 1   | 2  | 3  | 4  | 5  | 6  | 7  | 8  | 9  | 10 | 11 | 12 | 13 | 14 | 15 | 16 |
-    # | ============================================================================== |
-    # | 🌡️ | X  | X  | .  | X  | ℃  |    | ⊤  | X  | X  | X  | X  | Pa |    | ⬆  | 🛜 |
-    # | 💧 | X  | X  | .  | X  | %  |    |    |    |    |    |    |    |    |    |    |
-    # | ============================================================================== |
-    api.clear()
-    api.print_custom_char(2)
-    api.print("    ")
-    api.print_custom_char(3)
-    api.print(" ")
-    api.print_custom_char(4)
-    api.print("    ")
-    api.print_custom_char(5)
-    api.print(" ")
-    api.print_custom_char(1)
-    api.print_custom_char(0)
-    api.cursor_move_to(1, 0)
-    api.print_custom_char(6)
-    api.print("    %")
+    global _page
+
+    for index in range(0, 7):
+        api.write_custom_char_rows(UI_ICON_FRAMES, index, index << 3)
+
+    MAIN_LAYOUT.render_static(api)
+    DIAGNOSTIC_LAYOUT.render_static(api, clear=False)
+    _page = 0
+
+
+def show_page(api:lcd_api, page:int):
+    """
+    **Switch to a page by display shift**
+
+    Back to the first page is one return-home instruction, the next page is one shift instruction per
+    column. Content in DDRAM is kept.
+    :param page: index of PAGES.
+    """
+    global _page
+
+    if page == _page: return
+
+    if page == 0:
+        api.cursor_to_home()
+    else:
+        for _ in range((page - _page) * PAGE_COLUMNS):
+            api.content_move_left()
+
+    _page = page
+
+
+async def async_page_rotation(api:lcd_api, interval_sec:float):
+    """
+    **Rotate pages forever**
+
+    :param interval_sec: seconds to show every page.
+    """
+    while True:
+        await sleep(interval_sec)
+        show_page(api, (_page + 1) % len(PAGES))
+
 
 async def async_animation_loading(api:lcd_api):
     try:
@@ -170,60 +276,74 @@ async def async_animation_loading(api:lcd_api):
 
 
 async def async_animation_wifi_connecting(api:lcd_api):
-    while True:
-        api.write_custom_char(FrameBuffer(bytearray(WIFI_ICON), 5, 8, MONO_HLSB), 0)
-        await sleep(0.5)
-        api.write_custom_char(FrameBuffer(bytearray(WIFI_CONNECTED_LOW_ICON), 5, 8, MONO_HLSB), 0)
-        await sleep(0.5)
-        api.write_custom_char(FrameBuffer(bytearray(WIFI_CONNECTED_HIGH_ICON), 5, 8, MONO_HLSB), 0)
-        await sleep(0.5)
+    await async_play_animation(api, WIFI_FRAMES, 0, 2, first=0, count=3)
 
 
 async def async_animation_updating(api:lcd_api):
-    try:
-        api.write_custom_char(FrameBuffer(bytearray(UPLOADING_ICON), 5, 8, MONO_HLSB), 1)
-        while True:
-            for start in range(1, 8):
-                b = bytearray(UPLOADING_ICON[0:2])
+    await async_play_animation(api, UPLOADING_FRAMES, 1, 2, restore=BLANK_ROWS)
 
-                for i in range(1, 8):
-                    b.append(UPLOADING_ICON[j] if (j:=(start + i - 1)) < 8 else 0)
+    
+_last_active_ms = ticks_ms()
+_backlight_timeout_ms = 60000
 
-                api.write_custom_char(FrameBuffer(b, 5, 8, MONO_HLSB), 1)
-                await sleep(0.5)
-    except CancelledError:
-        api.write_custom_char(FrameBuffer(bytearray([0,0,0,0,0,0,0,0,0]), 5, 8, MONO_HLSB), 1)
 
-    
-def update_temp(api:lcd_api, temp: float):
-    api.cursor_move_to(0,1)
+def wake():
+    """
+    **Record an activity to keep background-light on**
 
-    if temp >= 9999:
-        api.print("9999")
-    elif temp <= -999:
-        api.print("-999")
-    else:
-        api.print(f"{temp:.1f}    "[0:4])   # add space to clear value when digits not enough
+    Nothing is written to the display, so it's safe to call in an IRQ handler like a button.
+    """
+    global _last_active_ms
+    _last_active_ms = ticks_ms()
 
 
-def update_pressure(api:lcd_api, pressure: int):
-    api.cursor_move_to(0,8)
+def set_backlight_timeout(timeout_sec:float):
+    """
+    **Change the timeout of async_backlight_idle(), also while it's running**
+    """
+    global _backlight_timeout_ms
+    _backlight_timeout_ms = int(timeout_sec * 1000)
 
-    if pressure >= 9999:
-        api.print("9999")
-    elif pressure <= -999:
-        api.print("-999")
-    else:
-        api.print(f"{pressure}    "[0:4])   # add space to clear value when digits not enough
+
+async def async_backlight_idle(api:lcd_api, timeout_sec:float, check_interval_sec:float = 0.2):
+    """
+    **Turn background-light off after idle and on when woken**
+
+    Values changed on the main page and wake() are activities.
+    :param timeout_sec: seconds without activity to turn off, change it by set_backlight_timeout().
+    :param check_interval_sec: seconds to check activity.
+    """
+    is_on = True
+    set_backlight_timeout(timeout_sec)
+
+    while True:
+        is_idle = ticks_diff(ticks_ms(), _last_active_ms) >= _backlight_timeout_ms
+
+        if is_idle == is_on:
+            is_on = not is_idle
+            api.turn_on_backlight_or_off(is_on)
+
+        await sleep(check_interval_sec)
+
+
+def update_temp(api:lcd_api, temp: float):
+    if TEMP_FIELD.update(api, temp): wake()
+
+
+def update_pressure(api:lcd_api, pressure: int):
+    if PRESSURE_FIELD.update(api, pressure): wake()
 
 
 def update_soil_moisture(api:lcd_api, moisture: float):
-    api.cursor_move_to(1,1)
+    if MOISTURE_FIELD.update(api, moisture): wake()
 
-    if moisture >= 1:
-        api.print("100 ")   # add space to clear value when digits not enough
-    else:
-        api.print(f"{(moisture * 100):.1f}    "[0:4])   # add space to clear value when digits not enough
+
+def update_rssi(api:lcd_api, rssi: int|None):
+    RSSI_FIELD.update(api, rssi)
+
+
+def update_uptime(api:lcd_api, uptime_ms: int):
+    UPTIME_FIELD.update(api, uptime_ms / 3600000)
 
 
 def update_wifi_level(api:lcd_api, level: bool|None):
@@ -234,8 +354,8 @@ def update_wifi_level(api:lcd_api, level: bool|None):
         None: DISCONNECT
     """
     if level is None:
-        api.write_custom_char(FrameBuffer(bytearray(WIFI_DISCONNECT_ICON), 5, 8, MONO_HLSB), 0)
+        api.write_custom_char_rows(WIFI_FRAMES, 0, WIFI_FRAME_DISCONNECT << 3)
     elif level:
-        api.write_custom_char(FrameBuffer(bytearray(WIFI_CONNECTED_HIGH_ICON), 5, 8, MONO_HLSB), 0)
+        api.write_custom_char_rows(WIFI_FRAMES, 0, WIFI_FRAME_HIGH << 3)
     else:
-        api.write_custom_char(FrameBuffer(bytearray(WIFI_CONNECTED_LOW_ICON), 5, 8, MONO_HLSB), 0)
\ No newline at end of file
+        api.write_custom_char_rows(WIFI_FRAMES, 0, WIFI_FRAME_LOW << 3)
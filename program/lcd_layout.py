@@ -0,0 +1,240 @@
+from lib.HD44780_Driver.lcd_1602_api import lcd_api
+from micropython import const
+
+
+ALIGN_LEFT = const(0)
+ALIGN_RIGHT = const(1)
+
+_SPACE = const(0x20)
+_MINUS = const(0x2D)
+_DOT = const(0x2E)
+_ZERO = const(0x30)
+
+
+def _put_int(buffer:bytearray, pos:int, number:int) -> int:
+    """
+    Write a non-negative int as digits from pos, stop at the buffer end.
+    :return: position after the last digit.
+    """
+    divisor = 1
+    while divisor * 10 <= number:
+        divisor *= 10
+
+    while divisor > 0 and pos < len(buffer):
+        buffer[pos] = _ZERO + number // divisor % 10
+        pos += 1
+        divisor //= 10
+
+    return pos
+
+
+def fixed(decimals:int, low:int, high:int):
+    """
+    **Formatter of a fixed-point number**
+
+    Value is clamped between low and high. Decimals are dropped if the field is not wide enough.
+    :param decimals: digits after the dot.
+    :param low: min value to show.
+    :param high: max value to show.
+    :return: formatter(value, buffer) -> length
+    """
+    scale = 10 ** decimals
+
+    def formatter(value, buffer:bytearray) -> int:
+        if value >= high: value = high
+        elif value <= low: value = low
+
+        scaled = int(value * scale + (0.5 if value >= 0 else -0.5))
+        pos = 0
+
+        if scaled < 0:
+            buffer[0] = _MINUS
+            pos = 1
+            scaled = -scaled
+
+        pos = _put_int(buffer, pos, scaled // scale)
+
+        if decimals > 0 and pos + 1 < len(buffer):  # need room for dot and a digit at least
+            buffer[pos] = _DOT
+            pos += 1
+
+            fraction = scaled % scale
+            divisor = scale // 10
+            while divisor > 0 and pos < len(buffer):
+                buffer[pos] = _ZERO + fraction // divisor % 10
+                pos += 1
+                divisor //= 10
+
+        return pos
+
+    return formatter
+
+
+def percent(decimals:int):
+    """
+    **Formatter of a ratio from 0 to 1 as percentage**
+
+    :param decimals: digits after the dot.
+    :return: formatter(value, buffer) -> length
+    """
+    format_fixed = fixed(decimals, 0, 100)
+
+    def formatter(value, buffer:bytearray) -> int:
+        return format_fixed(value * 100, buffer)
+
+    return formatter
+
+
+class Field:
+    """
+    **A value on screen**
+
+    Declared once with its position, icon, unit, width, alignment and formatter. The value is
+    formatted into a reusable buffer and only changed cells are written to the display.
+    """
+
+    row:int = 0
+    col:int = 0
+    width:int = 4
+    icon:int|str|None = None
+    unit:int|str|None = None
+    align:int = ALIGN_LEFT
+    formatter = None
+
+    _buffer:bytearray = None
+    _shown:bytearray = None
+
+    def __init__(self, row:int, col:int, width:int, formatter, icon:int|str|None = None,
+                 unit:int|str|None = None, align:int = ALIGN_LEFT) -> None:
+        """
+        **Constructor of field**
+
+        :param row: row of the first value cell.
+        :param col: column of the first value cell.
+        :param width: cells of value.
+        :param formatter: function formatter(value, buffer) -> length, see fixed() and percent().
+        :param icon: custom char index or string before value. None is no icon.
+        :param unit: custom char index or string after value. None is no unit.
+        :param align: ALIGN_LEFT or ALIGN_RIGHT.
+        """
+        self.row = row
+        self.col = col
+        self.width = width
+        self.formatter = formatter
+        self.icon = icon
+        self.unit = unit
+        self.align = align
+
+        self._buffer = bytearray(width)
+        self._shown = bytearray(width)
+
+
+    def invalidate(self) -> None:
+        """
+        **Force next update to write all cells**
+        """
+        for i in range(self.width):
+            self._shown[i] = 0
+
+
+    def update(self, api:lcd_api, value) -> bool:
+        """
+        **Show a new value**
+
+        Only the cells between the first and the last changed one are written.
+        :param value: value to format. None is showing dashes.
+        :return: True if any cell changed.
+        """
+        buffer = self._buffer
+
+        if value is None:
+            for i in range(self.width):
+                buffer[i] = _MINUS
+            length = self.width
+        else:
+            length = self.formatter(value, buffer)
+
+        if self.align == ALIGN_RIGHT and length < self.width:
+            shift = self.width - length
+            for i in range(self.width - 1, shift - 1, -1):
+                buffer[i] = buffer[i - shift]
+            for i in range(shift):
+                buffer[i] = _SPACE
+        else:
+            for i in range(length, self.width):
+                buffer[i] = _SPACE  # clear value when digits not enough
+
+        shown = self._shown
+        first = 0
+        while first < self.width and buffer[first] == shown[first]:
+            first += 1
+
+        if first == self.width: return False    # nothing changed
+
+        last = self.width
+        while buffer[last - 1] == shown[last - 1]:
+            last -= 1
+
+        api.cursor_move_to(self.row, self.col + first)
+        api.print_bytes(buffer, first, last)
+
+        for i in range(first, last):
+            shown[i] = buffer[i]
+
+        return True
+
+
+def _print_static(api:lcd_api, content:int|str) -> None:
+    if isinstance(content, int):
+        api.print_custom_char(content)
+    else:
+        api.print(content)
+
+
+class Layout:
+    """
+    **A screen composed of static contents and fields**
+
+    Static contents, icons and units are rendered once by render_static(), then use Field.update()
+    to write values.
+    """
+
+    fields:tuple = ()
+    statics:tuple = ()
+
+    def __init__(self, fields:tuple, statics:tuple = ()) -> None:
+        """
+        **Constructor of layout**
+
+        :param fields: Field objects.
+        :param statics: (row, col, content) of static contents. content is a custom char index or string.
+        """
+        self.fields = fields
+        self.statics = statics
+
+
+    def render_static(self, api:lcd_api, clear:bool = True) -> None:
+        """
+        **Clear screen and render static contents**
+
+        All fields will be written fully by their next update.
+        :param clear: True is clearing screen first. Use False to render other layouts on the same screen,
+        like other pages in the off-screen columns.
+        """
+        if clear:
+            api.clear()
+
+        for row, col, content in self.statics:
+            api.cursor_move_to(row, col)
+            _print_static(api, content)
+
+        for field in self.fields:
+            if field.icon is not None:
+                api.cursor_move_to(field.row, field.col - 1)
+                _print_static(api, field.icon)
+
+            if field.unit is not None:
+                api.cursor_move_to(field.row, field.col + field.width)
+                _print_static(api, field.unit)
+
+            field.invalidate()
@@ -11,7 +11,7 @@ class General_HAL :
 
     pins:dict[str, any]
 
-    def init_manually(self):
+    def init_manually(self, is_powered:bool = False):
         pass
 
     def write(self, RS_level: int, DBs_level: int, delay_cycles:int = 10):
@@ -19,3 +19,6 @@ class General_HAL :
 
     def read(self, RS_level:int, delay_cycles:int = 10) -> int:
         pass
+
+    def set_backlight(self, is_on:bool) -> None:
+        pass
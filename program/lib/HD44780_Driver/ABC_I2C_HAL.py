@@ -31,20 +31,37 @@ class I2C_HAL(General_HAL):
 
     address:int = None
 
+    backlight:int = 1
+    """**Backlight level merged into every write.** 0 is off, otherwise is on."""
+
     def __init__(self, i2c:I2C, address:int) -> None:
         self.pins = {"I2C": i2c}
         self.address = address
         self.pins['I2C'].writeto(self.address, (0x08).to_bytes(1))
 
+    # @abstractmethod
+    def set_backlight(self, is_on:bool) -> None:
+        """
+        **Turn backlight on or off**
+
+        The level is kept and merged into every next write, so it's no need to write a nibble.
+        NOTE: Every I2C board may have difference of pin defined. Reference to factory's information.
+        :param is_on: True is on and False is off.
+        """
+        raise RuntimeError("Need to override.")
+
 
-    def init_manually(self) -> None:
+    def init_manually(self, is_powered:bool = False) -> None:
         """
         **Initialization HD44780 in 4pin mode**
 
         Inner reset circuit will work if the power conditions correctly, if not sure that always init manually
         before run.
+        :param is_powered: True is skipping the wait after Vcc, when it's already waited, like by
+        lcd_async.async_init().
         """
-        sleep_ms(40)  # wait more than 40ms after Vcc to 2.7V
+        if not is_powered:
+            sleep_ms(40)  # wait more than 40ms after Vcc to 2.7V
 
         self.write_4bit_i2c(RS_level=0, DBs_level=0b0011, delay_cycles=0)
 
@@ -59,7 +76,7 @@ class I2C_HAL(General_HAL):
         self.write_4bit_i2c(RS_level=0, DBs_level=0b0010, delay_cycles=10)
 
         # @abstractmethod
-    def write_4bit_i2c(self, RS_level:int, DBs_level:int, delay_cycles:int = 10, BG_level:int = 1) -> None:
+    def write_4bit_i2c(self, RS_level:int, DBs_level:int, delay_cycles:int = 10, BG_level:int|None = None) -> None:
         """
         **Write instructions to GPIO**
 
@@ -69,7 +86,7 @@ class I2C_HAL(General_HAL):
         :param RS_level: RS pin level. 0 is LOW, otherwise is HIGH
         :param DBs_level: DB Pins level. From high bit DB7 to low bit DB0.
         :param delay_cycles: Delay cycles
-        :param BG_level: Background control. 0 is close, otherwise is on
+        :param BG_level: Background control. 0 is close, otherwise is on. None is self.backlight.
         """
         raise RuntimeError("Need to override.")
 
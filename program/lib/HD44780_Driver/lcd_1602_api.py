@@ -29,7 +29,11 @@ class lcd_api:
     """
     **Apis for 1602 Dot Matrix Display with HD44780**
 
-    For operating hardware directly, use lcd_api.board or lcd_api.driver.
+    For operating hardware directly, use lcd_api.board or lcd_api.driver, then call
+    lcd_api.forget_address() because the address counter may be changed.
+
+    The HD44780's address counter is modeled, including DDRAM or CGRAM mode, increment direction and
+    line wrap from 0x27 to 0x40, so setting address is skipped when the counter is already there.
     """
 
     board:General_HAL = None
@@ -38,42 +42,129 @@ class lcd_api:
     _cursor_enable:bool = False
     _cursor_blink:bool = False
     _display_on:bool = True
+    _backlight_on:bool = True
     _cursor_offset = 0
     _display_offset = 0
+    _cursor_increment:bool = True
+
+    _address:int = -1
+    """**Modeled address counter of HD44780.** -1 is unknown."""
+    _address_in_cgram:bool = False
 
-    def __init__(self, board:General_HAL) -> None:
+    def __init__(self, board:General_HAL, is_init:bool = True) -> None:
         """
         **Constructor of Apis**
 
         :param board: A General_HAL object. This should be extended from the ABC_*_HAL class.
         Example see ./HAL/pyb_GPIO4_HAL.py.
+        :param is_init: False is not initializing HD44780 here, call lcd_api.init() or lcd_async.async_init()
+        before any other call.
         """
         self.board = board
-        self.board.init_manually()
-
         self.driver = HD44780_Driver(self.board)
+
+        if is_init:
+            self.init()
+
+
+    def init(self, is_powered:bool = False) -> None:
+        """
+        **Initialize HD44780 and turn on the display with the modeled state**
+
+        :param is_powered: True is skipping the wait after Vcc, see General_HAL.init_manually().
+        """
+        self.board.init_manually(is_powered)
         self.driver.function_set(is_length_8bit= len(self.board.pins) == 11,   # use 8 bit
                                  is_display_2lines=True,
                                  is_font_5x10dot=False)
         self.turn_on_display_or_off(False)
-        self.driver.clear_display()
+        self.clear()
         self.entry_mode_setting(True, False)
         self.driver.display_control(self._display_on, self._cursor_enable, self._cursor_blink)
         self.turn_on_display_or_off(True)
 
 
+    def forget_address(self) -> None:
+        """
+        **Mark the address counter unknown**
+
+        Call it after operating lcd_api.driver directly, then the next address won't be skipped.
+        """
+        self._address = -1
+
+    @staticmethod
+    def _moved_dd_address(address:int, move_right:bool) -> int:
+        """
+        DDRAM address after moving one char, same as HD44780 in 2 lines mode.
+        """
+        if move_right:
+            return 0x40 if address == 0x27 else 0x00 if address == 0x67 else address + 1
+        else:
+            return 0x67 if address == 0x00 else 0x27 if address == 0x40 else address - 1
+
+    def _next_address(self, address:int) -> int:
+        """
+        Address after reading or writing RAM.
+        """
+        if self._address_in_cgram:
+            return (address + (1 if self._cursor_increment else -1)) & 0x3F
+
+        return self._moved_dd_address(address, self._cursor_increment)
+
+    def _advance(self) -> None:
+        """
+        Update modeled address counter and cursor after reading or writing RAM.
+        """
+        if self._address >= 0:
+            self._address = self._next_address(self._address)
+
+        if not self._address_in_cgram:
+            self._cursor_offset = (self._cursor_offset + (1 if self._cursor_increment else -1)) % 80
+
+    def _set_dd_address(self, address:int) -> None:
+        if self._address == address and not self._address_in_cgram: return
+
+        self.driver.set_dd_ram(address)
+        self._address = address
+        self._address_in_cgram = False
+
+    def _set_cg_address(self, address:int) -> None:
+        if self._address == address and self._address_in_cgram: return
+
+        self.driver.set_cg_ram(address)
+        self._address = address
+        self._address_in_cgram = True
+
+    def _sync_cursor(self) -> None:
+        """
+        Set DDRAM address to the cursor if the address counter isn't there.
+        """
+        offset = self._cursor_offset % 80
+        self._set_dd_address(0x40 * (offset // 40) + offset % 40)
+
     def turn_on_display_or_off(self, is_on: bool|None=None) -> None:
         """
         **Control display or off**
 
         NOTICE: This is NOT control background-light. Background-light is independently controlling
-        by other pins. If I2C board used, use ABC_I2C_HAL.write_4bit_i2c(**args, BG_level)
+        by other pins. Use lcd_api.turn_on_backlight_or_off() instead.
         :param is_on: Turn on display or off. True is on and False is off, None is switching between
          on and off.
         """
         self._display_on = not self._display_on if is_on is None else is_on
         self.driver.display_control(self._display_on, self._cursor_enable, self._cursor_blink)
 
+    def turn_on_backlight_or_off(self, is_on: bool|None=None) -> None:
+        """
+        **Control background-light on or off**
+
+        NOTICE: Only supported if the HAL could control background-light, like I2C board. Otherwise, do nothing.
+        :param is_on: Turn on background-light or off. True is on and False is off, None is switching between
+         on and off.
+        """
+        self._backlight_on = not self._backlight_on if is_on is None else is_on
+        self.board.set_backlight(self._backlight_on)
+
     def enable_cursor_or_disable(self, is_enable: bool|None=None) -> None:
         """
         **Enable cursor or not**
@@ -100,6 +191,9 @@ class lcd_api:
         self.driver.clear_display()
         self._cursor_offset = 0
         self._display_offset = 0
+        self._address = 0
+        self._address_in_cgram = False
+        self._cursor_increment = True   # clear display also set cursor increment
 
     def cursor_to_home(self) -> None:
         """
@@ -108,13 +202,17 @@ class lcd_api:
         self.driver.return_home()
         self._cursor_offset = 0
         self._display_offset = 0
+        self._address = 0
+        self._address_in_cgram = False
 
     def cursor_move_left(self) -> None:
         """
         **Move cursor one char to the left**
         """
+        self._sync_cursor()
         self.driver.cursor_or_display_shift(True, False)
-        self._cursor_offset -= 1 if self._cursor_offset >= 0 else 0
+        self._address = self._moved_dd_address(self._address, False)
+        self._cursor_offset = (self._cursor_offset - 1) % 80
 
 
     def cursor_move_right(self, auto_return:bool = False) -> None:
@@ -123,8 +221,10 @@ class lcd_api:
         :param auto_return: If move next line when cursor to line end. The end is 16 chars and
         NOT 40 chars. True is enabled and False is disabled.
         """
+        self._sync_cursor()
         self.driver.cursor_or_display_shift(True, True)
-        self._cursor_offset += 1 if self._cursor_offset <= 80 else 0
+        self._address = self._moved_dd_address(self._address, True)
+        self._cursor_offset = (self._cursor_offset + 1) % 80
         if auto_return and self._cursor_offset == 16:
             self.cursor_move_to(1, 0)
 
@@ -157,7 +257,7 @@ class lcd_api:
         else:
             address = 0x40 * row + col
 
-        self.driver.set_dd_ram(address)
+        self._set_dd_address(address)
         self._cursor_offset = row * 40 + col
 
     def cursor_return(self) -> None:
@@ -189,13 +289,16 @@ class lcd_api:
         :param is_scroll_content: True is move content after typing and False is not.
         """
         self.driver.entry_mode_set(cursor_increment, is_scroll_content)
+        self._cursor_increment = cursor_increment
 
     def print_char(self, char:int) -> None:
         """
         **Print char**
         :param char: char's code in ROM.
         """
+        self._sync_cursor()
         self.driver.write_data_to_ram(char)
+        self._advance()
 
     def write_custom_char(self, char:FrameBuffer, index:int) -> None:
         """
@@ -207,9 +310,9 @@ class lcd_api:
         if index not in range(0, 8):
             raise RuntimeError("Index out of range. Index must be between 0 and 7")
 
-        for i in range(0, 8):
-            self.driver.set_cg_ram( (index << 3) + i )
+        self._set_cg_address(index << 3)
 
+        for i in range(0, 8):
             char_single_line = 0
             char_single_line += char.pixel(0, i) << 4
             char_single_line += char.pixel(1, i) << 3
@@ -218,8 +321,42 @@ class lcd_api:
             char_single_line += char.pixel(4, i)
 
             self.driver.write_data_to_ram(0b000 + char_single_line)
+            self._advance()
+
+        self._cursor_return_if_shown()
 
-        self.cursor_return()  # set DDRAM address before write
+
+    def write_custom_char_rows(self, rows:bytes, index:int, offset:int = 0) -> None:
+        """
+        **Write custom char rows to ram**
+
+        Faster than write_custom_char() and no object allocated. Set CGRAM address once and write 8 rows,
+        the address counter increases automatically. Pre-calculate rows once and use it for animation.
+        :param rows: bytes or bytearray which every byte is a row of custom char in 5 low bits, like
+        0b00000100 is the middle pixel lighted.
+        :param index: Index to write to CGRAM, only 8 custom chars supported. Start
+        from 0, Max is 7.
+        :param offset: Index of first row in rows. Use to store many chars in one bytes, 8 rows per char.
+        """
+        if index not in range(0, 8):
+            raise RuntimeError("Index out of range. Index must be between 0 and 7")
+
+        self._set_cg_address(index << 3)
+
+        for i in range(offset, offset + 8):
+            self.driver.write_data_to_ram(rows[i])
+            self._advance()
+
+        self._cursor_return_if_shown()
+
+
+    def _cursor_return_if_shown(self) -> None:
+        """
+        Cursor is shown at the address counter, so move back after writing CGRAM if cursor is shown.
+        Otherwise, DDRAM address will be set before next printing.
+        """
+        if self._cursor_enable or self._cursor_blink:
+            self.cursor_return()
 
 
     def print_custom_char(self, index:int, auto_return:bool = False) -> None:
@@ -235,9 +372,7 @@ class lcd_api:
         if auto_return and self._cursor_offset == 16:
             self.cursor_move_to(1, 0)
 
-        self.cursor_return()  # set DDRAM address before write
-        self.driver.write_data_to_ram(0b000 + index)
-        self._cursor_offset += 1
+        self.print_char(0b000 + index)
 
 
     def print(self, content:str, auto_return:bool = False) -> None:
@@ -261,7 +396,20 @@ class lcd_api:
             else:
                 raise RuntimeError(f"Unknown char: {char}")
 
-            self._cursor_offset += 1
+
+    def print_bytes(self, content:bytes, start:int = 0, end:int|None = None) -> None:
+        """
+        **Print char codes**
+
+        No object allocated and no char checked, use to print a pre-formatted buffer.
+        :param content: bytes or bytearray of char codes in ROM.
+        :param start: Index of first char in content.
+        :param end: Index after last char in content. None is the end of content.
+        """
+        for i in range(start, len(content) if end is None else end):
+            self._sync_cursor()     # only set once, address counter follows the cursor after writing
+            self.driver.write_data_to_ram(content[i])
+            self._advance()
 
 
     def is_busy(self) -> bool:
@@ -270,7 +418,7 @@ class lcd_api:
         :return: True is busy and False is prepared to receive instruction.
         """
         busy, _ = self.driver.read_busy_flag_and_address()
-        return not busy
+        return busy
 
     def ram_counter(self) -> int:
         """
@@ -285,4 +433,7 @@ class lcd_api:
         **Get RAM data**
         :return: Data of RAM.
         """
-        return self.driver.read_data_from_ram()
\ No newline at end of file
+        self._sync_cursor()
+        data = self.driver.read_data_from_ram()
+        self._advance()
+        return data
\ No newline at end of file
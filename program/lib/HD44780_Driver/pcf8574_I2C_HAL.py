@@ -20,13 +20,20 @@ class pcf8574_I2C_HAL(I2C_HAL):
     def __init__(self, i2c:I2C, address:int) -> None:
         super().__init__(i2c, address)
 
+    def set_backlight(self, is_on:bool) -> None:
+        self.backlight = 1 if is_on else 0
+
+        # Only one byte and E pin keeps LOW, so nothing is sent to HD44780.
+        self.pins["I2C"].writeto(self.address,
+                                 (self.backlight << 3).to_bytes(1))
+
     def read_4bit_i2c(self, RS_level: int, delay_cycles: int = 10) -> int:
 
-        data = ( 1 << 3                         # 3 bit is Background light
+        data = ( self.backlight << 3            # 3 bit is Background light
                  # | 0 << 2                     # 2 bit is E Pin
                  | 1 << 1                       # 1 bit is RW Pin
-                 | 1 if RS_level else 0         # 0 bit is RS Pin
-                 # | 0x00                       # 7~4 bit is DB7, DB6, DB5, DB4
+                 | (1 if RS_level else 0)       # 0 bit is RS Pin
+                 | 0xF0                         # 7~4 bit HIGH, so HD44780 can drive DB7~DB4
                  )
 
         self.pins["I2C"].writeto(self.address,
@@ -43,10 +50,12 @@ class pcf8574_I2C_HAL(I2C_HAL):
 
         sleep_us(4) # need max 4μs to output from PCF8574
 
-        return (self.pins["I2C"].readfrom(self.address, 1)) >> 4
+        return self.pins["I2C"].readfrom(self.address, 1)[0] >> 4
+
 
+    def write_4bit_i2c(self, RS_level:int, DBs_level:int, delay_cycles:int = 10, BG_level:int|None = None) -> None:
 
-    def write_4bit_i2c(self, RS_level:int, DBs_level:int, delay_cycles:int = 10, BG_level:int = 1) -> None:
+        if BG_level is None: BG_level = self.backlight
 
         data = ( ((DBs_level & 0x0F) << 4)        # 7~4 bit is DB7, DB6, DB5, DB4
                  | ((1 << 3) if BG_level else 0)  # 3 bit is Background light
@@ -1,63 +1,95 @@
-import network_control as network
-from network import WLAN, STA_IF
-from lib.BMP180_Driver.BMP180_driver import BMP180Driver
-from machine import I2C, Pin, ADC, unique_id
+from machine import I2C, Pin, ADC, unique_id, reset
+from config import Config, load_config, save_config, parse_command, RUNTIME_KEYS
 import lcd_control as lcd
-from asyncio import sleep, run, create_task
+import instrumentation as instrument
+import heap
+from asyncio import sleep, run, create_task, gather
 from lib.HD44780_Driver.lcd_1602_api import lcd_api
+from lib.HD44780_Driver.lcd_1602_async import lcd_async
 from lib.HD44780_Driver.pcf8574_I2C_HAL import pcf8574_I2C_HAL
-from umqtt.simple import MQTTClient
-from binascii import hexlify
+from time import ticks_ms, ticks_diff
+from json import dumps
+from os import stat
 
-PASSWORD = "PASSWORD"
-SSID = "SSID"
-MQTT_BROKER_IP = "192.168.31.194"
-MQTT_BROKER_PORT = 1883
+# Only modules to show the UI are imported here. Compiling a module takes a while on the board, so sensor
+# drivers are imported by async_start(), network_control after the first reading is shown, and umqtt.simple
+# after WI-FI is up.
 
-api = lcd_api( pcf8574_I2C_HAL(I2C(scl=Pin(14), sda=Pin(2), freq=100000), 0x27) )
-wlan = WLAN(STA_IF)
+try:
+    config = load_config()  # settings of this device in config.json, the same main.py runs on every device
+except ValueError as error:     # still boot, so the file could be fixed by a command or over the air
+    print(f"config.json ignored, using defaults: {error}")
+    config = Config()
+
+# Long-lived objects are allocated once, here, by async_start() and start_network(), before heap.init()
+i2c = I2C(scl=Pin(config.i2c_scl), sda=Pin(config.i2c_sda), freq=config.i2c_freq)
+api = lcd_async( lcd_api( pcf8574_I2C_HAL(i2c, config.lcd_address), is_init=False ), batch=config.lcd_batch )   # initialized by async_start()
+calibration_button = Pin(0, Pin.IN, Pin.PULL_UP)   # FLASH button, active low
+
+bmp180 = None           # by async_init_sensors()
+moisture_sensor = None  # by async_start()
+network = None          # network_control, by start_network()
+wlan = None
+network_manager = None
+rssi_tracker = None
 
 
 def get_temp_and_pressure() -> (float, int):
-    bmp180 = BMP180Driver(I2C(scl=Pin(14), sda=Pin(2), freq=100000), 0x77)
+    start = instrument.begin()
 
     temperature = bmp180.get_temperature()
-    pressure = bmp180.get_pressure(oversampling_mode=bmp180.OVERSAMPLING_1_TIME)
+    pressure = bmp180.get_pressure(oversampling_mode=config.bmp180_oss)
 
+    instrument.end(instrument.STAGE_BMP180, start)
     return temperature, pressure
 
 
-def get_soil_moisture() -> float:
-    # soil moisture sensor value need fixed
-    offset_min = 150    # min value or in water, larger will be more close to 1
-    offset_max = 250    # max value or in air, smaller will be more close to 0
-
-    # raw data 0 is wet and 1 is dry
-    result_fixed = 1 - ( (ADC(0).read() - offset_min) / (offset_max - offset_min) )
+async def async_get_soil_moisture() -> float:
+    start = instrument.begin()
+    moisture = await moisture_sensor.async_read()
+    instrument.end(instrument.STAGE_MOISTURE, start)
+    return moisture
 
-    # add max value limit
-    return 0 if result_fixed <= 0 else 1 if result_fixed >= 1 else result_fixed
-
-def update_data(temperature: float, pressure: int, moisture: float):
+def update_data(temperature: float, pressure: int, moisture: float, uptime_ms: int):
+    start = instrument.begin()
     lcd.update_temp(api, temperature)
     lcd.update_pressure(api, pressure)
     lcd.update_soil_moisture(api, moisture)
+    lcd.update_rssi(api, None if rssi_tracker is None else rssi_tracker.rssi())
+    lcd.update_uptime(api, uptime_ms)
+    instrument.end(instrument.STAGE_DISPLAY, start)
 
 
-async def async_try_to_connect():
-    animation_task =  create_task(lcd.async_animation_wifi_connecting(api))
+def on_lcd_batch(start: int, commands: int):
+    instrument.end(instrument.STAGE_LCD_IO, start)
+    instrument.count(instrument.COUNTER_LCD_COMMANDS, commands)
 
-    try:
-        await network.async_connect(wlan, SSID, PASSWORD, 1)
 
-    finally:
-        animation_task.cancel()
-        update_wifi_level()
+wifi_animation_task = None
+wifi_connected = False
+
+
+def on_network_state(state: int):
+    global wifi_animation_task, wifi_connected
+
+    if wifi_connected and state != network.STATE_CONNECTED:
+        instrument.count(instrument.COUNTER_WIFI_LOST)
+    wifi_connected = state == network.STATE_CONNECTED
 
+    if state == network.STATE_CONNECTING:
+        if wifi_animation_task is None or wifi_animation_task.done():
+            wifi_animation_task = create_task(lcd.async_animation_wifi_connecting(api))
+        return
 
-def update_wifi_level():
-    level = network.get_level(wlan)
+    if wifi_animation_task is not None:
+        wifi_animation_task.cancel()
+        wifi_animation_task = None
 
+    rssi_tracker.sample()
+    update_wifi_level(rssi_tracker.level)  # redraw, the icon was overwritten by animation
+
+
+def update_wifi_level(level: int|None):
     if level is None:
         lcd.update_wifi_level(api, None)
 
@@ -67,9 +99,15 @@ def update_wifi_level():
         lcd.update_wifi_level(api, False)
 
 
-async def async_upload_data(temperature: float, pressure: int, moisture: float):
-    uploading_animate_task = create_task(lcd.async_animation_updating(api))
-    DISCOVER_PAYLOAD = """{
+last_diagnostics_ms = None
+
+MQTTClient = None       # by import_mqtt()
+CLIENT_ID = None
+DISCOVER_TOPIC = None
+COMMAND_TOPIC = None    # {"id": 1, "set": {"period_sec": 30}} of config.RUNTIME_KEYS, or {"id": 2, "update": url}
+RESPONSE_TOPIC = None   # {"id": 1, "ok": true, "config": {...}} or {"id": 1, "ok": false, "error": "..."}
+COMMAND_CHECKS = 6      # non-blocking checks of commands in the wait after uploading
+DISCOVER_PAYLOAD = """{
     "dev": {
     "ids": "000000",
     "name": "MicroPython",
@@ -105,26 +143,179 @@ async def async_upload_data(temperature: float, pressure: int, moisture: float):
       "unit_of_measurement":"%",
       "value_template":"{{ (value_json.soil_moisture * 100) | round(1) }}",
       "unique_id":"soil_moisture_pyb"
+    },
+    "rssi_pyb": {
+      "name": "RSSI/信号强度",
+      "p": "sensor",
+      "device_class": "signal_strength",
+      "entity_category": "diagnostic",
+      "unit_of_measurement":"dBm",
+      "value_template":"{{ value_json.rssi.mean | round(0) }}",
+      "json_attributes_topic": "micropy/sensor",
+      "json_attributes_template":"{{ value_json.rssi | tojson }}",
+      "unique_id":"rssi_pyb"
+    },
+    "heap_free_pyb": {
+      "name": "Free heap/剩余内存",
+      "p": "sensor",
+      "entity_category": "diagnostic",
+      "unit_of_measurement":"B",
+      "state_topic": "micropy/diagnostics",
+      "value_template":"{{ value_json.heap.free }}",
+      "json_attributes_topic": "micropy/diagnostics",
+      "json_attributes_template":"{{ value_json | tojson }}",
+      "unique_id":"heap_free_pyb"
+    },
+    "cycle_max_pyb": {
+      "name": "Loop max time/循环最长耗时",
+      "p": "sensor",
+      "entity_category": "diagnostic",
+      "unit_of_measurement":"ms",
+      "state_topic": "micropy/diagnostics",
+      "value_template":"{{ (value_json.span.cycle[2] / 1000) | round(1) }}",
+      "unique_id":"cycle_max_pyb"
+    },
+    "upload_errors_pyb": {
+      "name": "Upload errors/上传失败",
+      "p": "sensor",
+      "entity_category": "diagnostic",
+      "state_class": "total_increasing",
+      "state_topic": "micropy/diagnostics",
+      "value_template":"{{ value_json.cnt.upload_errors }}",
+      "unique_id":"upload_errors_pyb"
     }
   },
   "state_topic": "micropy/sensor",
   "qos": 0
-}"""
+}""".encode()    # encoded once, it's the largest object of uploading
+
+
+def import_mqtt():     # deferred until uploading, which is after WI-FI is up
+    global MQTTClient, CLIENT_ID, DISCOVER_TOPIC, COMMAND_TOPIC, RESPONSE_TOPIC
+    from umqtt.simple import MQTTClient
+    from binascii import hexlify
+
+    CLIENT_ID = hexlify(unique_id())
+    DISCOVER_TOPIC = f"homeassistant/device/{CLIENT_ID.decode()}/config".encode()
+    COMMAND_TOPIC = f"micropy/{CLIENT_ID.decode()}/command".encode()
+    RESPONSE_TOPIC = f"micropy/{CLIENT_ID.decode()}/response".encode()
+
+
+command_responses = []      # by on_command() and async_update(), published in order by async_upload_data()
+update_task = None
+update_checked = False
+
 
-    mqtt = MQTTClient(client_id=hexlify(unique_id()),
-                      server=MQTT_BROKER_IP,
-                      port=MQTT_BROKER_PORT)
+async def async_update(url: str, command_id):   # download while the main loop runs, swapped by boot.py after reset
+    import ota
 
     try:
-        mqtt.connect()
+        ota.install(await ota.async_download(url), command_id)
+    except Exception as e:  # any failure is acknowledged, the board keeps running the old files
+        command_responses.append(dumps({"id": command_id, "ok": False, "error": f"Update failed: {e}"}).encode())
+        return
 
-        mqtt.publish(f"homeassistant/device/{hexlify(unique_id()).decode()}/config".encode(),
-                     DISCOVER_PAYLOAD.encode())
+    reset()
 
-        mqtt.publish("micropy/sensor".encode(),
-                     f'{{"temperature":{temperature},"pressure":{pressure},"soil_moisture":{moisture}}}'.encode())
 
-        await sleep(3)  # wait to avoid update too frequency to block the homeassistant IO
+def finish_update() -> bytes|None:     # the first upload after an update means it's healthy, see ota.finish()
+    try:
+        stat("ota.json")    # ota.OTA_FILE, not importing ota if no update
+    except OSError:
+        return None
+
+    import ota
+    response = ota.finish()
+    return None if response is None else dumps(response).encode()
+
+
+def apply_command(message: bytes) -> bytes:
+    global update_task
+
+    command_id = None
+    try:
+        command_id, command = parse_command(message)
+        if "update" in command:
+            if update_task is not None and not update_task.done():
+                raise ValueError("An update is downloading.")
+            update_task = create_task(async_update(command["update"], command_id))
+            return dumps({"id": command_id, "ok": True, "update": "downloading"}).encode()
+
+        config.update(command["set"], RUNTIME_KEYS)    # all or none
+    except ValueError as e:
+        return dumps({"id": command_id, "ok": False, "error": str(e)}).encode()
+
+    api.batch = config.lcd_batch
+    lcd.set_backlight_timeout(config.backlight_timeout_sec)    # period_sec and bmp180_oss are read every cycle
+
+    response = {"id": command_id, "ok": True, "config": config.to_dict()}
+    try:
+        save_config(config)
+    except OSError as e:
+        response["error"] = f"Applied but not saved: {e}"
+    return dumps(response).encode()
+
+
+def on_command(topic: bytes, message: bytes):    # called for every message, several may come in one subscribe()
+    command_responses.append(apply_command(message))
+
+
+async def async_upload_data(temperature: float, pressure: int, moisture: float, uptime_ms: int):
+    global last_diagnostics_ms, update_checked
+
+    if MQTTClient is None:
+        import_mqtt()
+
+    uploading_animate_task = create_task(lcd.async_animation_updating(api))
+
+    mqtt = MQTTClient(client_id=CLIENT_ID,
+                      server=config.mqtt_broker_ip,
+                      port=config.mqtt_broker_port)
+    mqtt.set_callback(on_command)
+
+    try:
+        start = instrument.begin()
+        mqtt.connect(clean_session=False)   # the broker keeps commands sent while disconnected
+        mqtt.subscribe(COMMAND_TOPIC, 1)
+        instrument.end(instrument.STAGE_MQTT_CONNECT, start)
+
+        start = instrument.begin()
+        mqtt.publish(DISCOVER_TOPIC, DISCOVER_PAYLOAD)
+
+        rssi_stats = rssi_tracker.stats()
+        rssi_payload = "" if rssi_stats is None else \
+            f',"rssi":{{"min":{rssi_stats[0]},"max":{rssi_stats[1]},"mean":{rssi_stats[2]}}}'
+
+        mqtt.publish(b"micropy/sensor",
+                     f'{{"temperature":{temperature},"pressure":{pressure},"soil_moisture":{moisture}{rssi_payload}}}'.encode())
+        rssi_tracker.reset_stats()
+        instrument.end(instrument.STAGE_MQTT_PUBLISH, start)
+        instrument.count(instrument.COUNTER_UPLOADS)
+
+        if not update_checked:
+            update_checked = True
+            response = finish_update()
+            if response is not None:
+                mqtt.publish(RESPONSE_TOPIC, response)
+
+        if instrument.enabled and (last_diagnostics_ms is None or
+                                   uptime_ms - last_diagnostics_ms >= config.diagnostics_interval_sec * 1000):
+            instrument.sample_heap(heap.largest_free_block())
+            mqtt.publish(instrument.TOPIC.encode(), instrument.payload(uptime_ms).encode())
+            instrument.reset_window()
+            last_diagnostics_ms = uptime_ms
+
+        # wait to avoid update too frequency to block the homeassistant IO, and check commands meanwhile
+        for _ in range(COMMAND_CHECKS):
+            mqtt.check_msg()    # returns at once if none, so the sampling loop runs as before
+            while command_responses:
+                mqtt.publish(RESPONSE_TOPIC, command_responses[0])
+                command_responses.pop(0)    # after publishing, so it's kept if the connection is lost
+            await sleep(3 / COMMAND_CHECKS)
+
+    except OSError:
+        instrument.count(instrument.COUNTER_UPLOAD_ERRORS)
+        raise
 
     finally:
         uploading_animate_task.cancel()
@@ -132,29 +323,100 @@ async def async_upload_data(temperature: float, pressure: int, moisture: float):
 
 
 
-async def main():
+def show_prompt(message: str):
+    print(message)
+    api.clear()
+    api.print(message, auto_return=True)
+    api.flush()     # called out of the writer task
 
-    async def dummy_task() : await sleep(0)
 
+async def async_init_display():
+    await api.async_init()
     lcd.init_ui(api)
+    api.flush()     # show the UI at once, the writer task is started after
+
+
+async def async_init_sensors():    # run in the wait of LCD after Vcc, longer delays the UI
+    global bmp180
+    from lib.BMP180_Driver.BMP180_driver import BMP180Driver
+
+    bmp180 = BMP180Driver(i2c, config.bmp180_address)
+
+
+async def async_start():    # initialize LCD and sensors in parallel, draw UI and start background tasks
+    global moisture_sensor
 
-    network_connect_task = create_task(async_try_to_connect())
+    instrument.enable(config.diagnostics_enabled)
+    if config.diagnostics_enabled:
+        api.on_batch = on_lcd_batch
+
+    await gather(async_init_display(), async_init_sensors())
+
+    from soil_moisture import SoilMoistureSensor, load_calibration   # the largest driver, after the UI is shown
+    moisture_sensor = SoilMoistureSensor(ADC(0), calibration=load_calibration(
+        offset_min=config.moisture_offset_min, offset_max=config.moisture_offset_max))
+
+    if calibration_button.value() == 0:   # hold FLASH button at boot to calibrate soil moisture sensor
+        from soil_moisture import calibrate
+        calibrate(moisture_sensor, button=calibration_button, prompt=show_prompt)
+        lcd.init_ui(api)    # prompts overwrote the UI
+
+    create_task(api.async_run())
+    create_task(lcd.async_page_rotation(api, 5))
+    create_task(lcd.async_backlight_idle(api, config.backlight_timeout_sec))
+    calibration_button.irq(trigger=Pin.IRQ_FALLING, handler=lambda pin: lcd.wake())  # press to wake
+
+
+def start_network():    # called after the first reading is shown, connecting needs a running event loop
+    global network, wlan, network_manager, rssi_tracker
+    import network_control as network
+    from network import WLAN, STA_IF
+
+    wlan = WLAN(STA_IF)
+    network_manager = network.ConnectionManager(wlan, config.ssid, config.password)
+    rssi_tracker = network.RssiTracker(wlan)
+
+    rssi_tracker.subscribe(update_wifi_level)
+    network_manager.subscribe(on_network_state)
+    create_task(network_manager.async_run())
+    create_task(rssi_tracker.async_run())
+
+    heap.init()
+
+
+async def main():
+
+    async def dummy_task() : await sleep(0)
+
+    await async_start()
     upload_data_task = create_task(dummy_task())  # Create a dummy task to avoid error
 
+    uptime_ms = 0
+    last_ticks = ticks_ms()
+
     while True:
+        now = ticks_ms()
+        uptime_ms += ticks_diff(now, last_ticks)  # accumulate, ticks_ms() wraps around
+        last_ticks = now
+        cycle_start = instrument.begin()
+
         temperature, pressure = get_temp_and_pressure()
-        moisture = get_soil_moisture()
-        update_data(temperature, pressure, moisture)
+        moisture = await async_get_soil_moisture()
+        update_data(temperature, pressure, moisture, uptime_ms)
 
-        if wlan.isconnected():
-            update_wifi_level()
+        if network_manager is None:
+            api.flush()     # show the first reading before importing network_control
+            start_network()
+        elif network_manager.is_connected():
             if upload_data_task.done(): # if last uploading not finishing, continue.
-                upload_data_task = create_task(async_upload_data(temperature, pressure, moisture))
+                upload_data_task = create_task(async_upload_data(temperature, pressure, moisture, uptime_ms))
 
-        elif network_connect_task.done():   # new next connect task when the last connect task is done
-            network_connect_task = create_task(async_try_to_connect())
+        instrument.end(instrument.STAGE_CYCLE, cycle_start)
+        heap.collect_at_idle()      # all work of this cycle is done, collect before sleeping
+        instrument.sample_heap()
 
-        await sleep(10)
+        await sleep(config.period_sec)
 
 
-run(main())
\ No newline at end of file
+if __name__ == "__main__":  # imported by simulator/benchmark.py on host
+    run(main())
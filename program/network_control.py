@@ -1,5 +1,22 @@
-from network import WLAN, STAT_CONNECTING, STAT_GOT_IP
+from network import WLAN, STAT_IDLE, STAT_CONNECTING, STAT_GOT_IP, STAT_WRONG_PASSWORD, STAT_NO_AP_FOUND
 from asyncio import sleep
+from micropython import const
+from time import ticks_ms, ticks_diff
+from random import getrandbits
+from binascii import hexlify, unhexlify
+from json import load, dump
+from os import remove
+
+
+STATE_DISCONNECTED = const(0)
+STATE_CONNECTING = const(1)
+STATE_CONNECTED = const(2)
+STATE_WRONG_PASSWORD = const(3)
+STATE_NO_AP_FOUND = const(4)
+
+CACHE_FILE = "network_cache.json"
+
+_RSSI_SCALE_SHIFT = const(4)    # smoothed rssi is kept as fixed point, rssi << 4
 
 
 def disconnect(wlan:WLAN) -> None:
@@ -56,3 +73,363 @@ def get_level(wlan:WLAN) -> int|None :
     if rssi > -50: return 2
     elif rssi > -70: return 1
     else: return 0
+
+
+class ConnectionManager:
+    """
+    **Keep WI-FI connected in background**
+
+    Run ConnectionManager.async_run() as a task. It connects with timeout, retries with exponential
+    backoff and jitter, and publishes state changes to subscribers instead of polling wlan.isconnected().
+
+    The BSSID of last good access point is cached to flash, so reconnecting skips the full
+    scan. It's found by a scan after the connection is up, only when it's not cached or the cached one
+    is gone. With reuse_ip, the last IP config is also set before connecting to skip DHCP.
+    """
+
+    wlan:WLAN = None
+    ssid:str = None
+    password:str = None
+
+    state:int = STATE_DISCONNECTED
+    failures:int = 0
+
+    timeout_sec:float = 15
+    backoff_min_sec:float = 1
+    backoff_max_sec:float = 300
+    check_interval_sec:float = 5
+    reuse_ip:bool = False
+    cache_path:str = CACHE_FILE
+
+    _subscribers:list = None
+    _bssid:bytes|None = None
+    _ifconfig:tuple|None = None
+    _scan_pending:bool = False
+
+    def __init__(self, wlan:WLAN, ssid:str, password:str, timeout_sec:float = 15,
+                 backoff_min_sec:float = 1, backoff_max_sec:float = 300, check_interval_sec:float = 5,
+                 reuse_ip:bool = False, cache_path:str = CACHE_FILE) -> None:
+        """
+        **Constructor of manager**
+
+        :param wlan: WLAN Object
+        :param ssid: connect ssid
+        :param password: connect password
+        :param timeout_sec: seconds to give up one connecting attempt.
+        :param backoff_min_sec: seconds to wait after first failure. Doubled for every next failure.
+        :param backoff_max_sec: max seconds to wait between attempts.
+        :param check_interval_sec: seconds to check whether the connection is lost.
+        :param reuse_ip: True is setting cached IP config before connecting, False is using DHCP.
+        :param cache_path: file to cache the last good access point.
+        """
+        self.wlan = wlan
+        self.ssid = ssid
+        self.password = password
+        self.timeout_sec = timeout_sec
+        self.backoff_min_sec = backoff_min_sec
+        self.backoff_max_sec = backoff_max_sec
+        self.check_interval_sec = check_interval_sec
+        self.reuse_ip = reuse_ip
+        self.cache_path = cache_path
+        self._subscribers = []
+
+        self._load_cache()
+
+
+    def subscribe(self, callback) -> None:
+        """
+        **Subscribe state changes**
+
+        :param callback: function called as callback(state) when state changed. State is one of
+        STATE_DISCONNECTED, STATE_CONNECTING, STATE_CONNECTED, STATE_WRONG_PASSWORD, STATE_NO_AP_FOUND.
+        """
+        self._subscribers.append(callback)
+        callback(self.state)
+
+
+    def is_connected(self) -> bool:
+        return self.state == STATE_CONNECTED
+
+
+    def _publish(self, state:int) -> None:
+        if state == self.state: return
+
+        self.state = state
+        for callback in self._subscribers:
+            callback(state)
+
+
+    def _load_cache(self) -> None:
+        try:
+            with open(self.cache_path, "r") as file:
+                cache = load(file)
+
+            if cache["ssid"] != self.ssid: return   # cached for other network
+
+            self._bssid = unhexlify(cache["bssid"])
+            self._ifconfig = tuple(cache["ifconfig"])
+
+        except (OSError, ValueError, KeyError, TypeError):
+            self._bssid, self._ifconfig = None, None
+
+
+    def _save_cache(self) -> None:
+        try:
+            with open(self.cache_path, "w") as file:
+                dump({"ssid": self.ssid,
+                      "bssid": hexlify(self._bssid).decode(),
+                      "ifconfig": list(self._ifconfig)}, file)
+        except OSError:
+            pass    # cache is optional
+
+
+    def _drop_cache(self) -> None:
+        self._bssid, self._ifconfig = None, None
+
+        try:
+            remove(self.cache_path)
+        except OSError:
+            pass
+
+
+    def _remember_access_point(self) -> None:
+        """
+        Cache the connected access point. Flash is written only when the IP config changed, and the BSSID
+        is left to _scan_access_point() when it's not cached.
+        """
+        ifconfig = tuple(self.wlan.ifconfig())
+
+        if self._bssid is None:
+            self._ifconfig = ifconfig
+            self._scan_pending = True
+        elif ifconfig != self._ifconfig:
+            self._ifconfig = ifconfig
+            self._save_cache()
+
+
+    def _scan_access_point(self) -> None:
+        """
+        Find the BSSID of the strongest access point of ssid and cache it. wlan.scan() blocks for seconds,
+        so it's run once after a connect without cached BSSID, one check interval later.
+        """
+        self._scan_pending = False
+
+        best_rssi = None
+        for ssid, bssid, _, rssi, *_ in self.wlan.scan():
+            if ssid.decode() == self.ssid and (best_rssi is None or rssi > best_rssi):
+                self._bssid, best_rssi = bssid, rssi
+
+        if self._bssid is not None:
+            self._save_cache()
+
+
+    def _backoff_sec(self) -> float:
+        """
+        Exponential backoff with jitter, from half to full of the backoff.
+        """
+        backoff = min(self.backoff_max_sec, self.backoff_min_sec * (1 << min(self.failures - 1, 16)))
+        return backoff * (0.5 + getrandbits(8) / 512)
+
+
+    async def _async_attempt(self) -> int:
+        """
+        Connect once and wait until connected, failed or timeout.
+        :return: wlan status. STAT_CONNECTING means timeout.
+        """
+        self.wlan.active(True)
+
+        if self.wlan.isconnected(): return STAT_GOT_IP
+
+        if self.reuse_ip and self._ifconfig is not None:
+            self.wlan.ifconfig(self._ifconfig)
+
+        if self._bssid is not None:
+            self.wlan.connect(self.ssid, self.password, bssid=self._bssid)
+        else:
+            self.wlan.connect(self.ssid, self.password)
+
+        start = ticks_ms()
+        status = self.wlan.status()
+
+        while status == STAT_CONNECTING or status == STAT_IDLE:
+            if ticks_diff(ticks_ms(), start) > self.timeout_sec * 1000:
+                self.wlan.disconnect()
+                return STAT_CONNECTING
+
+            await sleep(0.2)
+            status = self.wlan.status()
+
+        return status
+
+
+    async def async_run(self) -> None:
+        """
+        **Connect and keep connected forever**
+
+        Wrong password and no access point found are published as their own states. A wrong password is
+        retried with the max backoff, as it won't be right until changed. Others, including no access point
+        found like the router rebooting, are retried with exponential backoff.
+        """
+        while True:
+            if self.wlan.isconnected():
+                self.failures = 0
+                self._publish(STATE_CONNECTED)
+
+                while self.wlan.isconnected():
+                    await sleep(self.check_interval_sec)
+
+                    if self._scan_pending and self.wlan.isconnected():
+                        self._scan_access_point()
+
+                self._publish(STATE_DISCONNECTED)
+
+            self._publish(STATE_CONNECTING)
+            status = await self._async_attempt()
+
+            if status == STAT_GOT_IP:
+                self._remember_access_point()
+                continue
+
+            if status == STAT_NO_AP_FOUND and self._bssid is not None:
+                self._drop_cache()  # access point may be changed, retry with full scan at once
+                continue
+
+            self.failures += 1
+
+            if status == STAT_WRONG_PASSWORD:
+                self._publish(STATE_WRONG_PASSWORD)
+                await sleep(self.backoff_max_sec)
+            else:
+                self._publish(STATE_NO_AP_FOUND if status == STAT_NO_AP_FOUND else STATE_DISCONNECTED)
+                await sleep(self._backoff_sec())
+
+
+class RssiTracker:
+    """
+    **Smoothed WI-FI level with hysteresis**
+
+    Run RssiTracker.async_run() as a task. It samples rssi at its own interval, smooths it by an
+    exponential moving average and maps it to a level with hysteresis bands, so the level won't flicker
+    near the thresholds. Subscribers are only called when the level actually changes.
+    """
+
+    wlan:WLAN = None
+
+    level:int|None = None
+    """**Same as get_level(), but smoothed.** 2, 1, 0, or None when disconnected."""
+
+    rssi_min:int|None = None
+    rssi_max:int|None = None
+
+    interval_sec:float = 2
+    ema_shift:int = 2
+    hysteresis:int = 3
+    thresholds:tuple = (-70, -50)
+
+    _subscribers:list = None
+    _ema:int|None = None
+    _rssi_sum:int = 0
+    _rssi_count:int = 0
+
+    def __init__(self, wlan:WLAN, interval_sec:float = 2, ema_shift:int = 2, hysteresis:int = 3,
+                 thresholds:tuple = (-70, -50)) -> None:
+        """
+        **Constructor of tracker**
+
+        :param wlan: WLAN Object
+        :param interval_sec: seconds between samples.
+        :param ema_shift: EMA weight of new sample is 1 / 2**ema_shift. 0 is disabled EMA.
+        :param hysteresis: dBm beyond a threshold needed to change level.
+        :param thresholds: (low, high). > high is 2, > low is 1, else is 0.
+        """
+        self.wlan = wlan
+        self.interval_sec = interval_sec
+        self.ema_shift = ema_shift
+        self.hysteresis = hysteresis
+        self.thresholds = thresholds
+        self._subscribers = []
+
+
+    def subscribe(self, callback) -> None:
+        """
+        **Subscribe level changes**
+
+        :param callback: function called as callback(level) when level changed.
+        """
+        self._subscribers.append(callback)
+
+
+    def rssi(self) -> int|None:
+        """
+        :return: smoothed rssi, or None when disconnected.
+        """
+        return None if self._ema is None else self._ema >> _RSSI_SCALE_SHIFT
+
+
+    def _level_of(self, rssi:int) -> int:
+        low, high = self.thresholds
+
+        if self.level is None:
+            return 2 if rssi > high else 1 if rssi > low else 0
+
+        level = self.level
+        while level < 2 and rssi > self.thresholds[level] + self.hysteresis:
+            level += 1
+        while level > 0 and rssi <= self.thresholds[level - 1] - self.hysteresis:
+            level -= 1
+
+        return level
+
+
+    def sample(self) -> None:
+        """
+        **Sample rssi once and notify subscribers if level changed**
+        """
+        if not self.wlan.isconnected():
+            self._ema = None
+            level = None
+
+        else:
+            rssi = self.wlan.status('rssi')
+
+            self._rssi_sum += rssi
+            self._rssi_count += 1
+            if self.rssi_min is None or rssi < self.rssi_min: self.rssi_min = rssi
+            if self.rssi_max is None or rssi > self.rssi_max: self.rssi_max = rssi
+
+            if self._ema is None:
+                self._ema = rssi << _RSSI_SCALE_SHIFT
+            else:
+                self._ema += ((rssi << _RSSI_SCALE_SHIFT) - self._ema) >> self.ema_shift
+
+            level = self._level_of(self._ema >> _RSSI_SCALE_SHIFT)
+
+        if level == self.level: return
+
+        self.level = level
+        for callback in self._subscribers:
+            callback(level)
+
+
+    def stats(self) -> tuple|None:
+        """
+        **Get rssi statistics since last reset_stats()**
+
+        :return: (min, max, mean) of raw rssi, or None if not sampled.
+        """
+        if self._rssi_count == 0: return None
+        return self.rssi_min, self.rssi_max, self._rssi_sum / self._rssi_count
+
+
+    def reset_stats(self) -> None:
+        self.rssi_min, self.rssi_max = None, None
+        self._rssi_sum, self._rssi_count = 0, 0
+
+
+    async def async_run(self) -> None:
+        """
+        **Sample rssi forever**
+        """
+        while True:
+            self.sample()
+            await sleep(self.interval_sec)
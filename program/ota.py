@@ -0,0 +1,337 @@
+from machine import Timer, reset
+from hashlib import sha256
+from binascii import hexlify
+from json import load, loads, dump
+from os import listdir, mkdir, remove, rename, rmdir, stat, statvfs
+from asyncio import sleep
+import socket
+
+
+OTA_FILE = "ota.json"   # journal of an update, exists only while one is pending
+NEW_DIR = ".ota_new"    # files downloaded, moved in at the next boot
+OLD_DIR = ".ota_old"    # files replaced, moved back by a rollback
+
+STATE_SWAP = "swap"
+STATE_TRIAL = "trial"
+STATE_ROLLED_BACK = "rolled_back"
+
+PROTECTED = ("boot.py", "ota.py", "ota.mpy")    # they run the rollback, so never updated over the air
+
+CHUNK_SIZE = 512
+MANIFEST_MAX = 4096
+TIMEOUT_SEC = 10
+FREE_MARGIN = 4096      # bytes left for config and calibration files
+
+TRIAL_SEC = 300
+"""**Seconds for new files to reach healthy**, see finish(), or the board is reset and they're rolled back"""
+TRIAL_BOOTS = 1
+
+_trial_timer = None
+
+
+def _exists(path:str) -> bool:
+    try:
+        stat(path)
+        return True
+    except OSError:
+        return False
+
+
+def _make_parents(path:str) -> None:
+    parts = path.split("/")[:-1]
+    for i in range(1, len(parts) + 1):
+        directory = "/".join(parts[:i])
+        if not _exists(directory):
+            mkdir(directory)
+
+
+def _remove_tree(path:str) -> None:
+    try:
+        mode = stat(path)[0]
+    except OSError:
+        return
+
+    if mode & 0x4000:   # directory
+        for name in listdir(path):
+            _remove_tree(f"{path}/{name}")
+        rmdir(path)
+    else:
+        remove(path)
+
+
+def _load() -> dict|None:
+    try:
+        with open(OTA_FILE, "r") as file:
+            return load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _save(state:dict) -> None:
+    with open(OTA_FILE + ".tmp", "w") as file:
+        dump(state, file)
+
+    rename(OTA_FILE + ".tmp", OTA_FILE)
+
+
+def _http_get(url:str) -> (socket.socket, object, int):
+    """
+    **Send a GET request and read the headers**
+
+    :param url: like http://192.168.1.2:8000/manifest.json. HTTPS is not supported.
+    :return: (socket, stream at the body, Content-Length or -1). Close both after reading.
+    :raise ValueError: the URL is not http://.
+    :raise OSError: connecting failed, or the status is not 200.
+    """
+    scheme, _, host, path = (url.split("/", 3) + ["", "", ""])[:4]
+    if scheme != "http:" or not host:
+        raise ValueError(f"{url} is not an http:// URL.")
+
+    host, _, port = host.partition(":")
+    sock = socket.socket()
+    try:
+        sock.settimeout(TIMEOUT_SEC)
+        sock.connect(socket.getaddrinfo(host, int(port or 80))[0][-1])
+        sock.send(f"GET /{path} HTTP/1.0\r\nHost: {host}\r\n\r\n".encode())
+
+        stream = sock.makefile("rb", 0)
+        status = stream.readline().split()
+        if len(status) < 2 or status[1] != b"200":
+            raise OSError(f"HTTP {status[1].decode() if len(status) > 1 else 'error'} of /{path}.")
+
+        length = -1
+        while True:
+            line = stream.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                length = int(value)
+
+    except BaseException:
+        sock.close()
+        raise
+
+    return sock, stream, length
+
+
+def _read_manifest(url:str) -> dict:
+    sock, stream, _ = _http_get(url)
+    content = bytearray()
+    try:
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            content.extend(chunk)
+            if len(content) > MANIFEST_MAX:
+                raise ValueError(f"Manifest is more than {MANIFEST_MAX} bytes.")
+    finally:
+        stream.close()
+        sock.close()
+
+    manifest = loads(content)
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("version"), str) or \
+            not isinstance(manifest.get("files"), list):
+        raise ValueError('Manifest must be like {"version": "1.1", "files": [...]}.')
+
+    for entry in manifest["files"]:
+        path = entry.get("path") if isinstance(entry, dict) else None
+        if not isinstance(path, str) or type(entry.get("size")) is not int or \
+                not isinstance(entry.get("sha256"), str):
+            raise ValueError("Every file of manifest must have path, size and sha256.")
+        if not path or path[0] in "./" or "/." in path or path.endswith(".json") or path in PROTECTED:
+            raise ValueError(f"{path} can't be updated.")
+
+    return manifest
+
+
+async def _async_fetch(url:str, path:str, size:int, digest:str, buffer:bytearray) -> None:
+    """
+    Stream a file to NEW_DIR/path chunk by chunk, hashing every chunk as it's written.
+    """
+    new = f"{NEW_DIR}/{path}"
+    _make_parents(new)
+    sock, stream, length = _http_get(url)
+    view = memoryview(buffer)
+    hasher = sha256()
+    received = 0
+
+    try:
+        if length not in (-1, size):
+            raise ValueError(f"{path} is {length} bytes, not {size}.")
+
+        with open(new, "wb") as file:
+            while True:
+                n = stream.readinto(buffer)
+                if not n:
+                    break
+                received += n
+                if received > size:
+                    raise ValueError(f"{path} is more than {size} bytes.")
+
+                hasher.update(view[:n])
+                file.write(view[:n])
+                await sleep(0)  # the main loop and the display run between chunks
+
+    finally:
+        stream.close()
+        sock.close()
+
+    if received != size:
+        raise ValueError(f"{path} is {received} bytes, not {size}.")
+    if hexlify(hasher.digest()).decode() != digest:
+        raise ValueError(f"SHA-256 of {path} mismatches.")
+
+
+async def async_download(url:str, chunk_size:int = CHUNK_SIZE) -> dict:
+    """
+    **Download files of a manifest to NEW_DIR, verifying them while streaming**
+
+    The manifest is made by tools/ota_bundle.py, like {"version": "1.1", "files": [{"path": "main.py",
+    "size": 1024, "sha256": "..."}]}, and files are fetched from the same directory as it. A file is never
+    held in RAM, only a buffer of chunk_size is, and other tasks run between chunks.
+    :param url: http:// URL of manifest.json.
+    :return: the manifest, pass it to install().
+    :raise ValueError: the manifest or a file is wrong, or no space. Nothing downloaded is kept.
+    :raise OSError: network or filesystem error. Nothing downloaded is kept.
+    """
+    if _exists(OTA_FILE):
+        raise ValueError("An update is pending.")
+
+    _remove_tree(NEW_DIR)
+    _remove_tree(OLD_DIR)   # left by an update finished before removing it
+
+    manifest = _read_manifest(url)
+    total = sum(entry["size"] for entry in manifest["files"])
+    info = statvfs(".")
+    if info[0] * info[3] < total + FREE_MARGIN:
+        raise ValueError(f"No space for {total} bytes.")
+
+    base = url[:url.rfind("/") + 1]
+    buffer = bytearray(chunk_size)
+    try:
+        for entry in manifest["files"]:
+            await _async_fetch(base + entry["path"], entry["path"], entry["size"], entry["sha256"], buffer)
+
+    except BaseException:
+        _remove_tree(NEW_DIR)
+        raise
+
+    return manifest
+
+
+def install(manifest:dict, command_id = None) -> None:
+    """
+    **Schedule swapping downloaded files in at the next boot, then call machine.reset()**
+
+    Files are swapped by boot() before main.py imports any of them. Files replaced are kept in OLD_DIR
+    until finish(), and X.py is also moved out when X.mpy is installed, source is imported before bytecode.
+    :param manifest: returned by async_download().
+    :param command_id: id of the update command, sent back by finish().
+    """
+    files = [entry["path"] for entry in manifest["files"]]
+    backed = []
+    for path in files:
+        if _exists(path):
+            backed.append(path)
+
+        source = path[:-4] + ".py"
+        if path.endswith(".mpy") and source not in files and _exists(source):
+            backed.append(source)
+
+    _save({"state": STATE_SWAP, "id": command_id, "version": manifest["version"],
+           "files": files, "backed": backed})
+
+
+def _swap(state:dict) -> None:
+    """
+    Every step is a rename skipped if done, so it's resumed after a reset at any point.
+    """
+    for path in state["backed"]:
+        old = f"{OLD_DIR}/{path}"
+        if not _exists(old):
+            _make_parents(old)
+            rename(path, old)
+
+    for path in state["files"]:
+        new = f"{NEW_DIR}/{path}"
+        if _exists(new):
+            _make_parents(path)
+            rename(new, path)
+
+    _remove_tree(NEW_DIR)
+
+
+def _rollback(state:dict) -> None:
+    """
+    Like _swap(), resumed after a reset at any point. A file backed is restored if its backup is there.
+    """
+    for path in state["files"]:
+        if _exists(path) and (path not in state["backed"] or _exists(f"{OLD_DIR}/{path}")):
+            remove(path)
+
+    for path in state["backed"]:
+        old = f"{OLD_DIR}/{path}"
+        if _exists(old):
+            if _exists(path):
+                remove(path)
+            rename(old, path)
+
+    _remove_tree(OLD_DIR)
+
+
+def boot() -> str|None:
+    """
+    **Finish a pending update, call it in boot.py before main.py runs**
+
+    A swap interrupted by a reset is resumed. Then new files boot on trial: the board is reset after
+    TRIAL_SEC unless main.py calls finish(), and new files booted TRIAL_BOOTS times on trial are rolled back.
+    So an update crashing at import, hanging or never uploading goes back to the files before it.
+    :return: state after it, one of STATE_*, or None if no update is pending.
+    """
+    global _trial_timer
+
+    state = _load()
+    if state is None or state["state"] == STATE_ROLLED_BACK:  # reported by finish()
+        return None if state is None else state["state"]
+
+    if state["state"] == STATE_SWAP:
+        _swap(state)
+        state["state"] = STATE_TRIAL
+        state["boots"] = 0
+
+    elif state["state"] == STATE_TRIAL and state["boots"] >= TRIAL_BOOTS:
+        _rollback(state)
+        state = {"state": STATE_ROLLED_BACK, "id": state["id"], "version": state["version"]}
+
+    if state["state"] == STATE_TRIAL:
+        state["boots"] += 1
+        _trial_timer = Timer(-1)
+        _trial_timer.init(mode=Timer.ONE_SHOT, period=TRIAL_SEC * 1000, callback=lambda timer: reset())
+
+    _save(state)
+    return state["state"]
+
+
+def finish() -> dict|None:
+    """
+    **Keep new files once main.py runs well, like uploaded once, or acknowledge a rollback**
+
+    :return: the response of the update command, {"id": 1, "ok": true, "version": "1.1"} or {"id": 1,
+        "ok": false, "error": "..."}, or None if no update to finish.
+    """
+    state = _load()
+    if state is None or state["state"] == STATE_SWAP:
+        return None
+
+    if state["state"] == STATE_TRIAL:
+        if _trial_timer is not None:
+            _trial_timer.deinit()
+        response = {"id": state["id"], "ok": True, "version": state["version"]}
+    else:
+        response = {"id": state["id"], "ok": False, "error": f"Rolled back from {state['version']}."}
+
+    remove(OTA_FILE)    # the update is kept from here, backups are garbage
+    _remove_tree(OLD_DIR)
+    return response
@@ -0,0 +1,381 @@
+from array import array
+from machine import ADC, Pin
+from micropython import const
+from json import load, dump
+from time import sleep_ms, ticks_ms, ticks_diff
+from os import rename
+from asyncio import sleep
+
+
+FILTER_MEDIAN = const(0)
+FILTER_TRIMMED_MEAN = const(1)
+
+CALIBRATION_FILE = "soil_moisture.json"
+
+_EMA_SCALE_SHIFT = const(8)     # EMA is kept as fixed point, raw value << 8
+
+
+def load_calibration(path:str = CALIBRATION_FILE, offset_min:int = 150,
+                     offset_max:int = 250) -> (int, int, tuple|None):
+    """
+    **Load ADC offsets from the calibration file**
+
+    The file is a JSON object like {"offset_min": 150, "offset_max": 250, "curve": [[150, 1], [250, 0]]}.
+    "curve" is optional. If the file is missing or broken, return the default offsets.
+    :param path: calibration file path.
+    :param offset_min: default offset in water, like of the config file.
+    :param offset_max: default offset in air.
+    :return: (offset_min, offset_max, curve). offset_min is the value in water and offset_max is in air.
+    curve is a tuple of (ADC value, moisture) sorted by ADC value, or None to use the linear map.
+    """
+    try:
+        with open(path, "r") as file:
+            calibration = load(file)
+
+        curve = calibration.get("curve")
+        if curve is not None:
+            curve = tuple(sorted((int(adc), float(moisture)) for adc, moisture in curve))
+
+        return int(calibration["offset_min"]), int(calibration["offset_max"]), curve
+
+    except (OSError, ValueError, KeyError, TypeError):
+        return offset_min, offset_max, None
+
+
+def save_calibration(offset_min:int, offset_max:int, curve:list|tuple|None = None,
+                     path:str = CALIBRATION_FILE) -> None:
+    """
+    **Persist ADC offsets to the calibration file**
+
+    The file is written to a temporary file and renamed, so a power loss won't break the old one.
+    :param offset_min: ADC value in water.
+    :param offset_max: ADC value in air.
+    :param curve: (ADC value, moisture) points of a piecewise-linear curve. None is the linear map.
+    :param path: calibration file path.
+    """
+    try:
+        with open(path, "r") as file:
+            calibration = load(file)    # keep other settings like power control
+    except (OSError, ValueError):
+        calibration = {}
+
+    calibration["offset_min"] = offset_min
+    calibration["offset_max"] = offset_max
+    calibration.pop("curve", None)
+    if curve is not None:
+        calibration["curve"] = [[adc, moisture] for adc, moisture in curve]
+
+    with open(path + ".tmp", "w") as file:
+        dump(calibration, file)
+
+    rename(path + ".tmp", path)
+
+
+def load_power_setting(path:str = CALIBRATION_FILE) -> (Pin|None, int, int):
+    """
+    **Load probe power control from the calibration file**
+
+    Keys are "power_pin", "settle_ms" and "read_every", like {"power_pin": 12, "settle_ms": 100,
+    "read_every": 6}. If "power_pin" is missing or null, the probe is powered continuously.
+    :param path: calibration file path.
+    :return: (power_pin, settle_ms, read_every). power_pin is an output Pin set LOW or None.
+    """
+    try:
+        with open(path, "r") as file:
+            setting = load(file)
+
+        power_pin = setting.get("power_pin")
+        return (None if power_pin is None else Pin(int(power_pin), Pin.OUT, value=0),
+                int(setting.get("settle_ms", 100)),
+                max(1, int(setting.get("read_every", 1))))
+
+    except (OSError, ValueError, TypeError):
+        return None, 100, 1
+
+
+class SoilMoistureSensor:
+    """
+    **Soil moisture acquisition of YL-69/YL-38 probe**
+
+    Every reading takes a burst of ADC samples into a preallocated buffer, filters the burst by median
+    or trimmed mean, smooths across readings by an exponential moving average and normalizes by the
+    calibration offsets. No object is allocated while reading, except the returned float.
+
+    The probe corrodes and draws current while powered. With a power pin, async_read() only powers the
+    probe for the settle time and the sample burst, and only on one of every read_every readings.
+    """
+
+    adc:ADC = None
+
+    offset_min:int = 150
+    offset_max:int = 250
+    curve:tuple|None = None
+
+    _samples:array = None
+    _filter_mode:int = FILTER_MEDIAN
+    _trim:int = 0
+    _ema_shift:int = 0
+    _ema:int = -1
+
+    power_pin:Pin|None = None
+    settle_ms:int = 100
+    read_every:int = 1
+    energized_ms:int = 0
+    """**Total time the probe was powered by async_read()**"""
+
+    _reads:int = 0
+    _last:float|None = None
+
+    def __init__(self, adc:ADC, samples:int = 16, filter_mode:int = FILTER_MEDIAN, trim:int = 4,
+                 ema_shift:int = 2, calibration:tuple|None = None, power:tuple|None = None) -> None:
+        """
+        **Constructor of sensor**
+
+        :param adc: an ADC object from machine.ADC.
+        :param samples: samples count per reading.
+        :param filter_mode: FILTER_MEDIAN or FILTER_TRIMMED_MEAN.
+        :param trim: samples dropped at each end in FILTER_TRIMMED_MEAN mode.
+        :param ema_shift: EMA weight of new reading is 1 / 2**ema_shift. 0 is disabled EMA.
+        :param calibration: (offset_min, offset_max, curve). None is loading from calibration file.
+        :param power: (power_pin, settle_ms, read_every). power_pin is None for continuously powered
+        probe. None is loading from calibration file.
+        """
+        if samples <= 2 * trim:
+            raise ValueError("Samples must be more than 2 * trim.")
+
+        self.adc = adc
+        self._samples = array('H', bytes(2 * samples))
+        self._filter_mode = filter_mode
+        self._trim = trim
+        self._ema_shift = ema_shift
+
+        self.offset_min, self.offset_max, self.curve = load_calibration() if calibration is None else calibration
+        self.power_pin, self.settle_ms, self.read_every = load_power_setting() if power is None else power
+
+
+    def _sample_burst(self) -> None:
+        """
+        Fill the buffer with ADC samples and sort it in place by insertion sort.
+        """
+        samples = self._samples
+        read = self.adc.read
+
+        for i in range(len(samples)):
+            value = read()
+            j = i
+            while j > 0 and samples[j - 1] > value:
+                samples[j] = samples[j - 1]
+                j -= 1
+            samples[j] = value
+
+
+    def read_raw(self) -> int:
+        """
+        **Read filtered ADC value**
+
+        :return: the median or trimmed mean of a sample burst, not smoothed.
+        """
+        self._sample_burst()
+        samples = self._samples
+        length = len(samples)
+
+        if self._filter_mode == FILTER_MEDIAN:
+            return (samples[(length - 1) >> 1] + samples[length >> 1]) >> 1
+
+        total = 0
+        for i in range(self._trim, length - self._trim):
+            total += samples[i]
+
+        return total // (length - 2 * self._trim)
+
+
+    def read_smoothed(self) -> int:
+        """
+        **Read filtered and smoothed ADC value**
+
+        :return: EMA of filtered values across readings.
+        """
+        raw = self.read_raw() << _EMA_SCALE_SHIFT
+
+        if self._ema < 0:
+            self._ema = raw     # first reading
+        else:
+            self._ema += (raw - self._ema) >> self._ema_shift
+
+        return self._ema >> _EMA_SCALE_SHIFT
+
+
+    def normalize(self, value:int) -> float:
+        """
+        **Normalize ADC value to soil moisture**
+
+        Use the piecewise-linear curve if calibrated, otherwise the linear map between offsets.
+        :param value: ADC value.
+        :return: from 0 to 1. 0 is dry and 1 is wet.
+        """
+        if self.curve is not None:
+            return self._interpolate(value)
+
+        # raw data 0 is wet and 1 is dry
+        result_fixed = 1 - ( (value - self.offset_min) / (self.offset_max - self.offset_min) )
+
+        # add max value limit
+        return 0 if result_fixed <= 0 else 1 if result_fixed >= 1 else result_fixed
+
+
+    def _interpolate(self, value:int) -> float:
+        """
+        Interpolate moisture on the calibrated curve. Out of curve is clamped to the end points.
+        """
+        curve = self.curve
+
+        if value <= curve[0][0]: return curve[0][1]
+        if value >= curve[-1][0]: return curve[-1][1]
+
+        for i in range(1, len(curve)):
+            adc_high, moisture_high = curve[i]
+            if value <= adc_high:
+                adc_low, moisture_low = curve[i - 1]
+                return moisture_low + (moisture_high - moisture_low) * (value - adc_low) / (adc_high - adc_low)
+
+        return curve[-1][1]
+
+
+    def read(self) -> float:
+        """
+        **Read soil moisture**
+
+        :return: from 0 to 1. 0 is dry and 1 is wet.
+        """
+        return self.normalize(self.read_smoothed())
+
+
+    async def async_read(self) -> float:
+        """
+        **Read soil moisture with probe power control**
+
+        The probe is powered and settled without blocking other tasks. Between sampled readings, the
+        last value is returned and the probe stays unpowered.
+        :return: from 0 to 1. 0 is dry and 1 is wet.
+        """
+        if self._last is not None and self._reads < self.read_every - 1:
+            self._reads += 1
+            return self._last
+
+        self._reads = 0
+
+        if self.power_pin is None:
+            self._last = self.read()
+            return self._last
+
+        start = ticks_ms()
+        self.power_pin.on()
+
+        try:
+            await sleep(self.settle_ms / 1000)
+            value = self.read_smoothed()
+        finally:
+            self.power_pin.off()
+            self.energized_ms += ticks_diff(ticks_ms(), start)
+
+        self._last = self.normalize(value)
+        return self._last
+
+
+def _wait_release(button:Pin|None) -> None:
+    """
+    Wait for the button released, like held to start calibrating, so it won't confirm the first step.
+    """
+    if button is None: return
+
+    while not button.value(): sleep_ms(20)    # active low
+    sleep_ms(50)                                # debounce
+
+
+def _wait_confirm(button:Pin|None) -> None:
+    """
+    Wait for the button pressed and released, or Enter in REPL if no button.
+    """
+    if button is None:
+        input()
+        return
+
+    while button.value(): sleep_ms(20)        # active low
+    sleep_ms(50)                                # debounce
+    while not button.value(): sleep_ms(20)
+
+
+def _record(sensor:SoilMoistureSensor, rounds:int) -> int:
+    """
+    Record a distribution of filtered readings and return its median, which is robust to outliers.
+    """
+    readings = array('H', bytes(2 * rounds))
+
+    for i in range(rounds):
+        readings[i] = sensor.read_raw()
+        sleep_ms(100)
+
+    sorted_readings = sorted(readings)
+    return (sorted_readings[(rounds - 1) >> 1] + sorted_readings[rounds >> 1]) >> 1
+
+
+def calibrate(sensor:SoilMoistureSensor, button:Pin|None = None, rounds:int = 16,
+              references:list|tuple = (), prompt = print, path:str = CALIBRATION_FILE) -> (int, int):
+    """
+    **Calibration wizard of soil moisture probe**
+
+    Record ADC values in dry air and in water, then persist offsets to the calibration file and apply
+    to the sensor. Run it in REPL like:
+
+        >>> from soil_moisture import SoilMoistureSensor, calibrate
+        >>> calibrate(SoilMoistureSensor(ADC(0)))
+
+    :param sensor: sensor to calibrate.
+    :param button: confirm button, active low. None is confirming by Enter in REPL. If it's held when
+    called, it must be released first.
+    :param rounds: filtered readings recorded per step.
+    :param references: moisture from 0 to 1 of extra reference soil. If not empty, a piecewise-linear
+    curve is fitted through all steps instead of the linear map.
+    :param prompt: function to show a message, like print.
+    :param path: calibration file path.
+    :return: (offset_min, offset_max)
+    """
+    if sensor.power_pin is not None:
+        sensor.power_pin.on()   # keep the probe powered while calibrating
+
+    try:
+        prompt("Probe in air, then confirm")
+        _wait_release(button)
+        _wait_confirm(button)
+        offset_max = _record(sensor, rounds)
+
+        prompt("Probe in water, then confirm")
+        _wait_confirm(button)
+        offset_min = _record(sensor, rounds)
+
+        if offset_min >= offset_max:
+            raise RuntimeError(f"Calibration failed: water {offset_min} is not less than air {offset_max}")
+
+        curve = None
+        if len(references) > 0:
+            curve = [(offset_min, 1.0), (offset_max, 0.0)]
+
+            for moisture in references:
+                prompt(f"Probe in {int(moisture * 100)}% soil, confirm")
+                _wait_confirm(button)
+                curve.append((_record(sensor, rounds), float(moisture)))
+
+            curve = tuple(sorted(curve))
+
+    finally:
+        if sensor.power_pin is not None:
+            sensor.power_pin.off()
+
+    save_calibration(offset_min, offset_max, curve, path)
+    prompt(f"Saved {offset_min}-{offset_max}")   # ~ is not in the LCD's ROM
+
+    sensor.offset_min, sensor.offset_max, sensor.curve = offset_min, offset_max, curve
+    sensor._ema = -1    # restart smoothing with new calibration
+    sensor._last = None
+
+    return offset_min, offset_max
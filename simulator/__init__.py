@@ -0,0 +1,232 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**Host simulator of the plant monitor**
+
+Run HD44780_Driver, lcd_api, lcd_control and main on CPython without hardware. machine, framebuf,
+micropython, network, gc and umqtt.simple are replaced by simulated modules, time is replaced by a virtual
+clock, and the LCD is an HD44780 model behind a PCF8574 or GPIO pins. Example:
+
+    >>> import simulator
+    >>> sim = simulator.install()
+    >>> lcd = sim.attach_i2c_lcd(0x27)
+    >>> from lib.HD44780_Driver.lcd_1602_api import lcd_api
+    >>> ...
+    >>> print(lcd.render())
+    >>> print(sim.trace.report())
+"""
+
+import sys
+import time
+import asyncio
+import selectors
+from os import path
+
+from .clock import Clock
+from .trace import Trace
+from .hd44780 import HD44780
+from .pcf8574 import PCF8574
+from .gpio import GPIOBus
+from .bmp180 import BMP180
+from .imports import ImportModel, COMPILE_US_PER_BYTE
+from . import machine, framebuf, micropython, network, ustruct, ugc, umqtt
+from .umqtt import simple as umqtt_simple
+
+PROGRAM_DIR = path.join(path.dirname(path.dirname(path.abspath(__file__))), "program")
+
+program_dir:str = PROGRAM_DIR
+"""**Directory added to sys.path by install()**, like a tree built by tools/build_program.py"""
+
+
+class _VirtualSelector(selectors.DefaultSelector):
+    """
+    Advance the virtual clock instead of blocking when the event loop waits for a timer.
+    """
+
+    clock:Clock = None
+
+    def __init__(self, clock:Clock) -> None:
+        super().__init__()
+        self.clock = clock
+
+    def select(self, timeout:float|None = None) -> list:
+        if timeout is not None and timeout > 0:
+            self.clock.idle(timeout * 1000000)
+            machine.Timer.run_due()
+        return super().select(0)
+
+
+class Simulator:
+
+    clock:Clock = None
+    trace:Trace = None
+
+    imports:ImportModel|None = None
+    """**Import cost model**, None if not installed with import_cost"""
+
+    def __init__(self, clock:Clock, trace:Trace, imports:ImportModel|None = None) -> None:
+        self.clock = clock
+        self.trace = trace
+        self.imports = imports
+
+    def attach_i2c_lcd(self, address:int = 0x27) -> HD44780:
+        """
+        **Connect a 1602 LCD with PCF8574 backpack to the I2C bus**
+
+        :param address: I2C address of PCF8574.
+        :return: the HD44780 model to inspect.
+        """
+        lcd = HD44780(self.clock, self.trace)
+        machine.devices[address] = PCF8574(lcd)
+        return lcd
+
+    def attach_gpio_lcd(self, RS, RW, E, DB4, DB5, DB6, DB7,
+                        DB0 = None, DB1 = None, DB2 = None, DB3 = None) -> HD44780:
+        """
+        **Connect a 1602 LCD to pins directly**
+
+        Pins are ids of machine.Pin, the same as the pins given to GPIO4_HAL or GPIO8_HAL.
+        :param RW: None is GND.
+        :param DB0: DB0~DB3 are None in 4pin mode.
+        :return: the HD44780 model to inspect.
+        """
+        pin = lambda id: None if id is None else machine.Pin(id, machine.Pin.OUT)
+
+        lcd = HD44780(self.clock, self.trace)
+        GPIOBus(lcd, pin(RS), pin(RW), pin(E), pin(DB4), pin(DB5), pin(DB6), pin(DB7),
+                pin(DB0), pin(DB1), pin(DB2), pin(DB3))
+        return lcd
+
+    def attach_bmp180(self, address:int = 0x77) -> BMP180:
+        """
+        **Connect a BMP180 sensor to the I2C bus**
+
+        :return: the BMP180 model to set raw readings.
+        """
+        sensor = BMP180(self.clock, self.trace)
+        machine.devices[address] = sensor
+        return sensor
+
+    def add_access_point(self, ssid:str = "SSID", password:str = "PASSWORD", rssi:int = -60,
+                         **timing) -> network.AccessPoint:
+        """
+        **Add a WI-FI access point in range**
+
+        :param timing: scan_ms, associate_ms and dhcp_ms, see network.AccessPoint.
+        """
+        access_point = network.AccessPoint(ssid, password, rssi, **timing)
+        network.access_points.append(access_point)
+        return access_point
+
+    def start_broker(self, latency_ms:float = 5, keep:int|None = None) -> umqtt_simple.Broker:
+        """
+        **Start the MQTT broker every MQTTClient connects to**
+
+        :param keep: messages kept in Broker.messages. None is keeping all.
+        """
+        umqtt_simple.broker = umqtt_simple.Broker(latency_ms, keep)
+        return umqtt_simple.broker
+
+    def run(self, coroutine):
+        """
+        **Run a coroutine like asyncio.run() on virtual time**
+
+        asyncio.sleep() and sleep_ms() advance the virtual clock at once instead of waiting, so hours of
+        the main loop run in seconds. Tasks left are cancelled when the coroutine returns, or raises like
+        SystemExit of machine.reset().
+        :return: what the coroutine returns.
+        """
+        loop = asyncio.SelectorEventLoop(_VirtualSelector(self.clock))
+        loop.time = lambda: self.clock.now_us / 1000000
+
+        try:
+            asyncio.set_event_loop(loop)
+            try:
+                return loop.run_until_complete(coroutine)
+
+            finally:
+                tasks = asyncio.all_tasks(loop)
+                for task in tasks:
+                    task.cancel()
+                loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    def set_adc(self, id:int, source) -> None:
+        """
+        **Set value source of an ADC channel**
+
+        :param source: function() -> int, or an int as a constant value.
+        """
+        machine.ADC.sources[id] = source if callable(source) else (lambda: source)
+
+
+def install(logging:bool = False, program:str|None = None, import_cost:bool = False,
+            us_per_byte:int = COMPILE_US_PER_BYTE) -> Simulator:
+    """
+    **Replace MicroPython modules and time by simulated ones**
+
+    Call it before importing any module of program/. program/ is added to sys.path, so modules are
+    imported like on the board, e.g. `import lcd_control`.
+    :param logging: True is keeping every HD44780 instruction in Trace.log.
+    :param program: directory to import from instead of program/. None is keeping the last one.
+    :param import_cost: True is advancing the clock by the modeled cost of importing modules of the program
+        and frozen ones like umqtt.simple, see simulator/imports.py.
+    :param us_per_byte: cost of a byte of source, see ImportModel.
+    :return: a Simulator with a new clock and trace. Devices, access points and broker are removed.
+    """
+    clock = Clock()
+    trace = Trace(clock, logging)
+
+    machine.clock = clock
+    machine.trace = trace
+    machine.devices.clear()
+    machine.Pin.reset()
+    machine.Timer.reset()
+    machine.ADC.sources = {}
+    network.clock = clock
+    network.access_points.clear()
+    network.WLAN.reset()
+    umqtt_simple.clock = clock
+    umqtt_simple.trace = trace
+    umqtt_simple.broker = None
+
+    sys.modules["machine"] = machine
+    sys.modules["framebuf"] = framebuf
+    sys.modules["micropython"] = micropython
+    sys.modules["network"] = network
+    sys.modules["struct"] = ustruct
+    sys.modules["gc"] = ugc
+    ugc.reset()
+    sys.modules["umqtt"] = umqtt
+    sys.modules["umqtt.simple"] = umqtt_simple
+
+    time.sleep_us = clock.sleep_us
+    time.sleep_ms = clock.sleep_ms
+    time.ticks_us = clock.ticks_us
+    time.ticks_ms = clock.ticks_ms
+    time.ticks_diff = clock.ticks_diff
+    time.ticks_add = clock.ticks_add
+
+    # asyncio runs in real time unless run by Simulator.run(), only the uasyncio name is added
+    asyncio.sleep_ms = lambda ms: asyncio.sleep(ms / 1000)
+
+    global program_dir
+    if program is not None and path.abspath(program) != program_dir:
+        if program_dir in sys.path:
+            sys.path.remove(program_dir)
+        program_dir = path.abspath(program)
+
+    if program_dir not in sys.path:
+        sys.path.insert(0, program_dir)
+
+    sys.meta_path[:] = [finder for finder in sys.meta_path if not isinstance(finder, ImportModel)]
+    imports = None
+    if import_cost:
+        imports = ImportModel(clock, program_dir, {"umqtt": umqtt, "umqtt.simple": umqtt_simple}, us_per_byte)
+        sys.meta_path.insert(0, imports)
+
+    return Simulator(clock, trace, imports)
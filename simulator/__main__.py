@@ -0,0 +1,44 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**Render the plant monitor screen and report the cost of every API call**
+
+Run `python -m simulator` in the repo's root.
+"""
+
+import simulator
+
+sim = simulator.install()
+lcd = sim.attach_i2c_lcd(0x27)
+
+from machine import I2C, Pin
+from lib.HD44780_Driver.lcd_1602_api import lcd_api
+from lib.HD44780_Driver.pcf8574_I2C_HAL import pcf8574_I2C_HAL
+import lcd_control
+
+trace = sim.trace
+
+with trace.span("lcd_api()"):
+    api = lcd_api(pcf8574_I2C_HAL(I2C(scl=Pin(14), sda=Pin(2), freq=100000), 0x27))
+
+with trace.span("init_ui()"):
+    lcd_control.init_ui(api)
+
+for temperature, pressure, moisture in ((23.4, 1013, 0.512), (23.5, 1013, 0.512), (24.1, 1009, 0.498)):
+    with trace.span("update_temp()"):
+        lcd_control.update_temp(api, temperature)
+    with trace.span("update_pressure()"):
+        lcd_control.update_pressure(api, pressure)
+    with trace.span("update_soil_moisture()"):
+        lcd_control.update_soil_moisture(api, moisture)
+
+with trace.span("update_wifi_level()"):
+    lcd_control.update_wifi_level(api, True)
+
+print(lcd.render())
+print()
+print(trace.report())
+
+for time_us, message in trace.violations:
+    print(f"violation at {time_us:.0f}us: {message}")
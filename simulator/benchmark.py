@@ -0,0 +1,376 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**Benchmark of the sensing, display and upload cycle**
+
+Every scenario boots program/main.py on the simulator, runs its main loop for some cycles on virtual
+time, and reports the cost of every stage: modeled time, blocking sleep, I2C transactions and bytes,
+HD44780 instructions, MQTT bytes, host time and peak allocation. Run in the repo's root:
+
+    python -m simulator.benchmark --json benchmark.json
+    python -m simulator.benchmark --compare benchmark.json
+
+Stages are time windows. upload runs as a task like in main.main(), so the background tasks running
+in its window, like animations, are counted to it. cycle is the whole loop iteration including the
+sleep, which counts all background tasks. Allocations are measured by tracemalloc on CPython, so only
+compare them between runs, not with the heap on the board.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from asyncio import create_task, get_running_loop, sleep
+from contextlib import contextmanager
+from time import perf_counter_ns
+
+import simulator
+
+PERIOD_SEC = 10
+"""**Sleep of each cycle, the same as main.main()**"""
+
+STAGES = ("import", "start", "bmp180", "moisture", "display", "upload", "cycle")
+
+_PROGRAM_MODULES = ("main", "app", "config", "heap", "instrumentation", "lcd_control", "lcd_layout", "network_control",
+                    "ota", "soil_moisture")
+
+_REPO_DIR = os.path.dirname(simulator.PROGRAM_DIR)
+
+
+class Recorder:
+    """
+    **Trace spans with host time and peak allocation of every stage**
+    """
+
+    sim:simulator.Simulator = None
+    host_ns:dict = None
+    alloc_peak:dict = None
+    errors:dict = None
+
+    def __init__(self, sim:simulator.Simulator) -> None:
+        self.sim = sim
+        self.host_ns = {}
+        self.alloc_peak = {}
+        self.errors = {}
+
+    @contextmanager
+    def stage(self, name:str, record:bool = True, memory:bool = True):
+        """
+        **Measure the code in with-block as a stage**
+
+        :param record: False is running without measuring, like warming up.
+        :param memory: False is not measuring allocation, for stages containing other stages.
+        """
+        if not record:
+            yield
+            return
+
+        if memory:
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+
+        start_ns = perf_counter_ns()
+        try:
+            with self.sim.trace.span(name):
+                yield
+        finally:
+            self.host_ns[name] = self.host_ns.get(name, 0) + perf_counter_ns() - start_ns
+            if memory:
+                peak = tracemalloc.get_traced_memory()[1] - start_memory
+                self.alloc_peak[name] = max(self.alloc_peak.get(name, 0), peak)
+
+    def error(self, error:BaseException) -> None:
+        name = type(error).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+    def result(self) -> dict:
+        stages = {}
+        for name in STAGES:
+            if name not in self.sim.trace.spans: continue
+
+            stage = dict(self.sim.trace.spans[name])
+            stage["host_us"] = self.host_ns[name] // 1000
+            if name in self.alloc_peak:
+                stage["alloc_peak_bytes"] = self.alloc_peak[name]
+            stages[name] = stage
+
+        return {"stages": stages,
+                "instruction_stream": f"{self.sim.trace.stream:016x}",
+                "violations": [message for _, message in self.sim.trace.violations],
+                "errors": self.errors}
+
+
+def _unload_program() -> None:
+    for name in list(sys.modules):
+        if name in _PROGRAM_MODULES or name == "lib" or name.startswith("lib."):
+            del sys.modules[name]
+
+
+def _import_main():
+    """
+    :return: program's main module. main.py of a built tree is a shim running app.main(), so import app.
+    """
+    is_built = os.path.isfile(os.path.join(simulator.program_dir, "app.py"))
+    return importlib.import_module("app" if is_built else "main")
+
+
+def _write_json(path:str, content:dict) -> None:
+    with open(path, "w") as file:
+        json.dump(content, file)
+
+
+def _write_cache(access_point) -> None:
+    """
+    Files left by a previous boot: the access point cache and the soil moisture calibration.
+    """
+    _write_json("network_cache.json", {"ssid": access_point.ssid,
+                                       "bssid": access_point.bssid.hex(),
+                                       "ifconfig": ["192.168.1.100", "255.255.255.0",
+                                                    "192.168.1.1", "192.168.1.1"]})
+    _write_json("soil_moisture.json", {"offset_min": 150, "offset_max": 250})
+
+
+async def _async_outage(access_point, after_sec:float, duration_sec:float) -> None:
+    await sleep(after_sec)
+    access_point.up = False
+    await sleep(duration_sec)
+    access_point.up = True
+
+
+async def _async_commands(main, broker, after_sec:float, interval_sec:float) -> None:
+    """
+    Send a command setting backlight_timeout_sec to 60 or 61 every interval_sec, to check it runs without
+    changing the cycle. Sent commands are queued by the broker until main.py checks them.
+    """
+    await sleep(after_sec)
+    command_id = 0
+    while True:
+        command_id += 1
+        broker.send(main.COMMAND_TOPIC, json.dumps(
+            {"id": command_id, "set": {"backlight_timeout_sec": 60 + command_id % 2}}).encode())
+        await sleep(interval_sec)
+
+
+SCENARIOS = {
+    "steady_state": {"cache": True, "warmup": 2},
+    "wifi_reconnecting": {"cache": True, "warmup": 2, "outage_sec": 60},
+    "broker_down": {"cache": True, "warmup": 2, "broker_up": False},
+    "first_boot": {"cache": False, "warmup": 0},
+    "remote_config": {"cache": True, "warmup": 2, "command_sec": 10},
+}
+"""**Scenarios by name.** cache is files of a previous boot, outage_sec is the access point out of service
+after warming up, broker_up False is the broker refusing connections, command_sec is sending a command
+to main.py every that seconds after warming up."""
+
+
+async def _async_cycles(main, recorder:Recorder, cycles:int, warmup:int, outage_sec:float,
+                        command_sec:float = 0) -> None:
+
+    def on_exception(loop, context) -> None:
+        recorder.error(context.get("exception") or RuntimeError(context["message"]))
+
+    get_running_loop().set_exception_handler(on_exception)
+
+    with recorder.stage("start"):
+        await main.async_start()
+        main.start_network()    # main.main() starts it after the first reading, the cycles here need it
+
+    if outage_sec:
+        create_task(_async_outage(main.wlan._access_point or simulator.network.access_points[0],
+                                  warmup * PERIOD_SEC + 1, outage_sec))
+
+    if command_sec:     # the command topic is known after the first upload, in warming up
+        create_task(_async_commands(main, simulator.umqtt.simple.broker, warmup * PERIOD_SEC + 1, command_sec))
+
+    async def measured_upload(record:bool, temperature, pressure, moisture, uptime_ms) -> None:
+        try:
+            with recorder.stage("upload", record):
+                await main.async_upload_data(temperature, pressure, moisture, uptime_ms)
+        except Exception as error:
+            recorder.error(error)
+
+    upload_task = None
+    uptime_ms = 0
+
+    for i in range(warmup + cycles):
+        record = i >= warmup
+
+        with recorder.stage("cycle", record, memory=False):
+            with recorder.stage("bmp180", record):
+                temperature, pressure = main.get_temp_and_pressure()
+
+            with recorder.stage("moisture", record):
+                moisture = await main.async_get_soil_moisture()
+
+            with recorder.stage("display", record):
+                main.update_data(temperature, pressure, moisture, uptime_ms)
+                main.api.flush()    # run queued commands here instead of in the writer task
+
+            if main.network_manager.is_connected():
+                if upload_task is None or upload_task.done():
+                    upload_task = create_task(measured_upload(record, temperature, pressure, moisture, uptime_ms))
+
+            await sleep(PERIOD_SEC)
+            uptime_ms += PERIOD_SEC * 1000
+
+
+def run_scenario(name:str, cycles:int, program:str|None = None) -> dict:
+    """
+    **Boot main.py on a new simulator and run a scenario**
+
+    :param name: key of SCENARIOS.
+    :param cycles: main loop cycles measured, after warming up.
+    :param program: directory to run instead of program/.
+    :return: measured stages and what happened, as a JSON object.
+    """
+    setting = SCENARIOS[name]
+    random.seed(0)  # backoff jitter of ConnectionManager
+    noise = random.Random(1)
+
+    sim = simulator.install(program=program or simulator.PROGRAM_DIR)
+    lcd = sim.attach_i2c_lcd(0x27)
+    sim.attach_bmp180(0x77)
+    sim.set_adc(0, lambda: 200 + noise.randint(-3, 3))
+    access_point = sim.add_access_point("SSID", "PASSWORD")
+    broker = sim.start_broker()
+    broker.up = setting.get("broker_up", True)
+
+    recorder = Recorder(sim)
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            if setting["cache"]:
+                _write_cache(access_point)
+
+            _unload_program()
+            with recorder.stage("import"):
+                main = _import_main()
+
+            sim.run(_async_cycles(main, recorder, cycles, setting["warmup"], setting.get("outage_sec", 0),
+                                  setting.get("command_sec", 0)))
+            response_topic = main.RESPONSE_TOPIC
+
+        finally:
+            os.chdir(cwd)
+            _unload_program()
+
+    result = recorder.result()
+    result["published"] = broker.published
+    result["broker_connections"] = broker.connections
+    if setting.get("command_sec"):
+        responses = [json.loads(message) for topic, message, _, _ in broker.messages if topic == response_topic]
+        result["commands"] = {"sent": len(responses) + len(broker._queued),
+                              "applied": sum(1 for response in responses if response["ok"])}
+    result["screen"] = lcd.render().split("\n")
+    return result
+
+
+def _per_call(stage:dict, key:str) -> float:
+    return stage.get(key, 0) / stage["calls"]
+
+
+def report(results:dict) -> str:
+    """
+    :return: a text table of per-call means of every scenario.
+    """
+    lines = []
+    for name, result in results["scenarios"].items():
+        lines.append(f"[{name}] published {result['published']}, errors {result['errors']}, "
+                     f"violations {len(result['violations'])}" +
+                     (f", commands applied {result['commands']['applied']}/{result['commands']['sent']}"
+                      if "commands" in result else ""))
+        lines.append(f"  {'stage':<10}{'calls':>6}{'time us':>11}{'sleep us':>10}{'i2c tx':>8}{'i2c B':>7}"
+                     f"{'instr':>7}{'net B':>7}{'host us':>9}{'alloc B':>9}")
+
+        for stage_name, stage in result["stages"].items():
+            lines.append(f"  {stage_name:<10}{stage['calls']:>6}{_per_call(stage, 'time_us'):>11.0f}"
+                         f"{_per_call(stage, 'slept_us'):>10.0f}{_per_call(stage, 'bus_transactions'):>8.1f}"
+                         f"{_per_call(stage, 'bus_bytes'):>7.0f}{_per_call(stage, 'instructions'):>7.1f}"
+                         f"{_per_call(stage, 'net_bytes'):>7.0f}{_per_call(stage, 'host_us'):>9.0f}"
+                         f"{stage.get('alloc_peak_bytes', 0):>9}")
+        lines.append("")
+
+    return "\n".join(lines)
+
+
+def compare(results:dict, baseline:dict, keys:tuple = ("time_us", "bus_bytes", "instructions", "net_bytes")) -> str:
+    """
+    :return: a text table of per-call changes from the baseline, and scenarios sending different HD44780
+    instructions. Host time is not compared, it's noisy.
+    """
+    lines = [f"compared with {baseline.get('commit')}"]
+    for name, result in results["scenarios"].items():
+        base_result = baseline["scenarios"].get(name)
+        if base_result is None: continue
+
+        if result.get("instruction_stream") != base_result.get("instruction_stream", result.get("instruction_stream")):
+            lines.append(f"  {name}: HD44780 instruction stream differs")
+
+        for stage_name, stage in result["stages"].items():
+            base_stage = base_result["stages"].get(stage_name)
+            if base_stage is None: continue
+
+            changes = []
+            for key in keys:
+                new, old = _per_call(stage, key), _per_call(base_stage, key)
+                if new != old:
+                    changes.append(f"{key} {old:.0f}->{new:.0f}" + (f" ({(new - old) / old:+.1%})" if old else ""))
+
+            if changes:
+                lines.append(f"  {name}.{stage_name}: " + ", ".join(changes))
+
+    if len(lines) == 1:
+        lines.append("  no change")
+    return "\n".join(lines)
+
+
+def _commit() -> str|None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=_REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv:list|None = None) -> dict:
+    parser = argparse.ArgumentParser(prog="python -m simulator.benchmark",
+                                     description="Benchmark the main loop of the plant monitor on the simulator.")
+    parser.add_argument("--scenario", action="append", choices=tuple(SCENARIOS),
+                        help="scenario to run, repeat for more. Default is all.")
+    parser.add_argument("--cycles", type=int, default=12, help="main loop cycles measured per scenario.")
+    parser.add_argument("--json", metavar="PATH", help="write results to a JSON file.")
+    parser.add_argument("--compare", metavar="PATH", help="compare with results of a JSON file.")
+    parser.add_argument("--program", metavar="DIR", help="run a tree built by tools/build_program.py "
+                                                         "instead of program/.")
+    args = parser.parse_args(argv)
+
+    tracemalloc.start()
+    try:
+        results = {"commit": _commit(), "cycles": args.cycles, "period_sec": PERIOD_SEC,
+                   "scenarios": {name: run_scenario(name, args.cycles, args.program)
+                                 for name in args.scenario or SCENARIOS}}
+    finally:
+        tracemalloc.stop()
+
+    print(report(results))
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            print(compare(results, json.load(file)))
+
+    if args.json:
+        _write_json(args.json, results)
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**BMP180 sensor model**
+
+Calibration registers, control register and conversion time of BMP180. Default values are the
+example in the datasheet, which are 15.0°C and 69964Pa.
+"""
+
+from struct import pack
+from .clock import Clock
+from .trace import Trace
+
+CALIBRATION = (408, -72, -14383, 32741, 32757, 23153, 6190, 4, -32768, -8711, 2868)
+"""**AC1~AC6, B1, B2, MB, MC, MD in the datasheet example**"""
+
+CONVERSION_US = (4500, 7500, 13500, 25500)
+"""**Max conversion time of pressure by oversampling setting, temperature is the first one**"""
+
+
+class BMP180:
+
+    clock:Clock = None
+    trace:Trace = None
+
+    uncompensated_temp:int = 27898
+    uncompensated_pressure:int = 23843
+    """**Raw pressure of oversampling setting 0, shifted for others**"""
+
+    _registers:bytearray = None
+    _ready_us:float = 0
+
+    def __init__(self, clock:Clock, trace:Trace) -> None:
+        self.clock = clock
+        self.trace = trace
+        self._registers = bytearray(0x100)
+        self._registers[0xAA:0xAA + 22] = pack(">hhhHHHhhhhh", *CALIBRATION)
+        self._registers[0xD0] = 0x55    # chip id
+
+    def write_mem(self, address:int, data:bytes) -> None:
+        if address == 0xE0 and data[0] == 0xB6:
+            return  # soft reset, nothing to model
+
+        if address != 0xF4:
+            self._registers[address] = data[0]
+            return
+
+        command = data[0]
+        oss = command >> 6
+        if command & 0x3F == 0x2E:
+            self._registers[0xF6:0xF9] = pack(">hB", self.uncompensated_temp, 0)
+            self._ready_us = self.clock.now_us + CONVERSION_US[0]
+        elif command & 0x3F == 0x34:
+            raw = self.uncompensated_pressure << oss << (8 - oss)
+            self._registers[0xF6:0xF9] = raw.to_bytes(3, "big")
+            self._ready_us = self.clock.now_us + CONVERSION_US[oss]
+
+    def read_mem(self, address:int, size:int) -> bytes:
+        if address == 0xF6 and self.clock.now_us < self._ready_us:
+            self.trace.violation(f"BMP180 result read {self._ready_us - self.clock.now_us:.0f}us before ready")
+
+        return bytes(self._registers[address:address + size])
+
+    def write(self, data:bytes) -> None:
+        if len(data) > 1:
+            self.write_mem(data[0], data[1:])
+
+    def read(self, size:int) -> bytes:
+        return bytes(size)
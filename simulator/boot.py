@@ -0,0 +1,163 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**Measure the boot of main.py, from power on to the first reading and upload**
+
+Run `python -m simulator.boot` in the repo's root. main.py is imported and main.main() runs like on the
+board, with the cost of importing every module modeled by simulator/imports.py. Times since power on:
+
+- imported: main.py and all modules it imports at top level are compiled and run.
+- first_output: the first character is shown on the LCD.
+- first_reading: the first readings of sensors are drawn by update_data().
+- wifi_up: main.py sees WI-FI connected.
+- first_upload: the broker receives the first message.
+
+Import costs are modeled from sizes of source, so compare results between runs rather than with the board.
+A tree built by tools/build_program.py is run with `--program build/program --mpy`, charged at the rate of
+loading bytecode. To check the first output shows in time, like one second for the tree deployed:
+
+    python -m simulator.boot --program build/program --mpy --target-ms 1000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+
+import simulator
+from simulator.benchmark import _import_main, _unload_program, _write_cache
+from simulator.imports import COMPILE_US_PER_BYTE, LOAD_US_PER_BYTE
+
+MILESTONES = ("imported", "first_output", "first_reading", "wifi_up", "first_upload")
+
+_POLL_SEC = 0.001
+
+
+async def _async_watch(main, broker, times:dict, clock) -> None:
+    """
+    Poll states of main and the broker, only reading them, so main runs as without watching.
+    """
+    while "wifi_up" not in times or "first_upload" not in times:
+        if "wifi_up" not in times and getattr(main, "wifi_connected", False):
+            times["wifi_up"] = clock.now_us
+        if "first_upload" not in times and broker.published:
+            times["first_upload"] = clock.now_us
+        await asyncio.sleep(_POLL_SEC)
+
+
+def boot(program:str|None = None, is_mpy:bool = False, seconds:float = 60, cache:bool = True) -> dict:
+    """
+    **Boot main.py on a new simulator and run main.main() until the first upload or seconds passed**
+
+    :param program: directory to run instead of program/.
+    :param is_mpy: True is charging imports at the rate of loading .mpy instead of compiling source.
+    :param seconds: virtual seconds to run at most.
+    :param cache: True is booting with files of a previous boot, like the access point cache.
+    :return: times of milestones in microseconds, None if not reached, and the cost of every import.
+    """
+    random.seed(0)  # backoff jitter of ConnectionManager
+    noise = random.Random(1)
+
+    sim = simulator.install(program=program or simulator.PROGRAM_DIR, import_cost=True,
+                            us_per_byte=LOAD_US_PER_BYTE if is_mpy else COMPILE_US_PER_BYTE)
+    lcd = sim.attach_i2c_lcd(0x27)
+    sim.attach_bmp180(0x77)
+    sim.set_adc(0, lambda: 200 + noise.randint(-3, 3))
+    access_point = sim.add_access_point("SSID", "PASSWORD")
+    broker = sim.start_broker()
+
+    times = {}
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            if cache:
+                _write_cache(access_point)
+
+            _unload_program()
+            main = _import_main()
+            times["imported"] = sim.clock.now_us
+
+            update_data = main.update_data
+
+            def timed_update_data(*args) -> None:
+                update_data(*args)
+                times.setdefault("first_reading", sim.clock.now_us)
+
+            main.update_data = timed_update_data
+
+            async def run() -> None:
+                asyncio.create_task(_async_watch(main, broker, times, sim.clock))
+                try:
+                    await asyncio.wait_for(main.main(), seconds)
+                except asyncio.TimeoutError:
+                    pass
+
+            sim.run(run())
+
+        finally:
+            os.chdir(cwd)
+            _unload_program()
+
+    times["first_output"] = lcd.first_write_us
+    imports = sim.imports.imported
+
+    return {"milestones_us": {name: times.get(name) for name in MILESTONES},
+            "imports": [{"module": name, "at_us": at_us, "cost_us": cost_us}
+                        for name, (at_us, cost_us) in imports.items()],
+            "import_total_us": sim.imports.total_us(),
+            "violations": [message for _, message in sim.trace.violations],
+            "screen": lcd.render().split("\n")}
+
+
+def report(result:dict, target_ms:float|None = None) -> str:
+    """
+    :return: a text table of milestones and imports in the order imported.
+    """
+    lines = [f"  {'milestone':<16}{'ms':>10}"]
+    for name, time_us in result["milestones_us"].items():
+        lines.append(f"  {name:<16}{'-' if time_us is None else f'{time_us / 1000:.1f}':>10}")
+
+    lines.append(f"  {'module':<44}{'at ms':>10}{'cost ms':>10}")
+    for entry in result["imports"]:
+        lines.append(f"  {entry['module']:<44}{entry['at_us'] / 1000:>10.1f}{entry['cost_us'] / 1000:>10.1f}")
+    lines.append(f"  {'sum':<54}{result['import_total_us'] / 1000:>10.1f}")
+
+    first_output = result["milestones_us"]["first_output"]
+    lines.append("first output " + ("never" if first_output is None else f"at {first_output / 1000:.1f} ms") +
+                 ("" if target_ms is None else f", target {target_ms:.0f} ms"))
+    lines.extend(f"violation: {message}" for message in result["violations"])
+    return "\n".join(lines)
+
+
+def main(argv:list|None = None) -> dict:
+    parser = argparse.ArgumentParser(prog="python -m simulator.boot",
+                                     description="Measure the boot of the plant monitor on the simulator.")
+    parser.add_argument("--program", metavar="DIR", help="run a tree built by tools/build_program.py "
+                                                         "instead of program/.")
+    parser.add_argument("--mpy", action="store_true", help="charge imports as loading .mpy, not compiling.")
+    parser.add_argument("--seconds", type=float, default=60, help="virtual seconds to run at most.")
+    parser.add_argument("--first-boot", action="store_true", help="boot without files of a previous boot.")
+    parser.add_argument("--target-ms", type=float, help="fail if the first output is later than it.")
+    parser.add_argument("--json", metavar="PATH", help="write results to a JSON file.")
+    args = parser.parse_args(argv)
+
+    result = boot(args.program, args.mpy, args.seconds, not args.first_boot)
+    print(report(result, args.target_ms))
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(result, file)
+
+    first_output = result["milestones_us"]["first_output"]
+    if args.target_ms is not None and (first_output is None or first_output > args.target_ms * 1000):
+        raise SystemExit(1)
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**Virtual clock of the simulator**
+
+MicroPython's sleep_us(), sleep_ms() and ticks_*() are replaced by this clock, so a sleep only
+advances the modeled time and returns at once.
+"""
+
+
+class Clock:
+
+    now_us:int = 0
+    """**Modeled time in microseconds since the simulator started**"""
+
+    slept_us:int = 0
+    """**Total modeled time spent in sleep_us() and sleep_ms()**"""
+
+    idle_us:int = 0
+    """**Total modeled time the event loop waited with no task ready, see Simulator.run()**"""
+
+    def __init__(self) -> None:
+        self.now_us = 0
+        self.slept_us = 0
+        self.idle_us = 0
+
+    def advance_us(self, us:int|float) -> None:
+        """
+        **Advance time without sleeping**
+
+        Used by modeled devices, like the I2C bus transferring bytes.
+        :param us: microseconds to advance.
+        """
+        self.now_us += us
+
+    def idle(self, us:int|float) -> None:
+        """
+        **Advance time while the event loop has nothing to run**
+
+        :param us: microseconds to advance.
+        """
+        self.now_us += us
+        self.idle_us += us
+
+    def sleep_us(self, us:int) -> None:
+        self.now_us += us
+        self.slept_us += us
+
+    def sleep_ms(self, ms:int) -> None:
+        self.sleep_us(ms * 1000)
+
+    def ticks_us(self) -> int:
+        return int(self.now_us)
+
+    def ticks_ms(self) -> int:
+        return int(self.now_us // 1000)
+
+    @staticmethod
+    def ticks_diff(end:int, start:int) -> int:
+        return end - start
+
+    @staticmethod
+    def ticks_add(ticks:int, delta:int) -> int:
+        return ticks + delta
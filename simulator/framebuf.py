@@ -0,0 +1,44 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**Simulated framebuf module**
+
+Only MONO_HLSB is supported, which is what lcd_api uses for custom chars.
+"""
+
+MONO_VLSB = 0
+MONO_HLSB = 3
+MONO_HMSB = 4
+
+
+class FrameBuffer:
+
+    def __init__(self, buffer, width:int, height:int, format:int, stride:int|None = None) -> None:
+        if format != MONO_HLSB:
+            raise ValueError("Only MONO_HLSB is simulated.")
+
+        self.buffer = buffer
+        self.width = width
+        self.height = height
+        self.stride = ((width if stride is None else stride) + 7) & ~7   # rows are padded to bytes
+
+    def _index(self, x:int, y:int) -> (int, int):
+        return (y * self.stride + x) >> 3, 7 - ((y * self.stride + x) & 7)
+
+    def pixel(self, x:int, y:int, color:int|None = None) -> int|None:
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+
+        index, bit = self._index(x, y)
+        if color is None:
+            return (self.buffer[index] >> bit) & 1
+
+        if color:
+            self.buffer[index] |= 1 << bit
+        else:
+            self.buffer[index] &= ~(1 << bit)
+
+    def fill(self, color:int) -> None:
+        for i in range(len(self.buffer)):
+            self.buffer[i] = 0xFF if color else 0x00
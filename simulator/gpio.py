@@ -0,0 +1,58 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**Parallel bus model**
+
+Connect simulated machine.Pin objects to HD44780 like HAL/ABC_GPIO4_HAL.py and HAL/ABC_GPIO8_HAL.py
+do. RS, RW and DB pins are sampled on the falling edge of E.
+"""
+
+from .hd44780 import HD44780
+
+
+class GPIOBus:
+
+    lcd:HD44780 = None
+    pins:dict = None
+    """**A dictionary of RS, RW, E and DB0~DB7** {PinName: Pin}, DB0~DB3 is None in 4pin mode"""
+
+    def __init__(self, lcd:HD44780, RS, RW, E, DB4, DB5, DB6, DB7,
+                 DB0 = None, DB1 = None, DB2 = None, DB3 = None) -> None:
+        """
+        **Constructor of bus**
+
+        :param lcd: HD44780 connected to the pins.
+        :param RW: None is GND, only writing.
+        :param DB0: DB0~DB3 are None in 4pin mode.
+        """
+        self.lcd = lcd
+        self.pins = {"RS": RS, "RW": RW, "E": E,
+                     "DB0": DB0, "DB1": DB1, "DB2": DB2, "DB3": DB3,
+                     "DB4": DB4, "DB5": DB5, "DB6": DB6, "DB7": DB7}
+        E.listen(self._on_enable)
+
+    def _level(self, name:str) -> int:
+        pin = self.pins[name]
+        return 0 if pin is None else pin.value()
+
+    def _on_enable(self, old:int, new:int) -> None:
+        if not old or new:
+            return      # only falling edge
+
+        rs = self._level("RS")
+        rw = self._level("RW")
+        data = 0
+        for bit in range(8):
+            data |= self._level(f"DB{bit}") << bit
+
+        if self.pins["DB0"] is None:
+            output = self.lcd.nibble(rs, rw, data >> 4) << 4
+        else:
+            output = self.lcd.transfer(rs, rw, data)
+
+        if rw:
+            for bit in range(8):
+                pin = self.pins[f"DB{bit}"]
+                if pin is not None:
+                    pin.drive((output >> bit) & 1)
@@ -0,0 +1,236 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**HD44780 controller model**
+
+Model DDRAM, CGRAM, the address counter, display shift and the 4bit or 8bit interface, and check
+that no instruction is sent while the controller is busy.
+"""
+
+from .clock import Clock
+from .trace import Trace
+
+EXECUTION_US = 37
+"""**Execution time of most instructions and RAM access at 270kHz**"""
+
+LONG_EXECUTION_US = 1520
+"""**Execution time of clear display and return home at 270kHz**"""
+
+POWER_ON_US = 40000
+"""**Time to wait after Vcc rises before the first instruction**"""
+
+CUSTOM_CHAR_GLYPHS = "⓪①②③④⑤⑥⑦"
+"""**Characters to render CGRAM chars 0~7 (and 8~15, same chars) as text**"""
+
+
+class HD44780:
+
+    clock:Clock = None
+    trace:Trace = None
+
+    ddram:bytearray = None
+    cgram:bytearray = None
+
+    address:int = 0
+    in_cgram:bool = False
+    increment:bool = True
+    shift_on_write:bool = False
+
+    display_on:bool = False
+    cursor_on:bool = False
+    blink:bool = False
+    display_shift:int = 0
+    """**Columns the display is shifted left, from 0 to 39**"""
+
+    is_8bit:bool = True
+    two_lines:bool = False
+
+    first_write_us:float|None = None
+    """**Time of the first character written to DDRAM**, when something shows. None is not yet"""
+
+    _high_nibble:int|None = None
+    _busy_until_us:float = 0
+    _power_on_us:float = 0
+
+    def __init__(self, clock:Clock, trace:Trace) -> None:
+        self.clock = clock
+        self.trace = trace
+        self.ddram = bytearray(b" " * 0x68)
+        self.cgram = bytearray(64)
+        self._power_on_us = clock.now_us
+        self._busy_until_us = clock.now_us + POWER_ON_US
+
+    # ---- interface ----
+
+    def nibble(self, rs:int, rw:int, data:int) -> int:
+        """
+        **Latch DB7~DB4 on E falling edge**
+
+        In 8bit mode, DB3~DB0 are seen as 0, which is the case while initializing in 4bit mode.
+        :param data: DB7~DB4 level in 4 low bits.
+        :return: DB7~DB4 output when reading.
+        """
+        data &= 0x0F
+
+        if self.is_8bit:
+            return self.transfer(rs, rw, data << 4) >> 4
+
+        if self._high_nibble is None:
+            self._high_nibble = data
+            return self._peek(rs) >> 4 if rw else 0
+
+        byte = (self._high_nibble << 4) | data
+        self._high_nibble = None
+        return self.transfer(rs, rw, byte) & 0x0F
+
+    def transfer(self, rs:int, rw:int, data:int) -> int:
+        """
+        **Execute a full 8bit transfer**
+
+        :return: data read if rw is HIGH.
+        """
+        if rw:
+            return self._read(rs)
+
+        if self.clock.now_us < self._busy_until_us:
+            self.trace.violation(f"{'data' if rs else 'instruction'} 0x{data:02X} sent "
+                                 f"{self._busy_until_us - self.clock.now_us:.0f}us before ready")
+
+        if rs:
+            self._write_ram(data)
+        else:
+            self._instruction(data)
+
+        return 0
+
+    # ---- internal ----
+
+    def _moved(self, address:int, right:bool) -> int:
+        if self.in_cgram:
+            return (address + (1 if right else -1)) & 0x3F
+
+        if not self.two_lines:
+            return (address + (1 if right else -1)) % 0x50
+
+        if right:
+            return 0x40 if address == 0x27 else 0x00 if address == 0x67 else address + 1
+        else:
+            return 0x67 if address == 0x00 else 0x27 if address == 0x40 else address - 1
+
+    def _busy(self, us:int) -> None:
+        self._busy_until_us = self.clock.now_us + us
+
+    def _instruction(self, data:int) -> None:
+        self.trace.instruction("instruction", data)
+        self._busy(EXECUTION_US)
+
+        if data & 0x80:                 # set DDRAM address
+            self.address = data & 0x7F
+            self.in_cgram = False
+
+        elif data & 0x40:               # set CGRAM address
+            self.address = data & 0x3F
+            self.in_cgram = True
+
+        elif data & 0x20:               # function set
+            self.is_8bit = bool(data & 0x10)
+            self.two_lines = bool(data & 0x08)
+            self._high_nibble = None
+
+        elif data & 0x10:               # cursor or display shift
+            right = bool(data & 0x04)
+            if data & 0x08:
+                self.display_shift = (self.display_shift + (-1 if right else 1)) % 40
+            else:
+                self.in_cgram = False
+                self.address = self._moved(self.address, right)
+
+        elif data & 0x08:               # display control
+            self.display_on = bool(data & 0x04)
+            self.cursor_on = bool(data & 0x02)
+            self.blink = bool(data & 0x01)
+
+        elif data & 0x04:               # entry mode set
+            self.increment = bool(data & 0x02)
+            self.shift_on_write = bool(data & 0x01)
+
+        elif data & 0x02:               # return home
+            self.address = 0
+            self.in_cgram = False
+            self.display_shift = 0
+            self._busy(LONG_EXECUTION_US)
+
+        elif data & 0x01:               # clear display
+            self.ddram[:] = b" " * len(self.ddram)
+            self.address = 0
+            self.in_cgram = False
+            self.display_shift = 0
+            self.increment = True
+            self._busy(LONG_EXECUTION_US)
+
+    def _write_ram(self, data:int) -> None:
+        self.trace.instruction("write", data)
+        self._busy(EXECUTION_US)
+
+        if self.in_cgram:
+            self.cgram[self.address] = data & 0x1F
+        elif self.address < len(self.ddram):
+            self.ddram[self.address] = data
+            if self.first_write_us is None:
+                self.first_write_us = self.clock.now_us
+            if self.shift_on_write:
+                self.display_shift = (self.display_shift + (1 if self.increment else -1)) % 40
+
+        self.address = self._moved(self.address, self.increment)
+
+    def _peek(self, rs:int) -> int:
+        if not rs:
+            busy = self.clock.now_us < self._busy_until_us
+            return (0x80 if busy else 0) | (self.address & 0x7F)
+
+        if self.in_cgram:
+            return self.cgram[self.address]
+        return self.ddram[self.address] if self.address < len(self.ddram) else 0x20
+
+    def _read(self, rs:int) -> int:
+        data = self._peek(rs)
+
+        if rs:
+            self.trace.instruction("read", data)
+            self._busy(EXECUTION_US)
+            self.address = self._moved(self.address, self.increment)
+
+        return data
+
+    # ---- inspection ----
+
+    def line(self, row:int, columns:int = 16) -> str:
+        """
+        **Render a visible line as text**
+
+        Display shift is applied. CGRAM chars are rendered by CUSTOM_CHAR_GLYPHS.
+        :param row: 0 or 1.
+        :param columns: visible columns.
+        """
+        if not self.display_on:
+            return " " * columns
+
+        text = []
+        for col in range(columns):
+            code = self.ddram[0x40 * row + (col + self.display_shift) % 40]
+            text.append(CUSTOM_CHAR_GLYPHS[code & 0x07] if code < 0x10 else chr(code))
+        return "".join(text)
+
+    def render(self, columns:int = 16) -> str:
+        """
+        :return: visible screen as text, lines are split by \\n.
+        """
+        return "\n".join(self.line(row, columns) for row in range(2 if self.two_lines else 1))
+
+    def custom_char(self, index:int) -> list[str]:
+        """
+        :return: 8 rows of a CGRAM char, "#" is lighted and "." is not.
+        """
+        return ["".join("#" if (row >> (4 - x)) & 1 else "." for x in range(5))
+                for row in self.cgram[index << 3:(index << 3) + 8]]
@@ -0,0 +1,124 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**Modeled cost of importing modules on the board**
+
+CPython imports a module of program/ in microseconds, but ESP8266 compiles a .py to bytecode on the heap,
+which takes about as long as the source is big. The virtual clock is advanced by the modeled cost when a
+module is imported, so the order of imports shows on boot time, see simulator/boot.py.
+
+Modules simulated here, like umqtt.simple, are frozen in the ESP8266 firmware. Importing them only runs
+their top level, charged as a fixed cost. machine, network and others built in C are free.
+"""
+
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import sys
+from os import path
+
+from .clock import Clock
+
+COMPILE_US_PER_BYTE = 60
+"""**Compiling .py source on ESP8266 at 80MHz**, about 16KB per second"""
+
+LOAD_US_PER_BYTE = 6
+"""**Loading .mpy bytecode**, no compiling, so about 10 times faster"""
+
+FROZEN_US = 2000
+"""**Running the top level of a frozen module**"""
+
+
+class _CostLoader(importlib.abc.Loader):
+
+    loader:importlib.abc.Loader = None
+    model = None
+    us:int = 0
+
+    def __init__(self, loader:importlib.abc.Loader, model, us:int) -> None:
+        self.loader = loader
+        self.model = model
+        self.us = us
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module) -> None:
+        self.model.charge(module.__name__, self.us)    # compiled before its top level runs
+        self.loader.exec_module(module)
+
+
+class _FrozenLoader(importlib.abc.Loader):
+    """
+    Return the simulated module, it's created once by simulator/__init__.py.
+    """
+
+    name:str = None
+    module = None
+    model = None
+
+    def __init__(self, name:str, module, model) -> None:
+        self.name = name
+        self.module = module
+        self.model = model
+
+    def create_module(self, spec):
+        return self.module
+
+    def exec_module(self, module) -> None:
+        self.model.charge(self.name, FROZEN_US)     # module.__name__ is the one in simulator/
+
+
+class ImportModel(importlib.abc.MetaPathFinder):
+    """
+    **Finder charging the virtual clock for every import**
+
+    Insert it to sys.meta_path by simulator.install(import_cost=True).
+    """
+
+    clock:Clock = None
+    program_dir:str = None
+    us_per_byte:int = COMPILE_US_PER_BYTE
+    frozen:dict = None
+
+    imported:dict = None
+    """**Module name: (time_us imported at, cost_us)** in the order imported"""
+
+    def __init__(self, clock:Clock, program_dir:str, frozen:dict, us_per_byte:int = COMPILE_US_PER_BYTE) -> None:
+        """
+        **Constructor of model**
+
+        :param program_dir: modules under it are charged by size of source.
+        :param frozen: name: simulated module, charged by FROZEN_US. They are removed from sys.modules.
+        :param us_per_byte: COMPILE_US_PER_BYTE, or LOAD_US_PER_BYTE for a tree compiled by mpy-cross. The
+            simulator imports its sources, so the size of source is charged at the rate of bytecode.
+        """
+        self.clock = clock
+        self.program_dir = program_dir
+        self.us_per_byte = us_per_byte
+        self.frozen = frozen
+        self.imported = {}
+
+        for name in frozen:
+            sys.modules.pop(name, None)
+
+    def find_spec(self, name:str, search_path, target = None):
+        if name in self.frozen:
+            return importlib.util.spec_from_loader(name, _FrozenLoader(name, self.frozen[name], self),
+                                                   is_package=hasattr(self.frozen[name], "__path__"))
+
+        spec = importlib.machinery.PathFinder.find_spec(name, search_path)
+        if spec is None or spec.origin is None or \
+                not path.abspath(spec.origin).startswith(self.program_dir + path.sep):
+            return None
+
+        spec.loader = _CostLoader(spec.loader, self, path.getsize(spec.origin) * self.us_per_byte)
+        return spec
+
+    def charge(self, name:str, us:int) -> None:
+        self.imported[name] = (self.clock.now_us, us)
+        self.clock.advance_us(us)
+
+    def total_us(self) -> int:
+        return sum(us for _, us in self.imported.values())
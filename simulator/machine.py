@@ -0,0 +1,242 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**Simulated machine module**
+
+Installed as `machine` by simulator.install(). Pin, I2C and ADC are backed by modeled devices, and
+every I2C transfer advances the virtual clock by its bus time. Timer runs on the virtual clock.
+"""
+
+from .clock import Clock
+from .trace import Trace
+
+clock:Clock|None = None
+trace:Trace|None = None
+
+devices:dict = {}
+"""**Devices on the I2C bus** {address: device}, device has write(data) and read(size)"""
+
+
+class Pin:
+
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 1
+    IRQ_RISING = 2
+
+    registry:dict = {}
+    """**Pins created** {id: Pin}, the same id is the same pin"""
+
+    id = None
+    mode:int = IN
+    pull:int|None = None
+
+    _level:int = 0
+    _input:int = 0
+    _listeners:list = None
+    _handler = None
+    _trigger:int = 0
+
+    def __new__(cls, id, *args, **kwargs):
+        pin = cls.registry.get(id)
+        if pin is None:
+            pin = super().__new__(cls)
+            pin.id = id
+            pin._listeners = []
+            cls.registry[id] = pin
+        return pin
+
+    def __init__(self, id, mode:int = -1, pull:int = -1, value:int|None = None) -> None:
+        self.init(mode, pull, value)
+
+    def init(self, mode:int = -1, pull:int = -1, value:int|None = None) -> None:
+        if mode != -1:
+            self.mode = mode
+        if pull != -1:
+            self.pull = pull
+            if pull == Pin.PULL_UP: self._input = 1
+        if value is not None:
+            self.value(value)
+
+    def value(self, level:int|None = None) -> int|None:
+        if level is None:
+            return self._level if self.mode == Pin.OUT else self._input
+
+        old = self._level
+        self._level = 1 if level else 0
+        if self.mode == Pin.OUT:
+            for listener in self._listeners:
+                listener(old, self._level)
+
+    def on(self) -> None:
+        self.value(1)
+
+    def off(self) -> None:
+        self.value(0)
+
+    def high(self) -> None:
+        self.value(1)
+
+    def low(self) -> None:
+        self.value(0)
+
+    def irq(self, handler = None, trigger:int = IRQ_FALLING | IRQ_RISING) -> None:
+        self._handler = handler
+        self._trigger = trigger
+
+    def listen(self, listener) -> None:
+        """
+        **Call listener(old, new) when the pin outputs a level**
+        """
+        self._listeners.append(listener)
+
+    def drive(self, level:int) -> None:
+        """
+        **Drive the pin from outside, like a button or a device output**
+
+        The IRQ handler is called on a matched edge.
+        """
+        old = self._input
+        self._input = 1 if level else 0
+
+        if self._handler is not None and old != self._input:
+            if (self._trigger & Pin.IRQ_RISING and self._input) or (self._trigger & Pin.IRQ_FALLING and not self._input):
+                self._handler(self)
+
+    @classmethod
+    def reset(cls) -> None:
+        cls.registry = {}
+
+
+class I2C:
+
+    freq:int = 400000
+
+    def __init__(self, id:int = -1, scl:Pin|None = None, sda:Pin|None = None, freq:int = 400000) -> None:
+        self.freq = freq
+
+    def _device(self, address:int):
+        device = devices.get(address)
+        if device is None:
+            raise OSError(19)   # ENODEV, no ACK
+        return device
+
+    def _transfer(self, size:int) -> None:
+        if clock is not None:
+            clock.advance_us((size + 1) * 9 * 1000000 / self.freq)  # address byte and 9 bits per byte
+        if trace is not None:
+            trace.bus(size + 1)
+
+    def scan(self) -> list:
+        return sorted(devices)
+
+    def writeto(self, address:int, data:bytes, stop:bool = True) -> int:
+        device = self._device(address)
+        self._transfer(len(data))
+        device.write(bytes(data))
+        return len(data)
+
+    def readfrom(self, address:int, size:int, stop:bool = True) -> bytes:
+        device = self._device(address)
+        self._transfer(size)
+        return device.read(size)
+
+    def readfrom_into(self, address:int, buffer:bytearray, stop:bool = True) -> None:
+        buffer[:] = self.readfrom(address, len(buffer))
+
+    def writeto_mem(self, address:int, memory_address:int, data:bytes) -> None:
+        device = self._device(address)
+        self._transfer(len(data) + 1)
+        device.write_mem(memory_address, bytes(data))
+
+    def readfrom_mem(self, address:int, memory_address:int, size:int) -> bytes:
+        device = self._device(address)
+        self._transfer(size + 2)     # register address and repeated start
+        return device.read_mem(memory_address, size)
+
+    def readfrom_mem_into(self, address:int, memory_address:int, buffer:bytearray) -> None:
+        buffer[:] = self.readfrom_mem(address, memory_address, len(buffer))
+
+
+class ADC:
+
+    sources:dict = {}
+    """**Value sources of ADC channels** {id: function() -> int}"""
+
+    id:int = 0
+
+    def __init__(self, id:int = 0) -> None:
+        self.id = id
+
+    def read(self) -> int:
+        source = ADC.sources.get(self.id)
+        return 0 if source is None else int(source())
+
+    def read_u16(self) -> int:
+        return self.read() << 6
+
+
+class Timer:
+    """
+    **Virtual timer of ESP8266**
+
+    Callbacks are run by Timer.run_due(), called when the event loop of Simulator.run() idles, so a callback
+    may run late by the longest wait of the loop.
+    """
+
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    armed:list = []
+    """**Timers waiting to fire**"""
+
+    mode:int = PERIODIC
+    period:int = -1
+    callback = None
+    deadline_us:int = 0
+
+    def __init__(self, id:int = -1) -> None:
+        pass
+
+    def init(self, mode:int = PERIODIC, period:int = -1, callback = None) -> None:
+        self.deinit()
+        self.mode = mode
+        self.period = period
+        self.callback = callback
+        self.deadline_us = clock.now_us + period * 1000
+        Timer.armed.append(self)
+
+    def deinit(self) -> None:
+        if self in Timer.armed:
+            Timer.armed.remove(self)
+
+    @classmethod
+    def run_due(cls) -> None:
+        for timer in list(cls.armed):
+            if clock.now_us >= timer.deadline_us:
+                if timer.mode == cls.PERIODIC:
+                    timer.deadline_us += timer.period * 1000
+                else:
+                    cls.armed.remove(timer)
+                timer.callback(timer)
+
+    @classmethod
+    def reset(cls) -> None:
+        cls.armed = []
+
+
+def unique_id() -> bytes:
+    return b"\x51\x4d\x00\x01"
+
+
+def freq(hz:int|None = None) -> int|None:
+    if hz is None:
+        return 80000000
+
+
+def reset() -> None:
+    raise SystemExit("machine.reset()")
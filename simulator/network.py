@@ -0,0 +1,153 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**Simulated network module**
+
+Installed as `network` by simulator.install(). WLAN connects to AccessPoint objects in
+network.access_points, and connecting takes modeled time of scan, association and DHCP.
+"""
+
+from .clock import Clock
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_WRONG_PASSWORD = 2
+STAT_NO_AP_FOUND = 3
+STAT_CONNECT_FAIL = 4
+STAT_GOT_IP = 5
+
+clock:Clock|None = None
+
+access_points:list = []
+
+
+class AccessPoint:
+
+    ssid:str = "SSID"
+    password:str = "PASSWORD"
+    bssid:bytes = b"\x02\x00\x00\x00\x00\x01"
+    channel:int = 6
+    rssi:int = -60
+
+    up:bool = True
+    """**False is the access point out of service, the connected station is dropped**"""
+
+    scan_ms:int = 2000
+    """**Time to scan all channels, skipped when connecting with bssid**"""
+
+    associate_ms:int = 300
+    dhcp_ms:int = 1000
+    """**Time to get an IP by DHCP, skipped when a static IP config is set**"""
+
+    def __init__(self, ssid:str = "SSID", password:str = "PASSWORD", rssi:int = -60, **timing) -> None:
+        """
+        **Constructor of access point**
+
+        :param timing: scan_ms, associate_ms and dhcp_ms.
+        """
+        self.ssid = ssid
+        self.password = password
+        self.rssi = rssi
+        for name, value in timing.items():
+            setattr(self, name, value)
+
+
+class WLAN:
+
+    interfaces:dict = {}
+    """**WLAN created** {interface: WLAN}, the same interface is the same object"""
+
+    _active:bool = False
+    _status:int = STAT_IDLE
+    _result:int = STAT_IDLE
+    _done_us:float = 0
+    _access_point:AccessPoint|None = None
+    _ifconfig:tuple = ("0.0.0.0", "0.0.0.0", "0.0.0.0", "0.0.0.0")
+    _static_ip:bool = False
+
+    def __new__(cls, interface:int = STA_IF):
+        wlan = cls.interfaces.get(interface)
+        if wlan is None:
+            wlan = super().__new__(cls)
+            cls.interfaces[interface] = wlan
+        return wlan
+
+    def active(self, is_active:bool|None = None) -> bool|None:
+        if is_active is None:
+            return self._active
+        self._active = bool(is_active)
+        if not is_active:
+            self.disconnect()
+
+    def connect(self, ssid:str, key:str, bssid:bytes|None = None) -> None:
+        if not self._active:
+            raise OSError("WiFi Not Started")
+
+        delay_ms = 0
+        self._access_point = None
+        self._result = STAT_NO_AP_FOUND
+
+        for access_point in access_points:
+            if access_point.up and access_point.ssid == ssid and bssid in (None, access_point.bssid):
+                self._access_point = access_point
+                break
+
+        if bssid is None or self._access_point is None:
+            delay_ms += max([ap.scan_ms for ap in access_points] + [0])
+
+        if self._access_point is not None:
+            delay_ms += self._access_point.associate_ms
+            if self._access_point.password != key:
+                self._result = STAT_WRONG_PASSWORD
+            else:
+                self._result = STAT_GOT_IP
+                if not self._static_ip:
+                    delay_ms += self._access_point.dhcp_ms
+
+        self._status = STAT_CONNECTING
+        self._done_us = clock.now_us + delay_ms * 1000
+
+    def disconnect(self) -> None:
+        self._status = STAT_IDLE
+        self._access_point = None
+
+    def status(self, param:str|None = None):
+        if self._status == STAT_CONNECTING and clock.now_us >= self._done_us:
+            self._status = self._result
+            if self._result == STAT_GOT_IP and not self._static_ip:
+                self._ifconfig = ("192.168.1.100", "255.255.255.0", "192.168.1.1", "192.168.1.1")
+
+        if self._status == STAT_GOT_IP and not self._access_point.up:
+            self.disconnect()   # link lost
+
+        if param == "rssi":
+            return self._access_point.rssi if self._status == STAT_GOT_IP else 0
+
+        return self._status
+
+    def isconnected(self) -> bool:
+        return self.status() == STAT_GOT_IP
+
+    def ifconfig(self, config:tuple|None = None) -> tuple|None:
+        if config is None:
+            return self._ifconfig
+        self._ifconfig = tuple(config)
+        self._static_ip = True
+
+    def scan(self) -> list:
+        clock.advance_us(max([ap.scan_ms for ap in access_points] + [0]) * 1000)   # scan() blocks
+        return [(ap.ssid.encode(), ap.bssid, ap.channel, ap.rssi, 3, False)
+                for ap in access_points if ap.up]
+
+    def config(self, param:str):
+        if param == "mac":
+            return b"\x02\x51\x4d\x00\x00\x01"
+        raise ValueError("unknown config param")
+
+    @classmethod
+    def reset(cls) -> None:
+        cls.interfaces = {}
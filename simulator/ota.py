@@ -0,0 +1,317 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**End-to-end over-the-air update on the simulator**
+
+Run `python -m simulator.ota` in the repo's root. A board is a temporary directory holding a copy of
+program/, and powering it on runs boot.py then main.main() with the working directory at it, like the
+filesystem of the board. A new release is bundled by tools/ota_bundle.py and served by a local HTTP server,
+and the update command is sent to main.py by the simulated broker after its first upload. Scenarios:
+
+- update: the release is downloaded, swapped in at reset, and kept after the first upload.
+- power_cut: like update, but power is cut in the middle of the swap, which is resumed at the next boot.
+- bad_hash: a file served differs from the manifest, the download is refused and nothing changes.
+- rollback: the release crashes at import, the trial timer resets the board and the files before come back.
+
+Every scenario checks the files on the board and the responses of the command, and fails with exit code 1
+if they are not as expected. The peak allocation of downloading a large file is measured too, it's about
+the chunk buffer and the manifest, not the file, as files are streamed.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import importlib
+import json
+import os
+import random
+import runpy
+import shutil
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+import simulator
+from simulator.benchmark import _REPO_DIR, _import_main, _unload_program, _write_cache
+
+sys.path.insert(0, os.path.join(_REPO_DIR, "tools"))
+from ota_bundle import MANIFEST_FILE, bundle, is_bundled
+
+COMMAND_ID = 7
+RUN_SEC = 60
+"""**Virtual seconds to run main.main() every power on**, more than a cycle and an upload"""
+
+
+def _snapshot(directory:str) -> dict:
+    """
+    :return: {path: SHA-256} of files an update could change.
+    """
+    files = {}
+    for root, dirs, names in os.walk(directory):
+        for name in names:
+            path = os.path.relpath(os.path.join(root, name), directory).replace(os.sep, "/")
+            if is_bundled(path):
+                with open(os.path.join(root, name), "rb") as file:
+                    files[path] = hashlib.sha256(file.read()).hexdigest()
+    return files
+
+
+def _make_release(directory:str, main_suffix:str) -> None:
+    """
+    A copy of program/ with main.py changed and a new module, to check new files are added and removed.
+    """
+    shutil.copytree(simulator.PROGRAM_DIR, directory, ignore=shutil.ignore_patterns("__pycache__"))
+    with open(os.path.join(directory, "main.py"), "a", encoding="UTF-8") as file:
+        file.write(main_suffix)
+    with open(os.path.join(directory, "release_notes.py"), "w", encoding="UTF-8") as file:
+        file.write('NOTES = "Added by the update."\n')
+
+
+async def _async_send_update(main, broker, url:str) -> None:
+    while not broker.published or main.COMMAND_TOPIC is None:   # the topic is known after the first upload
+        await asyncio.sleep(1)
+    broker.send(main.COMMAND_TOPIC, json.dumps({"id": COMMAND_ID, "update": url}).encode())
+
+
+def power_on(board:str, url:str|None = None, cut_after_renames:int|None = None) -> dict:
+    """
+    **Power on a board: run boot.py, then main.main() for RUN_SEC**
+
+    If main.py crashes, the board sits at the REPL until the trial timer of ota.py resets it, if armed.
+    :param url: manifest URL to send the update command with after the first upload. None is no command.
+    :param cut_after_renames: cut power at that rename of ota.py, like in the middle of a swap.
+    :return: {"ota": state of ota.json after boot.py, "end": "running", "reset", "power cut", "crashed" or
+        "crashed, reset", "responses": [responses of commands]}
+    """
+    random.seed(0)  # backoff jitter of ConnectionManager
+    sim = simulator.install(program=board)
+    sim.attach_i2c_lcd(0x27)
+    sim.attach_bmp180(0x77)
+    sim.set_adc(0, lambda: 200)
+    access_point = sim.add_access_point("SSID", "PASSWORD")
+    broker = sim.start_broker()
+
+    result = {"ota": None, "end": "running", "responses": []}
+    cwd = os.getcwd()
+    os.chdir(board)
+    if not os.path.exists("network_cache.json"):
+        _write_cache(access_point)  # booted before, like steady_state of the benchmark
+    _unload_program()
+    importlib.invalidate_caches()   # files of the board are changed by the swap
+
+    try:
+        if cut_after_renames is not None:
+            ota = importlib.import_module("ota")    # reused by boot.py
+            rename = ota.rename
+            renames = []
+
+            def cut_rename(source:str, target:str) -> None:
+                renames.append(source)
+                if len(renames) == cut_after_renames:
+                    raise SystemExit("power cut")
+                rename(source, target)
+
+            ota.rename = cut_rename
+
+        try:
+            runpy.run_path("boot.py")
+        finally:
+            if os.path.exists("ota.json"):
+                with open("ota.json", "r") as file:
+                    result["ota"] = json.load(file)["state"]
+
+        main = _import_main()
+
+        def on_exception(loop, context) -> None:
+            if not isinstance(context.get("exception"), SystemExit):    # machine.reset() of a task is expected
+                loop.default_exception_handler(context)
+
+        async def run() -> None:
+            asyncio.get_running_loop().set_exception_handler(on_exception)
+            if url is not None:
+                asyncio.create_task(_async_send_update(main, broker, url))
+            try:
+                await asyncio.wait_for(main.main(), RUN_SEC)
+            except asyncio.TimeoutError:
+                pass
+
+        sim.run(run())
+
+    except SystemExit as e:
+        result["end"] = "power cut" if str(e) == "power cut" else "reset"
+
+    except Exception as e:
+        result["end"] = "crashed"
+        result["error"] = repr(e)
+        try:
+            sim.run(asyncio.sleep(sys.modules["ota"].TRIAL_SEC + 10 if "ota" in sys.modules else RUN_SEC))
+        except SystemExit:
+            result["end"] = "crashed, reset"
+
+    finally:
+        os.chdir(cwd)
+        _unload_program()
+
+    for topic, message, _, _ in broker.messages:
+        if topic.endswith(b"/response"):
+            result["responses"].append(json.loads(message))
+    return result
+
+
+def measure_download(work_dir:str, server_url:str, size:int = 262144) -> dict:
+    """
+    **Peak allocation of ota.async_download() of one file of size bytes, on the host**
+
+    Only compare it with the size, CPython objects are bigger than MicroPython's.
+    :param server_url: URL of the HTTP server serving work_dir.
+    """
+    release = os.path.join(work_dir, "download", "release")
+    board = os.path.join(work_dir, "download", "board")
+    os.makedirs(release)
+    os.makedirs(board)
+    with open(os.path.join(release, "blob.bin"), "wb") as file:
+        file.write(random.Random(0).randbytes(size))
+    bundle(release, os.path.join(work_dir, "download", "ota"), "download")
+
+    simulator.install(program=simulator.PROGRAM_DIR)
+    cwd = os.getcwd()
+    os.chdir(board)
+    _unload_program()
+    try:
+        ota = importlib.import_module("ota")
+
+        async def download() -> int:
+            tracemalloc.start()     # after the event loop is created
+            try:
+                await ota.async_download(f"{server_url}/download/ota/{MANIFEST_FILE}")
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        peak = asyncio.run(download())
+    finally:
+        os.chdir(cwd)
+        _unload_program()
+
+    return {"file_bytes": size, "alloc_peak_bytes": peak}
+
+
+def run_scenario(name:str, work_dir:str, server_url:str) -> dict:
+    """
+    **Make a board and a release in work_dir, and update the board**
+
+    :param server_url: URL of the HTTP server serving work_dir.
+    :return: {"steps": results of power_on(), "failed": descriptions of checks failed}
+    """
+    board = os.path.join(work_dir, name, "board")
+    release = os.path.join(work_dir, name, "release")
+    served = os.path.join(work_dir, name, "ota")
+    url = f"{server_url}/{name}/ota/{MANIFEST_FILE}"
+
+    shutil.copytree(simulator.PROGRAM_DIR, board, ignore=shutil.ignore_patterns("__pycache__"))
+    broken = name == "rollback"
+    _make_release(release, '\nraise RuntimeError("Broken release.")\n' if broken else '\nRELEASE = "new"\n')
+    bundle(release, served, name)
+    if name == "bad_hash":
+        with open(os.path.join(served, "lcd_layout.py"), "r+b") as file:   # same size, another byte
+            first = file.read(1)
+            file.seek(0)
+            file.write(b"#" if first != b"#" else b" ")
+
+    before, new = _snapshot(board), _snapshot(release)
+    steps = [power_on(board, url)]
+    acked = {"id": COMMAND_ID, "ok": True, "update": "downloading"} in steps[0]["responses"]
+
+    if name == "bad_hash":
+        checks = [("download refused", any(not response["ok"] and "SHA-256" in response["error"]
+                                           for response in steps[0]["responses"])),
+                  ("not reset", steps[0]["end"] == "running"),
+                  ("files unchanged", _snapshot(board) == before)]
+
+    elif name == "rollback":
+        steps.append(power_on(board))
+        steps.append(power_on(board))
+        checks = [("acked", acked), ("reset to swap", steps[0]["end"] == "reset"),
+                  ("trial crashed and reset by timer", steps[1]["ota"] == "trial" and
+                   steps[1]["end"] == "crashed, reset"),
+                  ("rolled back", steps[2]["ota"] == "rolled_back" and steps[2]["end"] == "running"),
+                  ("rollback reported", {"id": COMMAND_ID, "ok": False, "error": "Rolled back from rollback."}
+                   in steps[2]["responses"]),
+                  ("files restored", _snapshot(board) == before)]
+
+    else:
+        if name == "power_cut":
+            steps.append(power_on(board, cut_after_renames=3))
+        steps.append(power_on(board))
+        checks = [("acked", acked), ("reset to swap", steps[0]["end"] == "reset"),
+                  ("trial kept", steps[-1]["ota"] == "trial" and steps[-1]["end"] == "running"),
+                  ("kept reported", {"id": COMMAND_ID, "ok": True, "version": name} in steps[-1]["responses"]),
+                  ("files updated", _snapshot(board) == new)]
+        if name == "power_cut":
+            checks.append(("power cut in swap", steps[1]["ota"] == "swap" and steps[1]["end"] == "power cut"))
+
+    checks.append(("no update left", not any(os.path.exists(os.path.join(board, path))
+                                             for path in ("ota.json", ".ota_new", ".ota_old"))))
+    return {"steps": steps, "failed": [description for description, passed in checks if not passed]}
+
+
+SCENARIOS = ("update", "power_cut", "bad_hash", "rollback")
+
+
+def report(results:dict) -> str:
+    """
+    :return: a text table of every power on of every scenario.
+    """
+    lines = []
+    for name, result in results["scenarios"].items():
+        lines.append(f"[{name}] " + ("ok" if not result["failed"] else "FAILED: " + ", ".join(result["failed"])))
+        for i, step in enumerate(result["steps"]):
+            lines.append(f"  power on {i + 1}: ota {step['ota'] or '-'}, {step['end']}" +
+                         (f" ({step['error']})" if "error" in step else ""))
+            lines.extend(f"    response {json.dumps(response)}" for response in step["responses"])
+
+    download = results["download"]
+    lines.append(f"downloading a file of {download['file_bytes']} B allocates {download['alloc_peak_bytes']} B "
+                 f"at peak")
+    return "\n".join(lines)
+
+
+def main(argv:list|None = None) -> dict:
+    parser = argparse.ArgumentParser(prog="python -m simulator.ota",
+                                     description="Update a simulated board over the air end to end.")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS,
+                        help="scenario to run, repeat for more. Default is all.")
+    parser.add_argument("--json", metavar="PATH", help="write results to a JSON file.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        # another process, so its buffers are not traced by measure_download()
+        server = subprocess.Popen([sys.executable, "-u", "-m", "http.server", "0", "--bind", "127.0.0.1",
+                                   "--directory", work_dir], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                  text=True)
+        line = server.stdout.readline()     # Serving HTTP on 127.0.0.1 port 40000 (http://127.0.0.1:40000/) ...
+        server_url = f"http://127.0.0.1:{line.split(' port ')[1].split()[0]}"
+
+        try:
+            results = {"scenarios": {name: run_scenario(name, work_dir, server_url)
+                                     for name in args.scenario or SCENARIOS},
+                       "download": measure_download(work_dir, server_url)}
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(report(results))
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file)
+
+    if any(result["failed"] for result in results["scenarios"].values()):
+        raise SystemExit(1)
+    return results
+
+
+if __name__ == "__main__":
+    main()
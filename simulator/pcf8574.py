@@ -0,0 +1,57 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**PCF8574 backpack model**
+
+P4~P7 are DB4~DB7 of the LCD, P3 is backlight, P2 is E Pin, P1 is RW Pin, P0 is RS Pin, the same as
+HAL/pcf8574_I2C_HAL.py. A nibble is latched by HD44780 on the falling edge of E.
+"""
+
+from .hd44780 import HD44780
+
+
+class PCF8574:
+
+    lcd:HD44780 = None
+
+    port:int = 0xFB
+    """**Output latch of P0~P7**, HIGH after power-on except E, see __init__()"""
+
+    backlight:bool = True
+
+    _read_nibble:int = 0x0F
+
+    def __init__(self, lcd:HD44780) -> None:
+        """
+        **Constructor of backpack**
+
+        :param lcd: HD44780 connected to the port.
+        """
+        self.lcd = lcd
+        # The real latch is all HIGH, so the first write of the HAL drops E. HD44780 ignores that nibble
+        # while it resets itself after Vcc, so E starts LOW instead of reporting an early instruction.
+        self.port = 0xFB
+
+    def write(self, data:bytes) -> None:
+        """
+        **Receive bytes of an I2C write, every byte is latched to the port**
+        """
+        for byte in data:
+            falling = (self.port & 0x04) and not (byte & 0x04)
+            self.port = byte
+            self.backlight = bool(byte & 0x08)
+
+            if falling:
+                self._read_nibble = self.lcd.nibble(byte & 0x01, byte & 0x02, byte >> 4)
+
+    def read(self, size:int) -> bytes:
+        """
+        **Send bytes of an I2C read**
+
+        Pins written HIGH are quasi-inputs, so DB4~DB7 show the nibble HD44780 output while reading.
+        """
+        value = self.port
+        if value & 0x02:
+            value = (value & 0x0F) | ((self._read_nibble & (value >> 4)) << 4)
+        return bytes([value]) * size
@@ -0,0 +1,147 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**Replay hours of main.main() and report allocations per cycle**
+
+Run `python -m simulator.replay --hours 24` in the repo's root. The real main loop of program/main.py runs
+on virtual time with all background tasks, and allocations between two cycles are traced by tracemalloc:
+
+- transient: peak bytes above the start of the cycle, what the heap must hold at once.
+- retained: bytes still allocated at the end of the cycle. A steady growth through the replay is a leak.
+
+CPython objects are much bigger than MicroPython's, so only compare results between runs. Collections are
+counted by program/heap.py, both idle ones and the ones by its threshold are included.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import tracemalloc
+from array import array
+
+import simulator
+from simulator.benchmark import _unload_program
+
+
+class CycleRecorder:
+    """
+    Results are kept in preallocated arrays, so the recorder itself won't look like a leak.
+    """
+
+    transient:array = None
+    retained:array = None
+    cycles:int = 0
+    _start:int = 0
+
+    def __init__(self, max_cycles:int) -> None:
+        self.transient = array('q', bytes(8 * max_cycles))
+        self.retained = array('q', bytes(8 * max_cycles))
+
+    def mark(self) -> None:
+        """
+        **End the last cycle and start a new one**
+        """
+        current, peak = tracemalloc.get_traced_memory()
+        if self._start and self.cycles < len(self.transient):
+            self.transient[self.cycles] = peak - self._start
+            self.retained[self.cycles] = current - self._start
+            self.cycles += 1
+        tracemalloc.reset_peak()
+        self._start = current
+
+
+def _summary(values) -> dict:
+    if not values:
+        return {"mean": 0, "max": 0}
+    return {"mean": sum(values) // len(values), "max": max(values)}
+
+
+def replay(hours:float) -> dict:
+    """
+    **Boot main.py on a new simulator and run main.main() for hours of virtual time**
+
+    :return: allocations per cycle and GC stats, as a JSON object.
+    """
+    random.seed(0)
+    noise = random.Random(1)
+
+    sim = simulator.install()
+    sim.attach_i2c_lcd(0x27)
+    sim.attach_bmp180(0x77)
+    sim.set_adc(0, lambda: 200 + noise.randint(-3, 3))
+    sim.add_access_point("SSID", "PASSWORD")
+    broker = sim.start_broker(keep=16)     # the broker keeping all messages would look like a leak
+
+    recorder = CycleRecorder(int(hours * 3600 / 10) + 1)
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        tracemalloc.start()
+        try:
+            _unload_program()
+            import main
+            import heap
+
+            update_data = main.update_data
+
+            def marked_update_data(*args) -> None:
+                recorder.mark()     # called once per cycle by main.main()
+                update_data(*args)
+
+            main.update_data = marked_update_data
+
+            async def run() -> None:
+                try:
+                    await asyncio.wait_for(main.main(), hours * 3600)
+                except asyncio.TimeoutError:
+                    pass
+
+            sim.run(run())
+
+            transient = recorder.transient[:recorder.cycles]
+            retained = recorder.retained[:recorder.cycles]
+
+            result = {"hours": hours,
+                      "cycles": recorder.cycles,
+                      "transient_bytes": _summary(transient),
+                      "retained_bytes": _summary(retained),
+                      "growth_bytes": sum(retained),
+                      "collections": heap.collections,
+                      "published": broker.published,
+                      "violations": len(sim.trace.violations)}
+
+            per_hour = max(1, int(recorder.cycles / hours))
+            result["growth_first_hour_bytes"] = sum(retained[:per_hour])
+            result["growth_last_hour_bytes"] = sum(retained[-per_hour:])
+            return result
+
+        finally:
+            tracemalloc.stop()
+            os.chdir(cwd)
+            _unload_program()
+
+
+def main(argv:list|None = None) -> dict:
+    parser = argparse.ArgumentParser(prog="python -m simulator.replay",
+                                     description="Replay the main loop and report allocations per cycle.")
+    parser.add_argument("--hours", type=float, default=24, help="virtual hours to replay.")
+    parser.add_argument("--json", metavar="PATH", help="write results to a JSON file.")
+    args = parser.parse_args(argv)
+
+    result = replay(args.hours)
+    print(json.dumps(result, indent=2))
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(result, file)
+
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**Instruction trace recorder**
+
+Modeled devices count instructions, RAM accesses and bus bytes to a Trace object. Wrap the code
+to measure with Trace.span() to get the cost of every API call.
+"""
+
+from contextlib import contextmanager
+from .clock import Clock
+
+
+class Trace:
+
+    clock:Clock = None
+
+    instructions:int = 0
+    """**Instructions executed by HD44780, exclude RAM reading and writing**"""
+
+    ram_accesses:int = 0
+    """**Data written to or read from CGRAM and DDRAM**"""
+
+    bus_bytes:int = 0
+    """**Bytes on the I2C bus, include address bytes**"""
+
+    bus_transactions:int = 0
+
+    net_bytes:int = 0
+    """**Bytes sent and received by the simulated MQTT client, include packet headers**"""
+
+    net_packets:int = 0
+
+    violations:list = None
+    """**(time_us, message) of instructions sent while HD44780 was busy**"""
+
+    log:list|None = None
+    """**(time_us, kind, value) of every instruction if logging enabled, None is disabled**"""
+
+    stream:int = 0
+    """**Hash of kinds and values of all instructions in order.** Equal streams have equal hashes, timing is excluded"""
+
+    spans:dict = None
+
+    _COUNTERS = ("instructions", "ram_accesses", "bus_bytes", "bus_transactions", "net_bytes", "net_packets")
+
+    _KINDS = {"instruction": 1, "write": 2, "read": 3}
+
+    def __init__(self, clock:Clock, logging:bool = False) -> None:
+        """
+        **Constructor of trace**
+
+        :param clock: clock to read modeled time.
+        :param logging: True is keeping every instruction in Trace.log.
+        """
+        self.clock = clock
+        self.violations = []
+        self.log = [] if logging else None
+        self.spans = {}
+
+    def instruction(self, kind:str, value:int) -> None:
+        if kind == "instruction":
+            self.instructions += 1
+        else:
+            self.ram_accesses += 1
+
+        self.stream = (self.stream * 1000003 + (self._KINDS[kind] << 8 | value)) % ((1 << 61) - 1)
+
+        if self.log is not None:
+            self.log.append((self.clock.now_us, kind, value))
+
+    def violation(self, message:str) -> None:
+        self.violations.append((self.clock.now_us, message))
+
+    def bus(self, transferred_bytes:int) -> None:
+        self.bus_bytes += transferred_bytes
+        self.bus_transactions += 1
+
+    def net(self, transferred_bytes:int) -> None:
+        self.net_bytes += transferred_bytes
+        self.net_packets += 1
+
+    def snapshot(self) -> dict:
+        """
+        :return: current counters and modeled time.
+        """
+        result = {name: getattr(self, name) for name in self._COUNTERS}
+        result["time_us"] = self.clock.now_us
+        result["slept_us"] = self.clock.slept_us
+        result["idle_us"] = self.clock.idle_us
+        return result
+
+    @contextmanager
+    def span(self, name:str):
+        """
+        **Measure the code in with-block**
+
+        Costs are accumulated to Trace.spans[name] with the count of calls.
+        :param name: name of the measured call.
+        """
+        start = self.snapshot()
+        try:
+            yield
+        finally:
+            end = self.snapshot()
+            total = self.spans.setdefault(name, {key: 0 for key in end} | {"calls": 0})
+            for key in end:
+                total[key] += end[key] - start[key]
+            total["calls"] += 1
+
+    def report(self) -> str:
+        """
+        :return: a text table of all spans.
+        """
+        lines = [f"{'call':<24}{'calls':>7}{'instr':>8}{'ram':>8}{'bus B':>8}{'time us':>11}"]
+        for name, total in self.spans.items():
+            lines.append(f"{name:<24}{total['calls']:>7}{total['instructions']:>8}{total['ram_accesses']:>8}"
+                         f"{total['bus_bytes']:>8}{total['time_us']:>11.0f}")
+        return "\n".join(lines)
@@ -0,0 +1,47 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**Simulated gc module**
+
+Installed as `gc` by simulator.install(). MicroPython's mem_free(), mem_alloc() and threshold() are
+added to CPython's gc. The heap is modeled as HEAP_SIZE bytes, and allocated bytes are what tracemalloc
+traced by tracemalloc since reset(), or 0 when tracemalloc is not tracing. CPython objects are much
+bigger than MicroPython's and freed by reference counting instead of collections, so only compare the
+changes.
+"""
+
+import tracemalloc
+from gc import *
+
+HEAP_SIZE = 36 * 1024
+"""**Heap size of ESP8266 port after boot**"""
+
+_threshold:int = -1
+_baseline:int = 0
+
+
+def reset() -> None:
+    """
+    **Model an empty heap from now on**
+    """
+    global _baseline, _threshold
+    _baseline = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+    _threshold = -1
+
+
+def mem_alloc() -> int:
+    if not tracemalloc.is_tracing(): return 0
+    return max(0, tracemalloc.get_traced_memory()[0] - _baseline)
+
+
+def mem_free() -> int:
+    return max(0, HEAP_SIZE - mem_alloc())
+
+
+def threshold(amount:int|None = None) -> int|None:
+    global _threshold
+
+    if amount is None:
+        return _threshold
+    _threshold = amount
@@ -0,0 +1,6 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**Simulated umqtt package, see umqtt.simple**
+"""
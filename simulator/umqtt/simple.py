@@ -0,0 +1,164 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**Simulated umqtt.simple module**
+
+Installed as `umqtt.simple` by simulator.install(). MQTTClient talks to a local Broker object instead
+of a socket, and every packet advances the virtual clock and is counted to the trace.
+"""
+
+from collections import deque
+from ..clock import Clock
+from ..trace import Trace
+from .. import network
+
+clock:Clock|None = None
+trace:Trace|None = None
+
+
+class MQTTException(Exception):
+    pass
+
+
+class Broker:
+
+    up:bool = True
+    """**False is the broker out of service, connecting is refused**"""
+
+    latency_ms:float = 5
+    """**Round trip time between the board and the broker**"""
+
+    bitrate:int = 1000000
+    """**Throughput of the link in bits per second**"""
+
+    messages:deque = None
+    """**(topic, message, retain, qos) published by clients, the oldest are dropped after keep**"""
+
+    published:int = 0
+    connections:int = 0
+
+    _queued:list = None
+
+    def __init__(self, latency_ms:float = 5, keep:int|None = None) -> None:
+        """
+        **Constructor of broker**
+
+        :param latency_ms: round trip time.
+        :param keep: messages kept in Broker.messages. None is keeping all.
+        """
+        self.latency_ms = latency_ms
+        self.messages = deque((), keep)
+        self._queued = []
+
+    def send(self, topic:bytes, message:bytes) -> None:
+        """
+        **Queue a message to subscribers, delivered by MQTTClient.check_msg() or wait_msg()**
+        """
+        self._queued.append((topic, message))
+
+
+broker:Broker|None = None
+
+
+def _packet_size(remaining:int) -> int:
+    """
+    Fixed header, variable length of remaining length and the remaining.
+    """
+    size = 2 + remaining
+    while remaining > 127:
+        remaining >>= 7
+        size += 1
+    return size
+
+
+class MQTTClient:
+
+    client_id:bytes = b""
+    server:str = ""
+    port:int = 1883
+
+    _connected:bool = False
+    _callback = None
+    _topics:list = None
+
+    def __init__(self, client_id, server:str, port:int = 0, user = None, password = None, keepalive:int = 0,
+                 ssl = None, ssl_params = None) -> None:
+        self.client_id = client_id if isinstance(client_id, bytes) else str(client_id).encode()
+        self.server = server
+        self.port = port or 1883
+        self._topics = []
+
+    def _transfer(self, size:int, round_trip:bool = False) -> None:
+        clock.advance_us(size * 8 * 1000000 / broker.bitrate + (broker.latency_ms * 1000 if round_trip else 0))
+        trace.net(size)
+
+    def _check(self) -> None:
+        if not self._connected:
+            raise OSError(107)  # ENOTCONN
+
+        if broker is None or not broker.up or not network.WLAN(network.STA_IF).isconnected():
+            self._connected = False
+            raise OSError(104)  # ECONNRESET
+
+    def set_callback(self, callback) -> None:
+        self._callback = callback
+
+    def connect(self, clean_session:bool = True) -> int:
+        if not network.WLAN(network.STA_IF).isconnected():
+            raise OSError(-2)   # getaddrinfo failed
+
+        clock.advance_us(broker.latency_ms * 1000 if broker is not None else 0)   # TCP handshake
+
+        if broker is None or not broker.up:
+            raise OSError(111)  # ECONNREFUSED
+
+        self._transfer(_packet_size(12 + len(self.client_id)))    # CONNECT
+        self._transfer(4, round_trip=True)                        # CONNACK
+        self._connected = True
+        broker.connections += 1
+        return 0
+
+    def disconnect(self) -> None:
+        self._check()
+        self._transfer(2)
+        self._connected = False
+
+    def ping(self) -> None:
+        self._check()
+        self._transfer(2)
+        self._transfer(2, round_trip=True)
+
+    def publish(self, topic:bytes, message:bytes, retain:bool = False, qos:int = 0) -> None:
+        self._check()
+        self._transfer(_packet_size(2 + len(topic) + len(message) + (2 if qos else 0)))
+        if qos:
+            self._transfer(4, round_trip=True)    # PUBACK
+
+        broker.messages.append((bytes(topic), bytes(message), retain, qos))
+        broker.published += 1
+
+    def subscribe(self, topic:bytes, qos:int = 0) -> None:
+        self._check()
+        self._transfer(_packet_size(5 + len(topic)))
+        self._transfer(5, round_trip=True)        # SUBACK
+        self._topics.append(bytes(topic))
+
+    def check_msg(self):
+        """
+        Deliver one queued message of a subscribed topic. Wildcards are not matched.
+        """
+        self._check()
+
+        for i, (topic, message) in enumerate(broker._queued):
+            if topic in self._topics:
+                del broker._queued[i]
+                self._transfer(_packet_size(2 + len(topic) + len(message)))
+                if self._callback is not None:
+                    self._callback(topic, message)
+                return None
+
+        return None
+
+    def wait_msg(self):
+        return self.check_msg()
@@ -0,0 +1,17 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**Simulated struct module**
+
+MicroPython's unpack() accepts a buffer longer than the format and ignores the rest, which CPython
+refuses. Installed as `struct` by simulator.install(), others are the same as CPython.
+"""
+
+from struct import Struct, calcsize, error, iter_unpack, pack, pack_into, unpack_from
+
+
+def unpack(format:str, buffer) -> tuple:
+    if len(buffer) < calcsize(format):
+        raise error(f"unpack requires a buffer of {calcsize(format)} bytes")
+    return unpack_from(format, buffer)
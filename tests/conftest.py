@@ -0,0 +1,29 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**Fixtures of tests**, run by `python -m pytest -q` in the repo's root
+
+Modules of program/ run on the simulator, so every test gets a new simulator and imports them again.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simulator
+from simulator import benchmark
+
+
+@pytest.fixture
+def sim(tmp_path, monkeypatch):
+    """
+    **A new simulator, in an empty working directory as the board's filesystem**
+    """
+    monkeypatch.chdir(tmp_path)
+    benchmark._unload_program()
+    yield simulator.install(program=simulator.PROGRAM_DIR)
+    benchmark._unload_program()
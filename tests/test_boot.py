@@ -0,0 +1,21 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+from simulator import boot
+
+
+def test_boot_defers_imports_until_needed():
+    result = boot.boot(is_mpy=True, seconds=15)
+    milestones = result["milestones_us"]
+    imported = {entry["module"]: entry["at_us"] for entry in result["imports"]}
+
+    assert result["violations"] == []
+    assert None not in milestones.values()
+    assert [milestones[name] for name in boot.MILESTONES] == sorted(milestones.values())
+    assert milestones["first_output"] < 1000 * 1000     # 1s as .mpy
+
+    # only what shows the UI is imported at top level, then each module right before it's needed
+    assert imported["lib.HD44780_Driver.lcd_1602_api"] < milestones["imported"]
+    assert milestones["first_output"] < imported["soil_moisture"] < milestones["first_reading"]
+    assert milestones["first_reading"] < imported["network_control"] < milestones["wifi_up"]
+    assert milestones["wifi_up"] < imported["umqtt.simple"] < milestones["first_upload"]
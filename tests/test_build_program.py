@@ -0,0 +1,73 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "tools"))
+
+import build_program
+
+PROGRAM_DIR = os.path.join(REPO_DIR, "program")
+
+
+def _tree(directory) -> set:
+    return {os.path.relpath(os.path.join(path, name), directory).replace(os.sep, "/")
+            for path, _, names in os.walk(directory) for name in names}
+
+
+def test_stub_build_runs_in_simulator(tmp_path):
+    from simulator import benchmark
+
+    if build_program.mpy_cross is not None:
+        pytest.skip("mpy-cross is installed, the stub is only used without it")
+
+    output = tmp_path / "program"
+    result = build_program.build(PROGRAM_DIR, str(output), jobs=2)
+
+    assert result["compiler"] == "stub" and result["errors"] == 0
+    assert (output / "main.py").read_text() == build_program.MAIN_SHIM
+    with open(os.path.join(PROGRAM_DIR, "boot.py")) as file:
+        assert (output / "boot.py").read_text() == file.read()
+    tree = _tree(output)
+    assert {"app.py", "soil_moisture.json", "lib/HD44780_Driver/lcd_1602_api.py"} <= tree
+    assert sum(file["folded"] for file in result["files"]) > 0
+
+    expected = benchmark.run_scenario("remote_config", 3)
+    built = benchmark.run_scenario("remote_config", 3, str(output))
+    assert built["errors"] == {} and built["violations"] == []
+    assert (built["instruction_stream"], built["screen"], built["published"]) == \
+           (expected["instruction_stream"], expected["screen"], expected["published"])
+
+
+def test_stub_reports_syntax_errors(tmp_path):
+    if build_program.mpy_cross is not None:
+        pytest.skip("mpy-cross is installed, the stub is only used without it")
+
+    source = tmp_path / "source"
+    (source / "lib").mkdir(parents=True)
+    (source / "main.py").write_text("import lib.util\n")
+    (source / "lib" / "util.py").write_text("def broken(:\n")
+
+    result = build_program.build(str(source), str(tmp_path / "output"), jobs=1, is_folding=False)
+
+    assert result["errors"] == 1
+    error = next(file["error"] for file in result["files"] if file["source"] == os.path.join("lib", "util.py"))
+    assert error == f"{source / 'lib' / 'util.py'}:1: invalid syntax"
+
+
+def test_mpy_cross_build(tmp_path):
+    pytest.importorskip("mpy_cross")
+
+    output = tmp_path / "program"
+    result = build_program.build(PROGRAM_DIR, str(output), jobs=2)
+
+    assert result["compiler"] == "mpy-cross" and result["errors"] == 0
+    assert (output / "main.py").read_text() == build_program.MAIN_SHIM
+    tree = _tree(output)
+    assert "app.mpy" in tree and "boot.py" in tree and "lib/HD44780_Driver/lcd_1602_api.mpy" in tree
+    assert not any(path.endswith(".py") for path in tree - {"main.py", "boot.py"})
+    assert (output / "app.mpy").read_bytes()[:1] == b"M"     # header of .mpy
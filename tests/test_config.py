@@ -0,0 +1,121 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+import json
+
+import pytest
+
+
+@pytest.fixture
+def main(sim):
+    sim.attach_i2c_lcd(0x27)
+    import main
+    return main
+
+
+def test_config_validates(sim):
+    from config import Config
+
+    config = Config({"ssid": "Home", "lcd_address": 0x3F})
+    assert (config.ssid, config.lcd_address, config.period_sec) == ("Home", 0x3F, 10)
+    assert config.to_dict() == {"ssid": "Home", "lcd_address": 0x3F}
+
+    for values in ({"sid": "Home"}, {"period_sec": "10"}, {"period_sec": True}, {"period_sec": 0}, {"ssid": ""},
+                   {"diagnostics_enabled": 1}, {"i2c_scl": 2, "i2c_sda": 2}, {"moisture_offset_min": 300}):
+        with pytest.raises(ValueError):
+            Config(values)
+
+
+def test_update_is_all_or_none(sim):
+    from config import Config, RUNTIME_KEYS, load_config, save_config
+
+    config = Config()
+    with pytest.raises(ValueError, match="lcd_batch"):
+        config.update({"period_sec": 30, "lcd_batch": 0})
+    with pytest.raises(ValueError, match="ssid can't be set at runtime"):
+        config.update({"period_sec": 30, "ssid": "Home"}, RUNTIME_KEYS)
+    assert config.to_dict() == {}
+
+    config.update({"period_sec": 30, "lcd_batch": 4}, RUNTIME_KEYS)
+    save_config(config)
+    assert load_config().to_dict() == {"period_sec": 30, "lcd_batch": 4}
+
+
+@pytest.mark.parametrize("content", ['{"period_sec": 0}', '{"ssid": "Home",', '["ssid"]'])
+def test_broken_config_boots_with_defaults(sim, capsys, content):
+    with open("config.json", "w") as file:
+        file.write(content)
+
+    sim.attach_i2c_lcd(0x27)
+    import main
+
+    assert main.config.to_dict() == {}
+    assert "config.json ignored, using defaults: " in capsys.readouterr().out
+
+
+def test_parse_cost(sim):
+    import os
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+    from device_config import measure
+
+    with open("config.json", "w") as file:    # about 130B, like a device of a fleet
+        json.dump({"ssid": "Greenhouse", "password": "0123456789", "mqtt_broker_ip": "192.168.1.10",
+                   "lcd_address": 0x3F, "period_sec": 30, "lcd_batch": 8}, file)
+
+    cost = measure("config.json", rounds=100)
+    assert cost["alloc_peak_bytes"] < 16 * 1024     # about 7KB, mostly CPython's file buffer
+    assert cost["parse_us"] < 1000                  # about 30us, bounded loosely for slow hosts
+
+
+@pytest.mark.parametrize("message", [b'{"id": 1, "set": {"period_sec": 30}}', b'{"update": "http://host/m.json"}'])
+def test_parse_command(sim, message):
+    from config import parse_command
+
+    command_id, command = parse_command(message)
+    assert command_id == (1 if b"id" in message else None) and ("set" in command or "update" in command)
+
+
+@pytest.mark.parametrize("message", [b'[]', b'{"id": 1}', b'{"set": 5}', b'{"update": 5}', b'{"set": {}, "update": 5}',
+                                     b'{"set": 5, "update": "http://host/m.json"}', b'{"update": null}',
+                                     b'{"set": {"period_sec": 30}, "update": "http://host/m.json"}'])
+def test_parse_command_rejects(sim, message):
+    from config import parse_command
+
+    with pytest.raises(ValueError):
+        parse_command(message)
+
+
+def test_failed_update_is_acknowledged(sim, main, monkeypatch):
+    import ota
+
+    async def async_download(url:str) -> dict:
+        raise KeyError("files")
+
+    monkeypatch.setattr(ota, "async_download", async_download)
+    sim.run(main.async_update("http://host/m.json", 3))
+
+    assert [json.loads(response) for response in main.command_responses] == \
+        [{"id": 3, "ok": False, "error": "Update failed: 'files'"}]
+
+
+def test_every_command_is_acknowledged(sim, main):
+    from network import WLAN, STA_IF
+    from network_control import RssiTracker
+
+    broker = sim.start_broker()
+    sim.add_access_point()
+    WLAN(STA_IF).active(True)
+    WLAN(STA_IF).connect("SSID", "PASSWORD")
+    sim.clock.advance_us(10000000)
+    main.rssi_tracker = RssiTracker(WLAN(STA_IF))     # set by main.start_network()
+    main.import_mqtt()
+    main.on_command(main.COMMAND_TOPIC, b'{"id": 1, "set": {"period_sec": 30}}')   # delivered in subscribe()
+    broker.send(main.COMMAND_TOPIC, b'{"id": 2, "set": {"lcd_batch": 0}}')
+    broker.send(main.COMMAND_TOPIC, b'{"id": 3, "set": {"backlight_timeout_sec": 30}}')
+
+    sim.run(main.async_upload_data(20.0, 1013, 0.5, 0))
+
+    responses = [json.loads(message) for topic, message, *_ in broker.messages if topic == main.RESPONSE_TOPIC]
+    assert [(response["id"], response["ok"]) for response in responses] == [(1, True), (2, False), (3, True)]
+    assert main.command_responses == [] and main.config.period_sec == 30 and main.config.lcd_batch == 8
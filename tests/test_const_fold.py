@@ -0,0 +1,68 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+import os
+import shutil
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "tools"))
+
+from const_fold import fold_modules, module_name
+
+CONSTANTS = "from micropython import const\nA = const(1)\nB = const(A << 4)\nC = 2\n"
+
+
+def test_imported_constants_are_folded():
+    results = fold_modules({"consts": CONSTANTS,
+                            "user": "from consts import *\nimport consts as c\n"
+                                    "def f(x):\n    return (A if x else 0) | B | c.B\n"})
+
+    assert results["consts"] == (None, 0)
+    source, folded = results["user"]
+    assert "return 17 if x else 16" in source and folded > 0
+
+
+def test_non_const_and_shadowed_names_are_kept():
+    results = fold_modules({"consts": CONSTANTS,
+                            "plain": "from consts import C\ndef f():\n    return C\n",
+                            "argument": "from consts import A\ndef f(A):\n    return A\n",
+                            "assigned": "from consts import A, B\ndef f():\n    A = 2\n    return A + B\n",
+                            "attribute": "import consts\ndef f(consts):\n    return consts.A\n"})
+
+    assert results["plain"] == (None, 0)
+    assert results["argument"] == (None, 0)
+    assert "return A + 16" in results["assigned"][0]
+    assert results["attribute"] == (None, 0)
+
+
+def _run(program:str) -> dict:
+    from simulator import benchmark
+
+    return benchmark.run_scenario("remote_config", 3, program)
+
+
+def test_folded_program_sends_the_same_instructions(tmp_path):
+    program = os.path.join(REPO_DIR, "program")
+    folded_dir = tmp_path / "program"
+    shutil.copytree(program, folded_dir)
+
+    sources = {}
+    for directory, _, names in os.walk(program):
+        for name in names:
+            if name.endswith(".py"):
+                with open(os.path.join(directory, name), encoding="UTF-8") as file:
+                    sources[module_name(os.path.join(directory, name), program)] = file.read()
+
+    folded = 0
+    for name, (source, count) in fold_modules(sources).items():
+        if source is not None:
+            (folded_dir / (name.replace(".", "/") + ".py")).write_text(source, encoding="UTF-8")
+            folded += count
+    assert folded > 0
+
+    expected, result = _run(program), _run(str(folded_dir))
+    assert expected["errors"] == {} and expected["violations"] == []
+    assert result["instruction_stream"] == expected["instruction_stream"]
+    assert (result["screen"], result["published"], result["errors"]) == \
+           (expected["screen"], expected["published"], expected["errors"])
@@ -0,0 +1,64 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "tools"))
+
+import freeze_program
+from build_program import MAIN_SHIM, PROGRAM_DIR
+
+
+@pytest.fixture
+def frozen(tmp_path) -> dict:
+    return freeze_program.freeze(PROGRAM_DIR, str(tmp_path / "frozen"))
+
+
+def test_manifest_covers_the_import_graph(frozen):
+    modules = freeze_program.read_manifest(frozen["manifest"])
+    graph = freeze_program.import_graph(PROGRAM_DIR, [os.path.join(PROGRAM_DIR, "main.py"),
+                                                      os.path.join(PROGRAM_DIR, "boot.py")])
+
+    assert {"main", "boot", "lcd_control", "lib.HD44780_Driver.lcd_1602_api", "lib.BMP180_Driver.BMP180_driver",
+            "ota"} <= set(graph)
+    for name in graph:
+        if name == "boot": continue     # runs from the filesystem as is
+        assert ("app" if name == "main" else name) in modules, name
+    assert all(os.path.isfile(path) for path in modules.values())
+
+    with open(os.path.join(frozen["fs_dir"], "main.py")) as file:
+        assert file.read() == MAIN_SHIM
+    assert "boot.py" in frozen["fs"] and "soil_moisture.json" in frozen["fs"]
+    assert freeze_program.check(frozen["manifest"], PROGRAM_DIR, frozen["fs_dir"]) == ([], [])
+
+
+def test_missing_and_unused_modules_are_reported(frozen):
+    with open(os.path.join(os.path.dirname(frozen["manifest"]), "modules", "unused.py"), "w") as file:
+        file.write("X = 1\n")
+    with open(frozen["manifest"]) as file:
+        lines = file.readlines()
+    with open(frozen["manifest"], "w") as file:
+        file.writelines(line for line in lines if '"lcd_layout.py"' not in line)
+        file.write('module("missing.py", base_path="modules")\n')
+        file.write('module("unused.py", base_path="modules")\n')
+
+    errors, warnings = freeze_program.check(frozen["manifest"], PROGRAM_DIR, frozen["fs_dir"])
+
+    assert "lcd_layout is imported but neither frozen nor on the filesystem" in errors
+    assert any(message.startswith("missing is frozen from ") for message in errors) and len(errors) == 2
+    assert warnings == ["missing is frozen but never imported, it only takes flash",
+                        "unused is frozen but never imported, it only takes flash"]
+
+
+def test_file_on_filesystem_shadows_frozen(frozen):
+    with open(os.path.join(frozen["fs_dir"], "lcd_layout.py"), "w") as file:
+        file.write("\n")
+
+    errors, warnings = freeze_program.check(frozen["manifest"], PROGRAM_DIR, frozen["fs_dir"])
+
+    assert errors == []
+    assert warnings == ["lcd_layout is frozen and on the filesystem, the file shadows the frozen one"]
@@ -0,0 +1,72 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+import json
+
+
+def _span(sim, stage:int, us:int) -> None:
+    import instrumentation as instrument
+
+    start = instrument.begin()
+    sim.clock.advance_us(us)
+    instrument.end(stage, start)
+
+
+def test_disabled_measures_nothing(sim):
+    import instrumentation as instrument
+
+    sim.clock.advance_us(1000)
+    assert instrument.begin() == 0
+    _span(sim, instrument.STAGE_BMP180, 500)
+    instrument.count(instrument.COUNTER_UPLOADS)
+
+    assert instrument.span_stats(instrument.STAGE_BMP180) == (0, 0, 0)
+    assert instrument.counter(instrument.COUNTER_UPLOADS) == 0
+
+
+def test_spans_and_counters(sim):
+    import instrumentation as instrument
+
+    instrument.enable(True)
+    sim.clock.advance_us(1000)
+    for us in (100, 300, 200):
+        _span(sim, instrument.STAGE_BMP180, us)
+    _span(sim, instrument.STAGE_GC, 50)
+    instrument.count(instrument.COUNTER_UPLOADS)
+    instrument.count(instrument.COUNTER_LCD_COMMANDS, 12)
+
+    assert instrument.span_stats(instrument.STAGE_BMP180) == (3, 200, 300)
+    assert instrument.span_stats(instrument.STAGE_GC) == (1, 50, 50)
+    assert instrument.span_stats(instrument.STAGE_DISPLAY) == (0, 0, 0)
+
+    instrument.sample_heap(12000)
+    payload = json.loads(instrument.payload(90500))
+    assert payload["up"] == 90 and payload["span"] == {"bmp180": [3, 200, 300], "gc": [1, 50, 50]}
+    assert payload["cnt"] == {"uploads": 1, "upload_errors": 0, "wifi_lost": 0, "lcd_commands": 12}
+    assert payload["heap"]["largest"] == 12000 and payload["heap"]["min"] == payload["heap"]["free"] > 0
+
+    instrument.reset_window()     # counters and heap are kept
+    _span(sim, instrument.STAGE_BMP180, 400)
+    payload = json.loads(instrument.payload(100000))
+    assert payload["span"] == {"bmp180": [1, 400, 400]} and payload["cnt"]["lcd_commands"] == 12
+
+
+def test_total_is_halved_keeping_the_mean(sim):
+    import instrumentation as instrument
+
+    instrument.enable(True)
+    sim.clock.advance_us(1000)
+    span_us = 100000000     # 100s, the total limit is about 537s
+    for _ in range(5):
+        _span(sim, instrument.STAGE_CYCLE, span_us)
+    assert instrument.span_stats(instrument.STAGE_CYCLE) == (5, span_us, span_us)
+
+    _span(sim, instrument.STAGE_CYCLE, 2 * span_us)     # 5 spans halved to 3 of the same mean, then added
+    assert instrument.span_stats(instrument.STAGE_CYCLE) == (4, 5 * span_us // 4, 2 * span_us)
+    assert instrument._span_total_us[instrument.STAGE_CYCLE] <= 1 << 29
+
+    for _ in range(20):
+        _span(sim, instrument.STAGE_CYCLE, span_us)
+    count, mean, _ = instrument.span_stats(instrument.STAGE_CYCLE)
+    assert count < 6 and span_us <= mean < 5 * span_us // 4
+    assert instrument._span_total_us[instrument.STAGE_CYCLE] <= 1 << 29
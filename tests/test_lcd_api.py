@@ -0,0 +1,103 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+import random
+
+import pytest
+
+
+def _api(address:int):
+    from machine import I2C, Pin
+    from lib.HD44780_Driver.lcd_1602_api import lcd_api
+    from lib.HD44780_Driver.pcf8574_I2C_HAL import pcf8574_I2C_HAL
+
+    return lcd_api(pcf8574_I2C_HAL(I2C(scl=Pin(14), sda=Pin(2)), address))
+
+
+def _random_operation(rand:random.Random):
+    """
+    :return: function(api) of a random public operation moving the address counter.
+    """
+    text = "".join(chr(rand.randrange(0x20, 0x7E)) for _ in range(rand.randrange(1, 20))).replace("\\", "/")
+    rows = bytes(rand.randrange(32) for _ in range(8))
+    row, col, index, flag = rand.randrange(2), rand.randrange(40), rand.randrange(8), rand.random() < 0.5
+    increment, scroll = rand.random() < 0.8, rand.random() < 0.1
+    cursor, clear = rand.random() < 0.3, rand.random() < 0.2
+
+    return rand.choice((
+        lambda api: api.print(text, auto_return=flag),
+        lambda api: api.print_bytes(text.encode(), 1),
+        lambda api: api.print_custom_char(index, auto_return=flag),
+        lambda api: api.cursor_move_to(row, col),
+        lambda api: api.cursor_move_left(),
+        lambda api: api.cursor_move_right(auto_return=flag),
+        lambda api: api.cursor_move_up(),
+        lambda api: api.cursor_move_down(),
+        lambda api: api.content_move_left(),
+        lambda api: api.content_move_right(),
+        lambda api: api.cursor_to_home(),
+        lambda api: api.cursor_return(),
+        lambda api: api.clear() if clear else None,
+        lambda api: api.write_custom_char_rows(rows, index),
+        lambda api: api.entry_mode_setting(increment, scroll),
+        lambda api: api.enable_cursor_or_disable(cursor),
+        lambda api: api.ram_data(),
+    ))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_skipped_address_sets_match_setting_every_time(sim, seed):
+    """
+    The same random operations on an lcd_api skipping address sets and on one forgetting the address before
+    every operation, so it always sets it, leave both controllers in the same state.
+    """
+    tracked_model, reference_model = sim.attach_i2c_lcd(0x27), sim.attach_i2c_lcd(0x26)
+    tracked, reference = _api(0x27), _api(0x26)
+    rand = random.Random(seed)
+    sets = {"tracked": 0, "reference": 0}
+
+    for step in range(200):
+        operation = _random_operation(rand)
+        instructions = sim.trace.instructions
+        result = operation(tracked)
+        sets["tracked"] += sim.trace.instructions - instructions
+
+        reference.forget_address()
+        instructions = sim.trace.instructions
+        assert operation(reference) == result     # data read by ram_data()
+        sets["reference"] += sim.trace.instructions - instructions
+
+        context = f"seed {seed} step {step}"
+        assert tracked_model.ddram == reference_model.ddram and tracked_model.cgram == reference_model.cgram, context
+        assert (tracked_model.address, tracked_model.in_cgram, tracked_model.display_shift) == \
+               (reference_model.address, reference_model.in_cgram, reference_model.display_shift), context
+        if tracked._address >= 0:   # the modeled address counter is the controller's
+            assert (tracked._address, tracked._address_in_cgram) == \
+                   (tracked_model.address, tracked_model.in_cgram), context
+
+    assert sets["tracked"] < sets["reference"]
+    assert sim.trace.violations == []
+
+
+def test_reading_address_counter_and_ram(sim):
+    from time import sleep_ms
+
+    model, api = sim.attach_i2c_lcd(0x27), _api(0x27)
+    api.print("Hello")
+    api.cursor_move_to(1, 3)
+    api.print_custom_char(2)
+
+    assert not api.is_busy()
+    assert api.ram_counter() == model.address == 0x44
+    api.write_custom_char_rows(bytes(range(8)), 1)
+    assert api.ram_counter() == model.address and model.in_cgram
+
+    api.cursor_move_to(0, 0)
+    assert [api.ram_data() for _ in range(5)] == list(b"Hello")
+    api.print("!")      # the address counter follows reads too
+    assert model.line(0).startswith("Hello!")
+
+    api.driver.board.write(RS_level=0, DBs_level=0x01, delay_cycles=0)     # clear without waiting 1.52ms
+    assert api.is_busy()
+    sleep_ms(2)
+    assert not api.is_busy()
@@ -0,0 +1,149 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+import asyncio
+import random
+
+import pytest
+
+
+def _api(address:int):
+    from machine import I2C, Pin
+    from lib.HD44780_Driver.lcd_1602_api import lcd_api
+    from lib.HD44780_Driver.pcf8574_I2C_HAL import pcf8574_I2C_HAL
+
+    return lcd_api(pcf8574_I2C_HAL(I2C(scl=Pin(14), sda=Pin(2)), address))
+
+
+def _random_operation(rand:random.Random, buffer:bytearray):
+    """
+    :return: function(lcd) of a random queued operation, lcd is an lcd_async or an lcd_api.
+    """
+    text = "".join(chr(rand.randrange(0x20, 0x7E)) for _ in range(rand.randrange(1, 12))).replace("\\", "/")
+    content = bytes(rand.randrange(0x20, 0x7E) for _ in range(len(buffer)))
+    start = rand.randrange(len(buffer))
+    end = rand.randrange(start, len(buffer) + 1)
+    rows = bytes(rand.randrange(32) for _ in range(16))
+    row, col, index, offset, flag = rand.randrange(2), rand.randrange(40), rand.randrange(8), rand.randrange(9), \
+        rand.random() < 0.5
+    clear = flag and rand.random() < 0.2
+
+    def print_bytes(lcd) -> None:
+        buffer[:] = content
+        lcd.print_bytes(buffer, start, end)
+        buffer[:] = bytes(len(buffer))   # reused at once, like Field's buffer
+
+    return rand.choice((
+        lambda lcd: lcd.cursor_move_to(row, col),
+        lambda lcd: lcd.cursor_move_to(row, col),
+        lambda lcd: lcd.print(text, auto_return=flag),
+        print_bytes,
+        lambda lcd: lcd.print_custom_char(index, auto_return=flag),
+        lambda lcd: lcd.write_custom_char_rows(rows, index & 3, offset),
+        lambda lcd: lcd.clear() if clear else None,
+        lambda lcd: lcd.cursor_to_home(),
+        lambda lcd: lcd.content_move_left(),
+        lambda lcd: lcd.content_move_right(),
+        lambda lcd: lcd.turn_on_backlight_or_off(flag),
+    ))
+
+
+def _state(sim, model, address:int) -> tuple:
+    import machine
+
+    return bytes(model.ddram), bytes(model.cgram), model.display_shift, machine.devices[address].backlight
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_coalesced_queue_matches_direct_calls(sim, seed):
+    from lib.HD44780_Driver.lcd_1602_async import lcd_async
+
+    queued_model, direct_model = sim.attach_i2c_lcd(0x27), sim.attach_i2c_lcd(0x26)
+    lcd, direct = lcd_async(_api(0x27), size=8, data_size=16), _api(0x26)
+    rand = random.Random(seed)
+    buffer = bytearray(12)
+    instructions = {"queued": 0, "direct": 0}
+
+    for step in range(300):
+        operation = _random_operation(rand, buffer)
+        count = sim.trace.instructions
+        operation(lcd)
+        if rand.random() < 0.1:
+            lcd.flush(rand.randrange(-1, 4))
+        instructions["queued"] += sim.trace.instructions - count
+
+        count = sim.trace.instructions
+        operation(direct)
+        instructions["direct"] += sim.trace.instructions - count
+
+    count = sim.trace.instructions
+    lcd.flush()
+    instructions["queued"] += sim.trace.instructions - count
+
+    assert lcd.pending() == 0 and lcd._data_head == 0
+    assert _state(sim, queued_model, 0x27) == _state(sim, direct_model, 0x26)
+    assert instructions["queued"] < instructions["direct"]
+    assert sim.trace.violations == []
+
+
+def test_redundant_commands_are_coalesced(sim):
+    from lib.HD44780_Driver.lcd_1602_async import lcd_async
+
+    model = sim.attach_i2c_lcd(0x27)
+    lcd = lcd_async(_api(0x27))
+    first, second = bytes([1] * 8), bytes([2] * 8)
+
+    lcd.cursor_move_to(0, 1)
+    lcd.cursor_move_to(1, 2)
+    lcd.write_custom_char_rows(first, 3)
+    lcd.print("A")
+    lcd.write_custom_char_rows(second, 3)     # replaces the queued upload, before "A" is printed
+    lcd.write_custom_char_rows(first, 4)
+    lcd.cursor_move_to(0, 0)
+    lcd.print_custom_char(3)
+    assert lcd.pending() == 6
+
+    lcd.flush()
+    assert model.line(1)[2] == "A" and model.ddram[0] == 3
+    assert model.custom_char(3) == ["...#."] * 8 and model.custom_char(4) == ["....#"] * 8
+
+
+def test_full_queue_runs_instead_of_dropping(sim):
+    from lib.HD44780_Driver.lcd_1602_async import lcd_async
+
+    model = sim.attach_i2c_lcd(0x27)
+    lcd = lcd_async(_api(0x27), size=4, data_size=8)
+
+    for char in "ABCDEFGHIJ":
+        lcd.print(char)
+        assert 1 <= lcd.pending() <= 4
+    assert model.line(0).startswith("ABCDEFGH")     # two full queues were run at once
+
+    lcd.print_bytes(b"0123")
+    lcd.print_bytes(b"45678")   # no room in the data area, so the queue is run and the area reset
+    assert model.line(0) == "ABCDEFGHIJ0123  " and lcd.pending() == 1 and lcd._data_head == 5
+    lcd.print_bytes(b"too long!")   # more than the data area, printed at once after what's queued
+    assert lcd.pending() == 0 and lcd._data_head == 0
+    assert bytes(model.ddram[0:28]) == b"ABCDEFGHIJ012345678too long!"
+
+
+def test_writer_task_runs_batches(sim):
+    from lib.HD44780_Driver.lcd_1602_async import lcd_async
+
+    model = sim.attach_i2c_lcd(0x27)
+    lcd = lcd_async(_api(0x27), batch=8)
+    batches = []
+    lcd.on_batch = lambda start, commands: batches.append(commands)
+
+    async def async_main() -> None:
+        writer = asyncio.create_task(lcd.async_run())
+        for char in "0123456789ABCDEFGHIJ":
+            lcd.print(char)
+        assert lcd.pending() == 20      # the writer runs only when this task yields
+        await asyncio.sleep(0.01)
+        writer.cancel()
+
+    sim.run(async_main())
+
+    assert batches == [8, 8, 4]
+    assert model.line(0) == "0123456789ABCDEF" and lcd.pending() == 0
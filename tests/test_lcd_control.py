@@ -0,0 +1,261 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def lcd(sim):
+    """
+    :return: (HD44780 model, lcd_api)
+    """
+    from machine import I2C, Pin
+    from lib.HD44780_Driver.lcd_1602_api import lcd_api
+    from lib.HD44780_Driver.pcf8574_I2C_HAL import pcf8574_I2C_HAL
+
+    model = sim.attach_i2c_lcd(0x27)
+    return model, lcd_api(pcf8574_I2C_HAL(I2C(scl=Pin(14), sda=Pin(2)), 0x27))
+
+
+def _glyph(icon:bytes) -> list:
+    return ["".join("#" if (row >> (7 - x)) & 1 else "." for x in range(5)) for row in icon[0:8]]
+
+
+def test_frame_tables(lcd):
+    import lcd_control
+
+    model, api = lcd
+    lcd_control.init_ui(api)
+    icons = (lcd_control.WIFI_ICON, lcd_control.BLANK_ROWS, lcd_control.TEMPERATURE_ICON,
+             lcd_control.CELSIUS_ICON, lcd_control.PRESSURE_ICON, lcd_control.PA_ICON, lcd_control.MOISTURE_ICON)
+    for index, icon in enumerate(icons):
+        assert model.custom_char(index) == _glyph(icon)
+
+    icon = [row >> 3 for row in lcd_control.UPLOADING_ICON[0:8]]
+    frames = lcd_control.UPLOADING_FRAMES
+    assert len(frames) == 7 * 8
+    for frame in range(7):  # first 2 rows are kept, others scroll up one row per frame
+        expected = icon[0:2] + [icon[frame + row - 1] if frame + row - 1 < 8 else 0 for row in range(2, 8)]
+        assert list(frames[frame << 3:(frame << 3) + 8]) == expected
+
+
+def test_animation_plays_frames_and_restores(sim, lcd):
+    import lcd_control
+
+    model, api = lcd
+    shown = []
+    write = api.write_custom_char_rows
+
+    def record(rows, index, offset = 0):
+        write(rows, index, offset)
+        shown.append((index, model.custom_char(index)))
+
+    api.write_custom_char_rows = record
+
+    async def async_main():
+        task = asyncio.create_task(lcd_control.async_animation_updating(api))
+        await asyncio.sleep(3.9)    # 2 fps
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    sim.run(async_main())
+
+    frames = lcd_control.UPLOADING_FRAMES
+    assert [glyph for _, glyph in shown[:8]] == [_glyph(bytes(row << 3 for row in frames[i << 3:(i << 3) + 8]))
+                                                 for i in (0, 1, 2, 3, 4, 5, 6, 0)]
+    assert all(index == 1 for index, _ in shown)
+    assert model.custom_char(1) == _glyph(lcd_control.BLANK_ROWS)
+
+
+def _api(address:int):
+    from machine import I2C, Pin
+    from lib.HD44780_Driver.lcd_1602_api import lcd_api
+    from lib.HD44780_Driver.pcf8574_I2C_HAL import pcf8574_I2C_HAL
+
+    return lcd_api(pcf8574_I2C_HAL(I2C(scl=Pin(14), sda=Pin(2)), address))
+
+
+@pytest.mark.parametrize("formatter, value, text", [
+    (("fixed", 1, -999, 9999), 23.4, "23.4"), (("fixed", 1, -999, 9999), -5.2, "-5.2"),
+    (("fixed", 1, -999, 9999), 123.4, "123 "), (("fixed", 1, -999, 9999), 99999, "9999"),
+    (("fixed", 1, -999, 9999), -1234, "-999"), (("fixed", 0, -999, 9999), 1013.4, "1013"),
+    (("percent", 1), 0.512, "51.2"), (("percent", 1), 1.5, "100 "), (("fixed", 0, -99, 0), None, "----"),
+])
+def test_field_formats(lcd, formatter, value, text):
+    import lcd_layout
+
+    model, api = lcd
+    name, *args = formatter
+    field = lcd_layout.Field(0, 0, 4, getattr(lcd_layout, name)(*args))
+    field.update(api, value)
+    assert model.line(0)[0:4] == text
+
+
+def test_field_writes_only_changed_cells(sim, lcd):
+    from lcd_layout import Field, fixed, ALIGN_RIGHT
+
+    model, api = lcd
+    field = Field(0, 2, 4, fixed(1, -999, 9999))
+    right = Field(1, 0, 4, fixed(0, -999, 9999), align=ALIGN_RIGHT)
+    field.update(api, 23.4)
+    right.update(api, 5)
+    assert model.render() == "  23.4          \n   5            "
+
+    writes = sim.trace.ram_accesses
+    assert field.update(api, 23.5) and sim.trace.ram_accesses - writes == 1
+    assert not field.update(api, 23.5) and sim.trace.ram_accesses - writes == 1
+    assert field.update(api, 3.5) and model.line(0)[2:6] == "3.5 "
+
+
+def test_partial_updates_match_full_redraw(sim):
+    import random
+    from lcd_layout import Field, Layout, fixed, percent
+
+    def layout() -> Layout:
+        return Layout((Field(0, 1, 4, fixed(1, -999, 9999), icon="T", unit="C"),
+                       Field(0, 8, 4, fixed(0, -999, 9999), icon="P", unit="Pa"),
+                       Field(1, 1, 4, percent(1), icon="M", unit="%")), statics=((1, 15, "*"),))
+
+    partial_model, full_model = sim.attach_i2c_lcd(0x27), sim.attach_i2c_lcd(0x26)
+    partial_api, full_api = _api(0x27), _api(0x26)
+    partial, full = layout(), layout()
+    partial.render_static(partial_api)
+
+    rand = random.Random(32)
+    fresh = (lambda: rand.randint(-12000, 120000) / 10, lambda: rand.randint(-1500, 12000), rand.random)
+    steps = (lambda: rand.randint(-3, 3) / 10, lambda: rand.randint(-2, 2), lambda: rand.randint(-10, 10) / 1000)
+    values = [make() for make in fresh]
+    partial_writes = full_writes = 0
+
+    for _ in range(300):    # mostly small steps like sensors, sometimes a jump or no value
+        index = rand.randrange(3)
+        roll = rand.random()
+        if roll < 0.05:
+            values[index] = None
+        elif roll < 0.15 or values[index] is None:
+            values[index] = fresh[index]()
+        else:
+            values[index] += steps[index]()
+
+        before = sim.trace.ram_accesses
+        for field, value in zip(partial.fields, values):
+            field.update(partial_api, value)
+        partial_writes += sim.trace.ram_accesses - before
+
+        before = sim.trace.ram_accesses
+        full.render_static(full_api)
+        for field, value in zip(full.fields, values):
+            field.update(full_api, value)
+        full_writes += sim.trace.ram_accesses - before
+
+        assert partial_model.render() == full_model.render()
+
+    assert partial_writes * 5 < full_writes
+
+
+def test_pages_switch_by_shift(sim, lcd):
+    import lcd_control
+
+    model, api = lcd
+    lcd_control.init_ui(api)
+    lcd_control.update_temp(api, 23.4)
+    lcd_control.update_rssi(api, -61)
+    lcd_control.update_uptime(api, 5400000)
+    main_page = model.render()
+    assert main_page.splitlines()[0].startswith("②23.4③")
+
+    instructions, writes = sim.trace.instructions, sim.trace.ram_accesses
+    lcd_control.show_page(api, 1)
+    assert model.render() == "RSSI -61 dBm    \nUp 1.5   h      "
+    assert sim.trace.instructions - instructions == lcd_control.PAGE_COLUMNS and sim.trace.ram_accesses == writes
+
+    lcd_control.update_temp(api, 23.5)  # written off-screen
+    lcd_control.update_uptime(api, 7200000)
+    assert model.render() == "RSSI -61 dBm    \nUp 2.0   h      "
+
+    instructions = sim.trace.instructions
+    lcd_control.show_page(api, 0)
+    assert sim.trace.instructions - instructions == 1
+    assert model.render() == main_page.replace("23.4", "23.5")
+
+
+def test_page_rotation(sim, lcd):
+    import lcd_control
+
+    model, api = lcd
+    lcd_control.init_ui(api)
+    shown = []
+
+    async def async_main():
+        task = asyncio.create_task(lcd_control.async_page_rotation(api, 5))
+        await asyncio.sleep(0.1)
+        for _ in range(4):
+            await asyncio.sleep(5)
+            shown.append(model.line(0)[0:4])
+        task.cancel()
+
+    sim.run(async_main())
+    assert [text == "RSSI" for text in shown] == [True, False, True, False]
+
+
+def test_backlight_idle_and_wake(sim, lcd):
+    import machine
+    import lcd_control
+
+    model, api = lcd
+    backpack = machine.devices[0x27]
+    lcd_control.init_ui(api)
+    states = {}
+
+    async def async_main():
+        task = asyncio.create_task(lcd_control.async_backlight_idle(api, 5))
+        lcd_control.wake()
+        await asyncio.sleep(4.5)
+        states["before timeout"] = backpack.backlight
+        await asyncio.sleep(1)
+        states["idle"] = backpack.backlight
+
+        transactions = sim.trace.bus_transactions
+        await asyncio.sleep(10)
+        states["idle bus"] = sim.trace.bus_transactions - transactions
+
+        lcd_control.update_temp(api, 23.4)  # a changed value is an activity
+        await asyncio.sleep(0.3)
+        states["changed"] = backpack.backlight
+
+        lcd_control.set_backlight_timeout(20)
+        await asyncio.sleep(10)
+        lcd_control.update_temp(api, 23.4)  # unchanged is not
+        await asyncio.sleep(10.3)
+        states["longer timeout"] = backpack.backlight
+
+        button = machine.Pin(0, machine.Pin.IN, machine.Pin.PULL_UP)   # like main.py
+        button.irq(handler=lambda pin: lcd_control.wake(), trigger=machine.Pin.IRQ_FALLING)
+        button.drive(0)
+        await asyncio.sleep(0.3)
+        states["button"] = backpack.backlight
+        task.cancel()
+
+    sim.run(async_main())
+    assert states == {"before timeout": True, "idle": False, "idle bus": 0, "changed": True,
+                      "longer timeout": False, "button": True}
+
+
+def test_main_screen_shows_sensor_pressure(sim, lcd):
+    from machine import I2C, Pin
+    from lib.BMP180_Driver.BMP180_driver import BMP180Driver
+    import lcd_control
+
+    model, api = lcd
+    sim.attach_bmp180()
+    bmp180 = BMP180Driver(I2C(scl=Pin(14), sda=Pin(2)), 0x77)
+    lcd_control.init_ui(api)
+
+    lcd_control.update_temp(api, bmp180.get_temperature())
+    lcd_control.update_pressure(api, bmp180.get_pressure(0))
+    assert model.line(0)[1:5] == "15.0" and model.line(0)[7:13] == "69964 "    # datasheet example
+    lcd_control.update_pressure(api, 101325)
+    assert model.line(0)[7:13] == "101325"
+    assert [model.ddram[col] for col in (6, 13, 14, 15)] == [4, 5, 1, 0]     # icons are kept
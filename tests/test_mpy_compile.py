@@ -0,0 +1,173 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+import ast
+import os
+import shutil
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(REPO_DIR, "library", "HD44780_Driver", "mpy_compile.py")
+
+# mpy-cross of the test, writes marshaled bytecode, or fails if the source has "FAIL"
+MPY_CROSS = '''
+import subprocess, sys
+def run(*args, **kwargs):
+    output, source = args[args.index("-o") + 1], args[-1]
+    return subprocess.Popen([sys.executable, "-c", "import marshal, sys; source = open(sys.argv[2]).read(); "
+                             "sys.exit(3) if 'FAIL' in source else "
+                             "open(sys.argv[1], 'wb').write(marshal.dumps(compile(source, 'x', 'exec')))",
+                             output, source], **kwargs)
+'''
+
+
+@pytest.fixture
+def project(tmp_path):
+    """
+    :return: function(files) writing a program tree and running mpy_compile.py of its main.py.
+    """
+    tools = tmp_path / "tools"
+    tools.mkdir()
+    (tools / "mpy_cross.py").write_text(MPY_CROSS)
+
+    def build(files:dict, *options) -> subprocess.CompletedProcess:
+        for name, content in files.items():
+            path = tmp_path / "program" / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(textwrap.dedent(content))
+
+        return subprocess.run([sys.executable, SCRIPT, "-s", "program/main.py", "--root", "program",
+                               "-o", "build/main.py", *options], cwd=tmp_path, capture_output=True, text=True,
+                              env={**os.environ, "PYTHONPATH": str(tools)})
+
+    return build
+
+
+def test_build_is_cached(project, tmp_path):
+    files = {"main.py": "from util import add\nprint(add(1, 2))\n", "util.py": "def add(a, b):\n    return a + b\n"}
+
+    first = project(files)
+    assert first.returncode == 0, first.stderr
+    merged = (tmp_path / "build" / "main.py").read_text()
+    assert "def add" in merged and "import util" not in merged
+    assert (tmp_path / "build" / "main.mpy").is_file()
+
+    assert "is up to date" in project({}).stdout
+    assert "is up to date" not in project({"util.py": "def add(a, b):\n    return b + a\n"}).stdout
+
+
+def test_failed_compile_keeps_no_manifest(project, tmp_path):
+    result = project({"main.py": "print('FAIL')\n"})
+
+    assert result.returncode != 0 and "mpy-cross exited with 3" in result.stderr
+    assert not (tmp_path / "build" / "main.manifest.json").exists()
+    assert project({}).returncode != 0     # not cached as up to date
+
+
+def test_import_cycle(project):
+    result = project({"main.py": "from a import x\n", "a.py": "from b import y\nx = 1\n",
+                      "b.py": "from a import x\ny = 2\n"})
+
+    assert result.returncode != 0
+    assert "import cycle: a -> b -> a" in result.stderr
+
+
+def test_name_collision(project):
+    result = project({"main.py": "from a import f\nfrom b import g\n",
+                      "a.py": "def helper():\n    pass\nf = helper\n",
+                      "b.py": "def helper():\n    pass\ng = helper\n"})
+
+    assert result.returncode != 0
+    assert "helper: defined in a (in a), defined in b (in b)" in result.stderr
+
+
+def test_same_import_and_const_dont_collide(project):
+    result = project({"main.py": "from a import f\nfrom b import g\n",
+                      "a.py": "from micropython import const\nfrom time import sleep\nN = const(4)\nf = sleep\n",
+                      "b.py": "from micropython import const\nfrom time import sleep\nN = const(4)\ng = sleep\n"})
+
+    assert result.returncode == 0, result.stderr
+
+
+def test_module_import_is_kept_as_file(project, tmp_path):
+    result = project({"main.py": "import heap\nfrom util import add\n", "heap.py": "x = 1\n",
+                      "util.py": "def add(a, b):\n    return a + b\n"})
+
+    assert result.returncode == 0, result.stderr
+    assert "left as files and imported from root: heap" in result.stdout
+    assert "import heap" in (tmp_path / "build" / "main.py").read_text()
+
+
+def test_relative_and_package_imports(project, tmp_path):
+    result = project({"main.py": "from lib.pkg.api import show\nimport machine, lib.pkg.util\nshow()\n",
+                      "lib/__init__.py": "", "lib/pkg/__init__.py": "",
+                      "lib/pkg/api.py": "from .const import WIDTH\nfrom . import util\n"
+                                        "def show():\n    print(WIDTH, util.name())\n",
+                      "lib/pkg/const.py": "WIDTH = 16\n",
+                      "lib/pkg/util.py": "def name():\n    return 'util'\n"})
+
+    assert result.returncode == 0, result.stderr
+    merged = (tmp_path / "build" / "main.py").read_text()
+    assert "WIDTH = 16" in merged and "def show" in merged and "from .const" not in merged
+    assert "import machine\n" in merged     # external module of the same statement is kept
+    assert "import lib.pkg.util\n" in merged     # binds lib, not lib.pkg.util
+    assert "import lib.pkg.util as util\n" in merged
+    assert "left as files and imported from root: lib.pkg.util" in result.stdout
+
+
+def test_missing_relative_module(project):
+    result = project({"main.py": "from lib.api import show\n", "lib/__init__.py": "",
+                      "lib/api.py": "from .missing import WIDTH\n"})
+
+    assert result.returncode != 0
+    assert "lib/api.py:1: cannot find module .missing" in result.stderr
+
+
+def test_module_imported_by_kept_module_is_kept(project, tmp_path):
+    result = project({"main.py": "import heap\nfrom util import add\nheap.push(add(1, 2))\n",
+                      "heap.py": "from util import add\ndef push(x):\n    return add(x, 0)\n",
+                      "util.py": "def add(a, b):\n    return a + b\n"})
+
+    assert result.returncode == 0, result.stderr
+    merged = (tmp_path / "build" / "main.py").read_text()
+    assert "def add" not in merged and "from util import add\n" in merged    # one copy, the file of util
+    assert "left as files and imported from root: heap, util" in result.stdout
+
+
+def _run_program(program:str) -> dict:
+    """
+    :return: what the board shows and publishes in a benchmark scenario.
+    """
+    from simulator import benchmark
+    from simulator.umqtt import simple
+
+    result = benchmark.run_scenario("remote_config", 3, program)
+    return {"instruction_stream": result["instruction_stream"], "screen": result["screen"],
+            "errors": result["errors"], "violations": result["violations"],
+            "messages": [(topic, message) for topic, message, *_ in simple.broker.messages]}
+
+
+def test_shaken_program_runs_the_same(project, tmp_path):
+    shutil.copytree(os.path.join(REPO_DIR, "program"), tmp_path / "program")
+    uses = sorted(str(path) for path in (tmp_path / "program").rglob("*.py"))
+
+    result = project({}, "--shake", "--uses", *uses)
+    assert result.returncode == 0, result.stderr
+    assert "lcd_1602_async.py: lcd_async.pending" in result.stdout
+
+    shaken = (tmp_path / "build" / "main.py").read_text()
+    tree = ast.parse(shaken)
+    methods = {member.name for node in tree.body if isinstance(node, ast.ClassDef) and node.name == "lcd_async"
+               for member in node.body if isinstance(member, ast.FunctionDef)}
+    assert "pending" not in methods and "flush" in methods
+
+    shutil.copytree(tmp_path / "program", tmp_path / "shaken")
+    (tmp_path / "shaken" / "main.py").write_text(shaken)
+
+    expected = _run_program(str(tmp_path / "program"))
+    assert expected["messages"] and expected["errors"] == {}
+    assert _run_program(str(tmp_path / "shaken")) == expected
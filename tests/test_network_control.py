@@ -0,0 +1,198 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+import asyncio
+import json
+import os
+import random
+
+
+def _manager(**kwargs):
+    from network import WLAN, STA_IF
+    from network_control import ConnectionManager
+
+    manager = ConnectionManager(WLAN(STA_IF), "SSID", "PASSWORD", **kwargs)
+    states = []
+    manager.subscribe(lambda state: states.append((_now(), state)))
+    return manager, states
+
+
+def _now() -> float:
+    import network
+    return network.clock.now_us / 1000000
+
+
+def _run_until_connected(sim, manager, limit_sec:float, events=(), after_sec:float = 0) -> float|None:
+    """
+    :param events: (seconds, function) called at that time.
+    :param after_sec: seconds to keep running after connected.
+    :return: seconds when connected, or None.
+    """
+    async def async_main():
+        tasks = [asyncio.create_task(manager.async_run())]
+        for at_sec, event in events:
+            async def async_event(at_sec=at_sec, event=event):
+                await asyncio.sleep(at_sec)
+                event()
+            tasks.append(asyncio.create_task(async_event()))
+
+        while not manager.is_connected():
+            if _now() > limit_sec:
+                return None
+            await asyncio.sleep(0.1)
+
+        connected = _now()
+        await asyncio.sleep(after_sec)
+        return connected
+
+    return sim.run(async_main())
+
+
+def test_connect(sim):
+    sim.add_access_point()
+    manager, _ = _manager()
+
+    assert _run_until_connected(sim, manager, 30, after_sec=6) is not None
+    with open("network_cache.json") as file:
+        assert json.load(file)["ssid"] == "SSID"
+
+
+def _count_scans(manager) -> list:
+    scans = []
+    scan = manager.wlan.scan
+    manager.wlan.scan = lambda: scans.append(_now()) or scan()
+    return scans
+
+
+def test_scan_is_deferred_and_once(sim):
+    from network_control import STATE_CONNECTED
+
+    access_point = sim.add_access_point()
+    manager, states = _manager(check_interval_sec=5)
+    scans = _count_scans(manager)
+
+    _run_until_connected(sim, manager, 30, after_sec=60)
+
+    # the connection is published before the blocking scan, which runs once, a check interval later
+    connected = next(at for at, state in states if state == STATE_CONNECTED)
+    assert len(scans) == 1 and scans[0] - connected > 4.99
+    assert manager._bssid == access_point.bssid
+
+
+def test_cached_reconnect_neither_scans_nor_writes(sim):
+    access_point = sim.add_access_point()
+    manager, _ = _manager()
+    assert _run_until_connected(sim, manager, 30, after_sec=6) is not None
+
+    manager, _ = _manager()     # a later boot, the cache is loaded
+    os.remove("network_cache.json")
+    scans = _count_scans(manager)
+    manager.wlan.disconnect()
+
+    assert _run_until_connected(sim, manager, 30, after_sec=60) is not None
+    assert scans == [] and manager._bssid == access_point.bssid
+    assert not os.path.exists("network_cache.json")     # same IP config is not written again
+
+
+def test_no_access_point_backs_off_exponentially(sim):
+    from network_control import STATE_NO_AP_FOUND
+
+    random.seed(1)
+    access_point = sim.add_access_point()
+    access_point.up = False
+    manager, states = _manager()
+
+    connected = _run_until_connected(sim, manager, 600, [(60, lambda: setattr(access_point, "up", True))])
+
+    assert STATE_NO_AP_FOUND in [state for _, state in states]
+    # waits double from 1s, so the last one is at most about as long as the outage, never backoff_max_sec
+    assert connected is not None and connected < 60 + 70
+
+
+def test_wrong_password_waits_max_backoff(sim):
+    from network_control import STATE_WRONG_PASSWORD, STATE_CONNECTING
+
+    sim.add_access_point(password="OTHER")
+    manager, states = _manager(backoff_max_sec=100)
+
+    assert _run_until_connected(sim, manager, 350) is None
+    attempts = [at for at, state in states if state == STATE_CONNECTING]
+    assert STATE_WRONG_PASSWORD in [state for _, state in states]
+    assert len(attempts) == 4
+    assert all(b - a >= 100 for a, b in zip(attempts, attempts[1:]))
+
+
+def test_stale_cache_retries_with_scan(sim):
+    access_point = sim.add_access_point()
+    with open("network_cache.json", "w") as file:
+        json.dump({"ssid": "SSID", "bssid": "020000000099", "ifconfig": ["0.0.0.0"] * 4}, file)
+    manager, _ = _manager()
+
+    assert manager._bssid == bytes.fromhex("020000000099")
+    assert _run_until_connected(sim, manager, 30, after_sec=6) is not None
+    assert manager.failures == 0 and manager._bssid == access_point.bssid
+
+
+def test_backoff_is_capped_with_jitter(sim):
+    manager, _ = _manager(backoff_min_sec=1, backoff_max_sec=300)
+
+    random.seed(2)
+    for failures, full in ((1, 1), (3, 4), (9, 256), (10, 300), (40, 300)):
+        manager.failures = failures
+        for _ in range(50):
+            assert full / 2 <= manager._backoff_sec() < full
+
+
+def _connected(sim):
+    from network import WLAN, STA_IF
+
+    access_point = sim.add_access_point()
+    wlan = WLAN(STA_IF)
+    wlan.active(True)
+    wlan.connect("SSID", "PASSWORD")
+    sim.clock.advance_us(10000000)
+    assert wlan.isconnected()
+    return wlan, access_point
+
+
+def test_rssi_hysteresis_filters_noise(sim):
+    from network_control import RssiTracker, get_level
+
+    wlan, access_point = _connected(sim)
+    tracker = RssiTracker(wlan)
+    levels = []
+    tracker.subscribe(levels.append)
+
+    rand = random.Random(30)
+    raw_changes, raw_level = 0, None
+    for _ in range(500):
+        access_point.rssi = -50 + rand.randint(-4, 4)
+        tracker.sample()
+        if get_level(wlan) != raw_level:
+            raw_changes, raw_level = raw_changes + 1, get_level(wlan)
+
+    assert raw_changes > 50 and len(levels) <= 2
+    assert tracker.stats()[:2] == (-54, -46) and -51 < tracker.stats()[2] < -49
+
+
+def test_rssi_level_follows_steps(sim):
+    from network_control import RssiTracker
+
+    wlan, access_point = _connected(sim)
+    tracker = RssiTracker(wlan)
+    levels = []
+    tracker.subscribe(levels.append)
+
+    for rssi in (-40, -60, -85, -40):
+        access_point.rssi = rssi
+        for _ in range(20):
+            tracker.sample()
+
+    assert levels == [2, 1, 0, 1, 2] and tracker.rssi() in (-41, -40)    # fixed point rounds down
+
+    access_point.up = False
+    tracker.sample()
+    assert levels[-1] is None and tracker.rssi() is None
+
+    tracker.reset_stats()
+    assert tracker.stats() is None
@@ -0,0 +1,141 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+import asyncio
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+from ota_bundle import bundle, serve
+
+
+def _write(path:str, content:str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as file:
+        file.write(content)
+
+
+def _read(path:str) -> str|None:
+    try:
+        with open(path) as file:
+            return file.read()
+    except OSError:
+        return None
+
+
+def _stage(files:dict) -> dict:
+    """
+    Files downloaded to .ota_new, like async_download() did.
+    :return: the manifest.
+    """
+    for path, content in files.items():
+        _write(f".ota_new/{path}", content)
+    return {"version": "1.1", "files": [{"path": path, "size": 0, "sha256": ""} for path in files]}
+
+
+@pytest.fixture
+def ota(sim):
+    import ota
+    _write("main.py", "old main")
+    _write("lcd_control.py", "old lcd")
+    return ota
+
+
+def test_swap_and_finish(ota):
+    import machine
+
+    ota.install(_stage({"main.py": "new main", "lib/font.py": "new font"}), 5)
+    assert _read("main.py") == "old main"   # swapped only at the next boot
+
+    assert ota.boot() == ota.STATE_TRIAL
+    assert (_read("main.py"), _read("lib/font.py"), _read(".ota_old/main.py")) == ("new main", "new font", "old main")
+    assert not os.path.exists(".ota_new") and len(machine.Timer.armed) == 1
+
+    assert ota.finish() == {"id": 5, "ok": True, "version": "1.1"}
+    assert not os.path.exists("ota.json") and not os.path.exists(".ota_old") and not machine.Timer.armed
+    assert ota.boot() is None and ota.finish() is None
+
+
+def test_swap_resumes_after_power_cut(ota):
+    ota.install(_stage({"main.py": "new main", "lcd_control.py": "new lcd"}), 5)
+    os.makedirs(".ota_old")
+    os.rename("main.py", ".ota_old/main.py")   # cut after the first rename
+    os.rename(".ota_new/main.py", "main.py")
+
+    assert ota.boot() == ota.STATE_TRIAL
+    assert (_read("main.py"), _read("lcd_control.py")) == ("new main", "new lcd")
+    assert (_read(".ota_old/main.py"), _read(".ota_old/lcd_control.py")) == ("old main", "old lcd")
+
+
+def test_rollback_after_failed_trial(ota):
+    ota.install(_stage({"main.py": "new main", "lcd_control.mpy": "new lcd", "new.py": "new"}), 5)
+    assert ota.boot() == ota.STATE_TRIAL
+    assert _read("lcd_control.py") is None  # source is imported before bytecode, so moved out
+
+    assert ota.boot() == ota.STATE_ROLLED_BACK     # reset on trial, by a crash or the timer
+    assert (_read("main.py"), _read("lcd_control.py")) == ("old main", "old lcd")
+    assert _read("lcd_control.mpy") is None and _read("new.py") is None and not os.path.exists(".ota_old")
+
+    assert ota.boot() == ota.STATE_ROLLED_BACK     # kept until reported
+    assert ota.finish() == {"id": 5, "ok": False, "error": "Rolled back from 1.1."}
+    assert ota.boot() is None
+
+
+def test_trial_timer_resets(ota):
+    import machine
+
+    ota.install(_stage({"main.py": "new main"}), 5)
+    ota.boot()
+    machine.clock.advance_us(ota.TRIAL_SEC * 1000000)
+
+    with pytest.raises(SystemExit):
+        machine.Timer.run_due()
+
+
+@pytest.fixture
+def server(tmp_path):
+    release = tmp_path / "release"
+    _write(str(release / "main.py"), "new main\n" * 200)
+    _write(str(release / "lib" / "font.py"), "new font\n")
+    _write(str(release / "config.json"), "{}")
+    bundle(str(release), str(tmp_path / "www"), "1.1")
+
+    http = serve(str(tmp_path / "www"), 0, "127.0.0.1")
+    threading.Thread(target=http.serve_forever, daemon=True).start()
+    yield tmp_path / "www", f"http://127.0.0.1:{http.server_address[1]}"
+    http.shutdown()
+    http.server_close()
+
+
+def test_download(ota, server):
+    www, url = server
+
+    manifest = asyncio.run(ota.async_download(f"{url}/manifest.json", 64))
+    assert [entry["path"] for entry in manifest["files"]] == ["main.py", "lib/font.py"]
+    assert _read(".ota_new/main.py") == "new main\n" * 200
+
+    ota.install(manifest, 5)
+    with pytest.raises(ValueError, match="pending"):
+        asyncio.run(ota.async_download(f"{url}/manifest.json"))
+
+
+def test_download_refuses_bad_files(ota, server):
+    www, url = server
+    (www / "main.py").write_text("new main\n" * 199 + "bad main\n")
+
+    with pytest.raises(ValueError, match="SHA-256 of main.py"):
+        asyncio.run(ota.async_download(f"{url}/manifest.json"))
+    assert not os.path.exists(".ota_new") and _read("main.py") == "old main"
+
+    manifest = json.loads((www / "manifest.json").read_text())
+    manifest["files"].append({"path": "boot.py", "size": 1, "sha256": ""})
+    (www / "manifest.json").write_text(json.dumps(manifest))
+    with pytest.raises(ValueError, match="boot.py can't be updated"):
+        asyncio.run(ota.async_download(f"{url}/manifest.json"))
+
+    with pytest.raises(OSError, match="HTTP 404"):
+        asyncio.run(ota.async_download(f"{url}/missing.json"))
@@ -0,0 +1,17 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+from simulator import replay
+
+
+def test_main_loop_allocates_a_bounded_amount_per_cycle():
+    result = replay.replay(0.25)    # 15 virtual minutes, 10s per cycle
+
+    assert result["cycles"] >= 85 and result["violations"] == 0
+    assert result["published"] >= result["cycles"]
+    assert result["collections"] >= result["cycles"]    # idle collection once per cycle
+
+    # The first cycle retains lazily imported modules. After it, a retained byte per cycle would add up to
+    # the growth, so the growth past the first cycle is bounded by a few allocator blocks.
+    assert result["growth_bytes"] - result["retained_bytes"]["max"] < 4096
+    assert result["transient_bytes"]["mean"] < 16 * 1024
@@ -0,0 +1,45 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+import pytest
+
+
+def _api(sim):
+    from machine import I2C, Pin
+    from lib.HD44780_Driver.lcd_1602_api import lcd_api
+    from lib.HD44780_Driver.pcf8574_I2C_HAL import pcf8574_I2C_HAL
+
+    return lcd_api(pcf8574_I2C_HAL(I2C(scl=Pin(14), sda=Pin(2)), 0x27))
+
+
+def test_clean_boot_has_no_violations(sim):
+    lcd = sim.attach_i2c_lcd(0x27)
+    api = _api(sim)
+    api.print("Hello")
+
+    assert sim.trace.violations == []
+    assert lcd.render().splitlines()[0].startswith("Hello")
+
+
+def test_early_instruction_is_a_violation(sim):
+    from lib.HD44780_Driver.pcf8574_I2C_HAL import pcf8574_I2C_HAL
+    from machine import I2C, Pin
+
+    sim.attach_i2c_lcd(0x27)
+    hal = pcf8574_I2C_HAL(I2C(scl=Pin(14), sda=Pin(2)), 0x27)
+    hal.write_4bit_i2c(0, 0x3)   # function set without waiting after Vcc
+
+    assert len(sim.trace.violations) > 0
+
+
+@pytest.mark.parametrize("oss", range(4))
+def test_bmp180_datasheet_example(sim, oss):
+    from machine import I2C, Pin
+    from lib.BMP180_Driver.BMP180_driver import BMP180Driver
+
+    sim.attach_bmp180()
+    driver = BMP180Driver(I2C(scl=Pin(14), sda=Pin(2)), 0x77)
+
+    assert driver.get_temperature() == 15.0
+    assert driver.get_pressure(oss) == pytest.approx(69964, abs=2)
+    assert sim.trace.violations == []
@@ -0,0 +1,238 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+import json
+import random
+
+import pytest
+
+
+def _sensor(sim, values:list, **kwargs):
+    """
+    :param values: ADC values returned in turn.
+    """
+    from machine import ADC
+    from soil_moisture import SoilMoistureSensor
+
+    values = iter(values)
+    sim.set_adc(0, lambda: next(values))
+    return SoilMoistureSensor(ADC(0), calibration=(150, 250, None), power=(None, 100, 1), **kwargs)
+
+
+def test_filters_match_sorted_reference(sim):
+    from soil_moisture import FILTER_TRIMMED_MEAN
+
+    rand = random.Random(26)
+    bursts = [[rand.randrange(1024) for _ in range(16)] for _ in range(50)]
+    median = _sensor(sim, [value for burst in bursts for value in burst])
+    for burst in bursts:
+        ordered = sorted(burst)
+        assert median.read_raw() == (ordered[7] + ordered[8]) >> 1
+        assert list(median._samples) == ordered
+
+    trimmed = _sensor(sim, [value for burst in bursts for value in burst], filter_mode=FILTER_TRIMMED_MEAN, trim=4)
+    for burst in bursts:
+        assert trimmed.read_raw() == sum(sorted(burst)[4:12]) // 8
+
+
+def test_median_rejects_spikes(sim):
+    sensor = _sensor(sim, [200] * 10 + [1023, 0, 1023, 0, 1023, 0])
+    assert sensor.read_raw() == 200
+
+
+def test_smoothing_and_normalizing(sim):
+    sensor = _sensor(sim, [200] * 16 + [240] * 16 * 20, ema_shift=2)
+
+    assert sensor.read() == pytest.approx(0.5)    # first reading is not smoothed
+    readings = [sensor.read_smoothed() for _ in range(20)]
+    assert readings[0] == 210 and readings == sorted(readings) and readings[-1] in (239, 240)
+
+    assert sensor.normalize(100) == 1 and sensor.normalize(300) == 0
+    assert sensor.normalize(175) == pytest.approx(0.75)
+    with pytest.raises(ValueError):
+        _sensor(sim, [], samples=8, trim=4)
+
+
+class _Button:
+    """
+    Active low button pressed by a script of (ms, level) on the virtual clock.
+    """
+
+    def __init__(self, clock, script:list) -> None:
+        self.clock = clock
+        self.script = script
+
+    def value(self) -> int:
+        level = 1
+        for at_ms, script_level in self.script:
+            if self.clock.now_us >= at_ms * 1000:
+                level = script_level
+        return level
+
+
+def _probe(sim, phases:list):
+    """
+    :param phases: (from ms, ADC value) of where the probe is.
+    """
+    from machine import ADC
+    from soil_moisture import SoilMoistureSensor
+
+    def source():
+        value = 0
+        for at_ms, phase_value in phases:
+            if sim.clock.now_us >= at_ms * 1000:
+                value = phase_value
+        return value
+
+    sim.set_adc(0, source)
+    return SoilMoistureSensor(ADC(0), calibration=(150, 250, None), power=(None, 100, 1))
+
+
+def _lcd_prompt(sim):
+    from machine import I2C, Pin
+    from lib.HD44780_Driver.lcd_1602_api import lcd_api
+    from lib.HD44780_Driver.pcf8574_I2C_HAL import pcf8574_I2C_HAL
+
+    sim.attach_i2c_lcd(0x27)
+    api = lcd_api(pcf8574_I2C_HAL(I2C(scl=Pin(14), sda=Pin(2)), 0x27))
+    prompts = []
+
+    def prompt(message:str) -> None:     # like main.show_prompt()
+        prompts.append(message)
+        api.clear()
+        api.print(message, auto_return=True)
+
+    return prompt, prompts
+
+
+def test_calibrate_with_held_button(sim):
+    from soil_moisture import calibrate, load_calibration
+
+    # held at boot until 1s, probe placed in air at 2s and pressed at 3s, in water at 5.5s and pressed at 6s
+    sensor = _probe(sim, [(0, 1023), (2000, 600), (5500, 200)])
+    button = _Button(sim.clock, [(0, 0), (1000, 1), (3000, 0), (3200, 1), (6000, 0), (6200, 1)])
+    prompt, prompts = _lcd_prompt(sim)
+
+    assert calibrate(sensor, button, prompt=prompt) == (200, 600)
+    assert load_calibration() == (200, 600, None)
+    assert (sensor.offset_min, sensor.offset_max) == (200, 600)
+    assert prompts == ["Probe in air, then confirm", "Probe in water, then confirm", "Saved 200-600"]
+
+
+def test_calibrate_references(sim):
+    from soil_moisture import calibrate
+
+    sensor = _probe(sim, [(0, 600), (2500, 200), (5000, 400)])
+    button = _Button(sim.clock, [(1000, 0), (1100, 1), (3000, 0), (3100, 1), (5500, 0), (5600, 1)])
+    prompt, prompts = _lcd_prompt(sim)
+
+    assert calibrate(sensor, button, references=[0.5], prompt=prompt) == (200, 600)
+    assert sensor.curve == ((200, 1.0), (400, 0.5), (600, 0.0))
+    assert sensor.normalize(300) == pytest.approx(0.75)
+    assert "Probe in 50% soil, confirm" in prompts
+
+
+def test_failed_calibration_keeps_file(sim):
+    from soil_moisture import calibrate
+
+    with open("soil_moisture.json", "w") as file:
+        json.dump({"offset_min": 150, "offset_max": 250, "power_pin": 12}, file)
+
+    sensor = _probe(sim, [(0, 200), (2500, 600)])
+    button = _Button(sim.clock, [(1000, 0), (1100, 1), (3000, 0), (3100, 1)])
+
+    with pytest.raises(RuntimeError):
+        calibrate(sensor, button, prompt=lambda message: None)
+
+    with open("soil_moisture.json") as file:
+        assert json.load(file) == {"offset_min": 150, "offset_max": 250, "power_pin": 12}
+
+
+def test_probe_powered_on_sampled_readings_only(sim):
+    from asyncio import sleep
+    from machine import ADC, Pin
+    from soil_moisture import SoilMoistureSensor
+
+    power_pin = Pin(12, Pin.OUT, value=0)
+    powered = []    # (reading number, us) of each rising edge
+    power_pin.listen(lambda old, new: powered.append((len(values), sim.clock.now_us)) if new and not old else None)
+
+    def sample() -> int:     # unpowered or unsettled probe reads 0
+        assert power_pin.value() and sim.clock.now_us - powered[-1][1] >= 100 * 1000
+        return 1023
+
+    sim.set_adc(0, sample)
+    sensor = SoilMoistureSensor(ADC(0), calibration=(150, 250, None), power=(power_pin, 100, 3))
+    values = []
+
+    async def cycles() -> int:
+        start = sim.clock.now_us
+        for _ in range(9):
+            values.append(await sensor.async_read())
+            assert not power_pin.value()
+            await sleep(1)
+        return (sim.clock.now_us - start) // 1000
+
+    elapsed_ms = sim.run(cycles())
+
+    assert [number for number, _ in powered] == [0, 3, 6]
+    assert values == [0] * 9     # 1023 is dry
+    assert 3 * 100 <= sensor.energized_ms < 3 * 110
+    assert sensor.energized_ms / elapsed_ms == pytest.approx(3 * 100 / (9 * 1000 + 3 * 100), rel=0.05)
+
+
+def _lines_run(function, file_name:str) -> int:
+    """
+    :return: lines of file_name run by function(), a cost independent of the host's speed.
+    """
+    import sys
+
+    lines = 0
+
+    def trace(frame, event, arg):
+        nonlocal lines
+        if frame.f_code.co_filename.endswith(file_name):
+            if event == "line": lines += 1
+            return trace
+        return None
+
+    sys.settrace(trace)
+    try:
+        function()
+    finally:
+        sys.settrace(None)
+    return lines
+
+
+def test_noise_reduction_and_cost_per_sample(sim, record_property):
+    from machine import ADC
+    from soil_moisture import SoilMoistureSensor
+
+    rand = random.Random(26)
+
+    def noisy() -> int:     # probe at 200, gaussian noise and a spike in 50 samples
+        if rand.random() < 0.02: return rand.choice((0, 1023))
+        return max(0, min(1023, round(rand.gauss(200, 8))))
+
+    def single_read() -> float:    # the reading before filtering, one sample without smoothing
+        result_fixed = 1 - ((ADC(0).read() - 150) / (250 - 150))
+        return 0 if result_fixed <= 0 else 1 if result_fixed >= 1 else result_fixed
+
+    sim.set_adc(0, noisy)
+    sensor = SoilMoistureSensor(ADC(0), calibration=(150, 250, None), power=(None, 100, 1))
+    for _ in range(20):     # settle the EMA
+        sensor.read()
+
+    def variance(values:list) -> float:
+        mean = sum(values) / len(values)
+        return sum((value - mean) ** 2 for value in values) / len(values)
+
+    raw = variance([single_read() for _ in range(500)])
+    filtered = variance([sensor.read() for _ in range(500)])
+    assert filtered < raw / 50
+    record_property("variance_ratio", raw / filtered)
+
+    samples = len(sensor._samples)
+    lines = _lines_run(sensor.read, "soil_moisture.py") / samples
+    record_property("lines_per_sample", lines)
+    assert lines < 30   # about 19: insertion sort moves a quarter of the burst per sample on average
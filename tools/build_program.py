@@ -0,0 +1,231 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**Compile every module of program/ to .mpy and emit a tree to copy to the board**
+
+Run in the repo's root:
+
+    python tools/build_program.py -o build/program
+    mpremote connect auto fs cp -r build/program/. :
+
+Every module is compiled by mpy-cross in a process pool. MicroPython only runs boot.py and main.py as
+source, so boot.py is copied as is and main.py is compiled as app.mpy with a tiny main.py importing it.
+Other files like soil_moisture.json are copied as is. Before compiling, constants imported from other
+modules are folded into literals by const_fold.py, use --no-fold to compile sources as they are.
+
+If mpy-cross is not installed, a stub checks syntax by CPython and copies sources instead, so the tree
+is still deployable, and runnable by the simulator: `python -m simulator.benchmark --program build/program`.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter_ns
+
+from const_fold import fold_modules, module_name
+
+try:
+    import mpy_cross
+except ImportError:
+    mpy_cross = None
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROGRAM_DIR = os.path.join(REPO_DIR, "program")
+
+SOURCE_ONLY = ("boot.py",)
+"""**Files run as source by MicroPython, copied as is**"""
+
+APP_MODULE = "app"
+"""**main.py is compiled as this module**"""
+
+MAIN_SHIM = f"""from asyncio import run
+from {APP_MODULE} import main
+run(main())
+"""
+
+
+def compile_file(source:str, output:str, opt:int, arch:str|None) -> tuple:
+    """
+    **Compile a .py to .mpy, run in a worker process**
+
+    :param output: .mpy path by mpy-cross, or .py path by the stub.
+    :return: (output, nanoseconds, error message or None).
+    """
+    start = perf_counter_ns()
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+
+    if mpy_cross is None:
+        try:
+            with open(source, "rb") as file:
+                compile(file.read(), source, "exec")
+            shutil.copyfile(source, output)
+            error = None
+        except SyntaxError as e:
+            error = f"{e.filename}:{e.lineno}: {e.msg}"
+        return output, perf_counter_ns() - start, error
+
+    options = ["-o", output, f"-O{opt}", "-s", os.path.basename(source)]
+    if arch is not None:
+        options.append(f"-march={arch}")
+
+    process = mpy_cross.run(*options, source, stderr=-1)   # subprocess.PIPE
+    _, stderr = process.communicate()
+    error = stderr.decode().strip() or "mpy-cross failed" if process.returncode != 0 else None
+    return output, perf_counter_ns() - start, error
+
+
+def plan(program_dir:str, output_dir:str) -> tuple:
+    """
+    **Decide what to do with every file of program_dir**
+
+    :return: (compiles, copies), lists of (source, output).
+    """
+    compiles, copies = [], []
+    suffix = ".mpy" if mpy_cross is not None else ".py"
+
+    for directory, directories, files in os.walk(program_dir):
+        directories[:] = sorted(d for d in directories if d != "__pycache__")
+        relative = os.path.relpath(directory, program_dir)
+
+        for name in sorted(files):
+            source = os.path.join(directory, name)
+            output = os.path.normpath(os.path.join(output_dir, relative, name))
+
+            if relative == "." and name in SOURCE_ONLY or not name.endswith(".py"):
+                copies.append((source, output))
+            elif relative == "." and name == "main.py":
+                compiles.append((source, os.path.join(output_dir, APP_MODULE + suffix)))
+            else:
+                compiles.append((source, output[:-3] + suffix))
+
+    return compiles, copies
+
+
+def fold(program_dir:str, compiles:list, directory:str) -> tuple:
+    """
+    **Fold constants of all modules to compile, folded sources are written to directory**
+
+    :return: (compiles with folded sources, folded nodes of every source)
+    """
+    sources = {}
+    for source, _ in compiles:
+        with open(source, "r", encoding="UTF-8") as file:
+            sources[module_name(source, program_dir)] = file.read()
+
+    results = fold_modules(sources)
+
+    folded_compiles, counts = [], {}
+    for source, output in compiles:
+        folded_source, counts[source] = results[module_name(source, program_dir)]
+        if folded_source is not None:
+            path = os.path.join(directory, os.path.relpath(source, program_dir))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="UTF-8") as file:
+                file.write(folded_source)
+            source = path
+        folded_compiles.append((source, output))
+
+    return folded_compiles, counts
+
+
+def build(program_dir:str, output_dir:str, opt:int = 3, arch:str|None = None, jobs:int|None = None,
+          is_folding:bool = True) -> dict:
+    """
+    **Build a deployable tree from program_dir**
+
+    output_dir is removed first, so files deleted from program/ won't be left.
+    :param is_folding: False is compiling sources without folding constants.
+    :return: {"compiler": ..., "files": [...], "total_ms": ..., "errors": n}
+    """
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+
+    start = perf_counter_ns()
+    compiles, copies = plan(program_dir, output_dir)
+
+    for source, output in copies:
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        shutil.copyfile(source, output)
+
+    os.makedirs(output_dir, exist_ok=True)     # no file may be copied to the root, like without boot.py
+    with open(os.path.join(output_dir, "main.py"), "w", encoding="UTF-8") as file:
+        file.write(MAIN_SHIM)
+
+    with tempfile.TemporaryDirectory() as directory:
+        if is_folding:
+            compile_sources, folded = fold(program_dir, compiles, directory)
+        else:
+            compile_sources, folded = compiles, {}
+
+        with ProcessPoolExecutor(jobs) as pool:
+            results = list(pool.map(compile_file, *zip(*compile_sources),
+                                    [opt] * len(compiles), [arch] * len(compiles)))
+
+    files = []
+    for (source, _), (output, elapsed_ns, error) in zip(compiles, results):
+        files.append({"source": os.path.relpath(source, program_dir),
+                      "output": os.path.relpath(output, output_dir),
+                      "source_bytes": os.path.getsize(source),
+                      "output_bytes": os.path.getsize(output) if error is None else 0,
+                      "folded": folded.get(source, 0),
+                      "compile_ms": elapsed_ns / 1e6,
+                      "error": error})
+
+    return {"compiler": "mpy-cross" if mpy_cross is not None else "stub",
+            "folding": is_folding,
+            "files": files,
+            "copied": [os.path.relpath(output, output_dir) for _, output in copies] + ["main.py"],
+            "total_ms": (perf_counter_ns() - start) / 1e6,
+            "errors": sum(file["error"] is not None for file in files)}
+
+
+def report(result:dict) -> str:
+    """
+    :return: a text table of every compiled file, the sum of compile time and the total build time.
+    """
+    lines = [f"compiled by {result['compiler']}" + ("" if result["folding"] else ", constants not folded"),
+             f"  {'source':<40}{'output':<40}{'src B':>8}{'out B':>8}{'folded':>8}{'ms':>9}"]
+
+    for file in result["files"]:
+        lines.append(f"  {file['source']:<40}{file['output']:<40}{file['source_bytes']:>8}"
+                     f"{file['output_bytes']:>8}{file['folded']:>8}{file['compile_ms']:>9.1f}")
+        if file["error"] is not None:
+            lines.append(f"    error: {file['error']}")
+
+    lines.append(f"  {'sum':<80}{sum(f['source_bytes'] for f in result['files']):>8}"
+                 f"{sum(f['output_bytes'] for f in result['files']):>8}"
+                 f"{sum(f['folded'] for f in result['files']):>8}"
+                 f"{sum(f['compile_ms'] for f in result['files']):>9.1f}")
+    lines.append(f"copied {', '.join(result['copied'])}")
+    lines.append(f"total {result['total_ms']:.1f} ms, {result['errors']} errors")
+    return "\n".join(lines)
+
+
+def main(argv:list|None = None) -> dict:
+    parser = argparse.ArgumentParser(prog="python tools/build_program.py",
+                                     description="Compile every module of program/ to .mpy in parallel.")
+    parser.add_argument("-s", "--source", default=PROGRAM_DIR, help="program directory. Default is program/.")
+    parser.add_argument("-o", "--output", default="./build/program", help="output directory, removed first. "
+                                                                          "Default is ./build/program")
+    parser.add_argument("--opt", type=int, default=3, choices=[0, 1, 2, 3],
+                        help="As same as mpy-cross -O[N]. Default is 3.")
+    parser.add_argument("--arch", help="As same as mpy-cross -march, like xtensa for ESP8266. "
+                                       "Only needed by @micropython.native and viper.")
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes. Default is CPU count.")
+    parser.add_argument("--no-fold", action="store_true", help="compile sources without folding constants.")
+    args = parser.parse_args(argv)
+
+    result = build(args.source, args.output, args.opt, args.arch, args.jobs, not args.no_fold)
+    print(report(result))
+
+    if result["errors"]:
+        sys.exit(1)
+    return result
+
+
+if __name__ == "__main__":
+    main()
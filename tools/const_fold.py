@@ -0,0 +1,205 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**Fold constants imported from other modules into literals**
+
+MicroPython replaces a name declared by `X = const(1)` only in the module declaring it. In other modules,
+`from .instruction_const import *` makes every LCD_* a global dict lookup, and `instrument.STAGE_BMP180` is
+two lookups, at every call. This transform rewrites such names to literals, then folds constant operations
+and conditional expressions, like what HD44780_Driver composes for every instruction:
+
+    LCD_DISPLAY_ | (LCD_DISPLAY_ON if display_on else LCD_DISPLAY_OFF) | (LCD_DISPLAY_BLINK if blink else 0)
+    (13 if blink else 12) if display_on else (9 if blink else 8)
+
+Branches are only combined if their conditions are plain names, which have no side effect, so the order of
+evaluating them doesn't matter.
+"""
+
+import ast
+import os
+
+MAX_LEAVES = 8
+"""**Most literals of a folded conditional expression**, 2 ** 3 conditions"""
+
+_OPERATORS = {ast.BitOr: int.__or__, ast.BitAnd: int.__and__, ast.BitXor: int.__xor__,
+              ast.LShift: int.__lshift__, ast.RShift: int.__rshift__,
+              ast.Add: int.__add__, ast.Sub: int.__sub__, ast.Mult: int.__mul__}
+
+
+def _is_int(node:ast.AST) -> bool:
+    return isinstance(node, ast.Constant) and type(node.value) is int
+
+
+def _leaves(node:ast.AST) -> int:
+    """
+    :return: literals of a conditional expression of int literals, or 0 if it's not.
+    """
+    if _is_int(node): return 1
+    if isinstance(node, ast.IfExp) and isinstance(node.test, ast.Name):
+        body, orelse = _leaves(node.body), _leaves(node.orelse)
+        return body + orelse if body and orelse else 0
+    return 0
+
+
+class _Folder(ast.NodeTransformer):
+
+    names:dict = None
+    modules:dict = None
+    folded:int = 0
+
+    def __init__(self, names:dict, modules:dict) -> None:
+        """
+        :param names: name: value of constants usable by plain name.
+        :param modules: alias: {name: value} of imported modules, for alias.name.
+        """
+        self.names = names
+        self.modules = modules
+
+    def _constant(self, value:int, node:ast.AST) -> ast.Constant:
+        self.folded += 1
+        return ast.copy_location(ast.Constant(value), node)
+
+    def visit_Name(self, node:ast.Name) -> ast.AST:
+        if isinstance(node.ctx, ast.Load) and node.id in self.names:
+            return self._constant(self.names[node.id], node)
+        return node
+
+    def visit_Attribute(self, node:ast.Attribute) -> ast.AST:
+        self.generic_visit(node)
+        if isinstance(node.ctx, ast.Load) and isinstance(node.value, ast.Name) and \
+                node.attr in self.modules.get(node.value.id, {}):
+            return self._constant(self.modules[node.value.id][node.attr], node)
+        return node
+
+    def visit_UnaryOp(self, node:ast.UnaryOp) -> ast.AST:
+        self.generic_visit(node)
+        if _is_int(node.operand) and isinstance(node.op, (ast.USub, ast.Invert)):
+            value = -node.operand.value if isinstance(node.op, ast.USub) else ~node.operand.value
+            return self._constant(value, node)
+        return node
+
+    def visit_IfExp(self, node:ast.IfExp) -> ast.AST:
+        self.generic_visit(node)
+        if isinstance(node.test, ast.Constant):
+            self.folded += 1
+            return node.body if node.test.value else node.orelse
+        return node
+
+    def visit_BinOp(self, node:ast.BinOp) -> ast.AST:
+        self.generic_visit(node)
+        return self._fold_binary(node)
+
+    def _fold_binary(self, node:ast.BinOp) -> ast.AST:
+        operator = _OPERATORS.get(type(node.op))
+        if operator is None: return node
+
+        if _is_int(node.left) and _is_int(node.right):
+            if isinstance(node.op, ast.LShift) and not 0 <= node.right.value < 32: return node
+            return self._constant(operator(node.left.value, node.right.value), node)
+
+        left, right = _leaves(node.left), _leaves(node.right)
+        if not left or not right or left * right > MAX_LEAVES: return node
+
+        # distribute over the branches: (a if x else b) | c -> (a | c) if x else (b | c)
+        branch = node.left if isinstance(node.left, ast.IfExp) else node.right
+        def replaced(side:ast.AST) -> ast.BinOp:
+            return ast.BinOp(side if node.left is branch else node.left, node.op,
+                             side if node.right is branch else node.right)
+
+        return ast.copy_location(ast.IfExp(branch.test,
+                                           self._fold_binary(replaced(branch.body)),
+                                           self._fold_binary(replaced(branch.orelse))), node)
+
+
+def module_name(path:str, root:str) -> str:
+    return os.path.splitext(os.path.relpath(path, root))[0].replace(os.sep, ".")
+
+
+def declared_constants(tree:ast.Module) -> dict:
+    """
+    :return: name: value of top-level `NAME = const(...)` whose value is known at build time.
+    """
+    constants = {}
+    for node in tree.body:
+        if not (isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name)
+                and isinstance(node.value, ast.Call) and isinstance(node.value.func, ast.Name)
+                and node.value.func.id == "const" and len(node.value.args) == 1):
+            continue
+
+        value = _Folder(constants, {}).visit(node.value.args[0])
+        if _is_int(value):
+            constants[node.targets[0].id] = value.value
+    return constants
+
+
+def _resolve(node:ast.ImportFrom, name:str) -> str:
+    """
+    :return: absolute name of the module imported by `from ... import`, in module `name`.
+    """
+    if node.level == 0: return node.module
+    package = name.split(".")[:-node.level]
+    return ".".join(package + ([node.module] if node.module else []))
+
+
+def _assigned_names(tree:ast.Module) -> set:
+    """
+    Names assigned anywhere, except declaring constants, which may shadow a constant.
+    """
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            names.add(node.id)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+    return names
+
+
+def fold_modules(sources:dict) -> dict:
+    """
+    **Fold constants of modules of one program**
+
+    :param sources: module name: source code, like {"lib.HD44780_Driver.HD44780_Driver": "..."}.
+    :return: module name: (folded source, or None if nothing to fold, number of folded nodes).
+    """
+    trees = {name: ast.parse(source) for name, source in sources.items()}
+    constants = {name: declared_constants(tree) for name, tree in trees.items()}
+
+    results = {}
+    for name, tree in trees.items():
+        names, modules = {}, {}
+
+        for node in tree.body:
+            if isinstance(node, ast.ImportFrom):
+                imported = constants.get(_resolve(node, name), {})
+                for alias in node.names:
+                    if alias.name == "*":
+                        names.update(imported)
+                    elif alias.name in imported:
+                        names[alias.asname or alias.name] = imported[alias.name]
+
+            elif isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.asname is not None and alias.name in constants:
+                        modules[alias.asname] = constants[alias.name]
+                    elif alias.asname is None and "." not in alias.name and alias.name in constants:
+                        modules[alias.name] = constants[alias.name]
+
+        shadowed = _assigned_names(tree) - set(constants[name])
+        names = {key: value for key, value in names.items() if key not in shadowed}
+        modules = {key: value for key, value in modules.items() if key not in shadowed}
+
+        folder = _Folder(names, modules)
+        for node in tree.body:
+            if isinstance(node, ast.Assign) and isinstance(node.value, ast.Call) and \
+                    isinstance(node.value.func, ast.Name) and node.value.func.id == "const":
+                continue    # keep declarations, other modules may import them
+            folder.visit(node)
+
+        results[name] = (ast.unparse(ast.fix_missing_locations(tree)) + "\n" if folder.folded else None,
+                         folder.folded)
+    return results
@@ -0,0 +1,148 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**Generate config.json of every device of a fleet**
+
+main.py reads the settings of a device from config.json by program/config.py, so one compiled or frozen
+main.py runs on every device. Describe the fleet in a JSON file, keys of every device override the defaults:
+
+    {"defaults": {"ssid": "Home", "password": "secret", "mqtt_broker_ip": "192.168.1.2"},
+     "devices": {"balcony": {}, "kitchen": {"lcd_address": 63, "period_sec": 30}}}
+
+Then run in the repo's root and copy the config of a device to its board:
+
+    python tools/device_config.py fleet.json -o build/configs
+    mpremote connect auto fs cp build/configs/kitchen/config.json :
+
+Every config is validated by Config of program/config.py, the same code parsing it on the board. Only keys
+differing from the defaults of Config are written, without spaces, so parsing it at boot takes the least.
+For one device, give keys by --set instead, like `--set ssid=Home --set lcd_address=0x3f -o build/config`.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+from time import perf_counter_ns
+
+from build_program import PROGRAM_DIR
+
+sys.path.insert(0, PROGRAM_DIR)
+from config import CONFIG_FILE, Config, load_config
+
+
+def parse_value(key:str, text:str):
+    """
+    **Parse a value of --set by the type of the key's default**
+
+    :return: int of decimal or 0x hex, bool of true or false, or str as is.
+    """
+    default = getattr(Config, key, None)
+    if type(default) is bool:
+        if text.lower() not in ("true", "false"):
+            raise ValueError(f"{key} must be true or false.")
+        return text.lower() == "true"
+    if type(default) is int:
+        return int(text, 0)
+    return text
+
+
+def compact(values:dict) -> dict:
+    """
+    **Validate values and drop the ones equal to defaults**
+
+    :raise ValueError: like Config().
+    """
+    config = Config(values)
+    return {key: value for key, value in config.to_dict().items() if value != getattr(Config, key)}
+
+
+def generate(devices:dict, defaults:dict, output_dir:str) -> list:
+    """
+    **Write output_dir/<device>/config.json of every device**
+
+    :param devices: device name: keys overriding defaults.
+    :param defaults: keys of all devices.
+    :return: [(device, path, bytes)]
+    :raise ValueError: a config of a device is wrong, the message starts with the device name. A device
+        named "" is written to output_dir itself.
+    """
+    results = []
+    for name, overrides in devices.items():
+        try:
+            values = compact({**defaults, **overrides})
+        except ValueError as e:
+            raise ValueError(f"{name}: {e}" if name else str(e)) from None
+
+        path = os.path.join(output_dir, name, CONFIG_FILE)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="UTF-8") as file:
+            json.dump(values, file, separators=(",", ":"))
+        results.append((name, path, os.path.getsize(path)))
+
+    return results
+
+
+def measure(path:str, rounds:int = 1000) -> dict:
+    """
+    **Measure load_config() of a file on the host**
+
+    CPython is much faster and its objects are bigger than MicroPython's, so only compare results between
+    configs or commits.
+    :return: {"parse_us": mean of rounds, "alloc_peak_bytes": peak of one parse}
+    """
+    start = perf_counter_ns()
+    for _ in range(rounds):
+        load_config(path)
+    parse_us = (perf_counter_ns() - start) / rounds / 1000
+
+    tracemalloc.start()
+    try:
+        load_config(path)
+        alloc_peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {"parse_us": parse_us, "alloc_peak_bytes": alloc_peak}
+
+
+def main(argv:list|None = None) -> list:
+    parser = argparse.ArgumentParser(prog="python tools/device_config.py",
+                                     description="Generate config.json of every device of a fleet.")
+    parser.add_argument("fleet", nargs="?", help='JSON file of {"defaults": {...}, "devices": {name: {...}}}.')
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="key of one device without a fleet file, repeat for more.")
+    parser.add_argument("-o", "--output", default="./build/configs", help="output directory, a subdirectory per "
+                                                                          "device. Default is ./build/configs")
+    parser.add_argument("--measure", action="store_true", help="report parsing time and allocation on host.")
+    args = parser.parse_args(argv)
+
+    if args.fleet is not None:
+        with open(args.fleet, "r", encoding="UTF-8") as file:
+            fleet = json.load(file)
+        defaults, devices = fleet.get("defaults", {}), fleet.get("devices", {})
+    else:
+        defaults, devices = {}, {"": {}}     # written to the output directory itself
+
+    try:
+        for item in args.set:
+            key, _, text = item.partition("=")
+            defaults[key] = parse_value(key, text)
+        results = generate(devices, defaults, args.output)
+    except ValueError as e:
+        sys.exit(f"error: {e}")
+
+    for name, path, size in results:
+        line = f"  {path:<48}{size:>6} B"
+        if args.measure:
+            cost = measure(path)
+            line += f"{cost['parse_us']:>9.1f} us{cost['alloc_peak_bytes']:>7} B peak"
+        print(line)
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
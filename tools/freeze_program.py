@@ -0,0 +1,272 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**Freeze program/ into a custom firmware**
+
+Modules loaded from the filesystem, even as .mpy, are copied to the heap when imported. Frozen modules are
+built into the firmware and run from flash, so drivers and tables take no heap. Run in the repo's root:
+
+    python tools/freeze_program.py -o build/frozen
+    make -C ports/esp8266 BOARD=ESP8266_GENERIC FROZEN_MANIFEST=$PWD/build/frozen/manifest.py
+
+Then flash the firmware and copy build/frozen/fs/ to the board, which is boot.py, the main.py shim and data
+files. build/frozen/modules/ is what is frozen, sources of program/ with constants folded, main.py as app.py.
+
+The manifest is checked against the import graph of main.py and boot.py: every imported module of program/
+must be frozen or copied, and frozen modules never imported are reported as wasted flash. Check a manifest
+edited by hand with `python tools/freeze_program.py --check build/frozen/manifest.py`.
+"""
+
+import argparse
+import ast
+import os
+import shutil
+import sys
+import tempfile
+
+from build_program import APP_MODULE, MAIN_SHIM, PROGRAM_DIR, REPO_DIR, SOURCE_ONLY, compile_file, fold, mpy_cross, plan
+from const_fold import module_name
+
+CHAR_SETS_DIR = os.path.join(REPO_DIR, "library", "HD44780_Driver", "char_sets")
+
+PORT_MANIFEST = "$(PORT_DIR)/boards/manifest.py"
+"""**Manifest of the port's own frozen modules**, like asyncio and ntptime of ESP8266"""
+
+
+def _module_file(program_dir:str, name:str) -> str|None:
+    base = os.path.join(program_dir, *name.split("."))
+    for path in (base + ".py", os.path.join(base, "__init__.py")):
+        if os.path.isfile(path): return path
+    return None
+
+
+def import_graph(program_dir:str, entries:list) -> dict:
+    """
+    **Find modules of program_dir imported by entries, directly or not**
+
+    :param entries: paths of files to start from, like main.py and boot.py.
+    :return: module name: set of in-project module names it imports.
+    """
+    graph = {}
+    pending = list(entries)
+
+    while pending:
+        path = pending.pop()
+        name = module_name(path, program_dir)
+        if name in graph: continue
+
+        with open(path, "r", encoding="UTF-8") as file:
+            tree = ast.parse(file.read(), path)
+
+        imported = graph[name] = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                candidates = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom):
+                package = name.split(".")[:-node.level] if node.level else []
+                module = ".".join(package + ([node.module] if node.module else []))
+                candidates = [module] + [f"{module}.{alias.name}" if module else alias.name for alias in node.names]
+            else:
+                continue
+
+            for candidate in candidates:
+                target = _module_file(program_dir, candidate) if candidate else None
+                if target is not None:
+                    imported.add(module_name(target, program_dir))
+                    pending.append(target)
+
+    return graph
+
+
+def read_manifest(path:str) -> dict:
+    """
+    **Run a manifest.py with the functions of MicroPython's manifest, to find what it freezes**
+
+    Only module() and package() are followed. include() of port manifests, require() and freeze() of
+    other directories are ignored, they don't freeze modules of program/.
+    :return: frozen module name: file path.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    frozen = {}
+
+    def resolve(base_path:str) -> str:
+        return os.path.normpath(os.path.join(directory, base_path))
+
+    def module(module_path:str, base_path:str = ".", opt:int|None = None) -> None:
+        file = os.path.join(resolve(base_path), module_path)
+        frozen[os.path.splitext(module_path)[0].replace("/", ".")] = file
+
+    def package(package_path:str, files:list|None = None, base_path:str = ".", opt:int|None = None) -> None:
+        root = resolve(base_path)
+        for current, _, names in os.walk(os.path.join(root, package_path)):
+            for file_name in names:
+                relative = os.path.relpath(os.path.join(current, file_name), root).replace(os.sep, "/")
+                if file_name.endswith(".py") and (files is None or file_name in files):
+                    module(relative, base_path)
+
+    def ignored(*args, **kwargs) -> None:
+        pass
+
+    with open(path, "r", encoding="UTF-8") as file:
+        exec(file.read(), {"module": module, "package": package, "include": ignored, "require": ignored,
+                           "freeze": ignored, "metadata": ignored, "options": None})
+    return frozen
+
+
+def check(manifest:str, program_dir:str, fs_dir:str|None = None) -> tuple:
+    """
+    **Check a manifest against the import graph**
+
+    :param fs_dir: files copied to the board's filesystem. A module there shadows the frozen one, as the
+        filesystem is searched first.
+    :return: (errors, warnings) as lists of messages.
+    """
+    frozen = read_manifest(manifest)
+    entries = [os.path.join(program_dir, name) for name in ("main.py",) + SOURCE_ONLY
+               if os.path.isfile(os.path.join(program_dir, name))]
+    graph = import_graph(program_dir, entries)
+
+    on_fs = set()
+    if fs_dir is not None:
+        on_fs = {module_name(os.path.join(directory, name), fs_dir)
+                 for directory, _, names in os.walk(fs_dir) for name in names if name.endswith((".py", ".mpy"))}
+
+    errors, warnings = [], []
+    for name, file in sorted(frozen.items()):
+        if not os.path.isfile(file):
+            errors.append(f"{name} is frozen from {file}, which doesn't exist")
+        if name in on_fs:
+            warnings.append(f"{name} is frozen and on the filesystem, the file shadows the frozen one")
+
+    def deployed(name:str) -> str:  # main.py is frozen as app, imported by main.py on the filesystem
+        return APP_MODULE if name == "main" else name
+
+    for name in sorted(graph):
+        if name + ".py" in SOURCE_ONLY: continue    # boot.py runs from the filesystem as is
+        if deployed(name) not in frozen and deployed(name) not in on_fs:
+            errors.append(f"{name} is imported but neither frozen nor on the filesystem")
+
+    imported = {deployed(name) for name in graph}
+    for name in sorted(set(frozen) - imported):
+        warnings.append(f"{name} is frozen but never imported, it only takes flash")
+
+    return errors, warnings
+
+
+def freeze(program_dir:str, output_dir:str, opt:int = 3, char_sets:bool = False) -> dict:
+    """
+    **Write manifest.py, frozen modules and files for the filesystem to output_dir**
+
+    :param char_sets: True is freezing char-set tables of HD44780_Driver too, to import in lcd_1602_api.
+    :return: {"manifest": path, "modules": [{"name", "source_bytes", "bytecode_bytes"}], "fs": [...]}
+    """
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+
+    modules_dir = os.path.join(output_dir, "modules")
+    fs_dir = os.path.join(output_dir, "fs")
+    compiles, copies = plan(program_dir, modules_dir)
+
+    for source, output in copies:   # boot.py and data files stay on the filesystem
+        target = os.path.join(fs_dir, os.path.relpath(output, modules_dir))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(source, target)
+    with open(os.path.join(fs_dir, "main.py"), "w", encoding="UTF-8") as file:
+        file.write(MAIN_SHIM)
+
+    with tempfile.TemporaryDirectory() as directory:
+        folded_compiles, _ = fold(program_dir, compiles, directory)
+        frozen = []
+        for (source, _), (_, output) in zip(folded_compiles, compiles):
+            relative = os.path.relpath(os.path.splitext(output)[0] + ".py", modules_dir)
+            os.makedirs(os.path.dirname(os.path.join(modules_dir, relative)), exist_ok=True)
+            shutil.copyfile(source, os.path.join(modules_dir, relative))
+            frozen.append(relative)
+
+    if char_sets:
+        target_dir = os.path.join(modules_dir, "lib", "HD44780_Driver", "char_sets")
+        os.makedirs(target_dir, exist_ok=True)
+        for name in sorted(os.listdir(CHAR_SETS_DIR)):
+            if name.endswith(".py"):
+                shutil.copyfile(os.path.join(CHAR_SETS_DIR, name), os.path.join(target_dir, name))
+                frozen.append(os.path.join("lib", "HD44780_Driver", "char_sets", name))
+
+    manifest = os.path.join(output_dir, "manifest.py")
+    with open(manifest, "w", encoding="UTF-8") as file:
+        file.write("# Generated by tools/freeze_program.py, build firmware with\n"
+                   "#   make -C ports/esp8266 BOARD=ESP8266_GENERIC FROZEN_MANIFEST=<path of this file>\n"
+                   f'include("{PORT_MANIFEST}")\n')
+        for relative in sorted(frozen):
+            file.write(f'module("{relative.replace(os.sep, "/")}", base_path="modules", opt={opt})\n')
+
+    return {"manifest": manifest, "fs_dir": fs_dir,
+            "modules": sizes(modules_dir, sorted(frozen), opt),
+            "fs": sorted(os.path.relpath(os.path.join(d, n), fs_dir) for d, _, names in os.walk(fs_dir) for n in names)}
+
+
+def sizes(modules_dir:str, frozen:list, opt:int) -> list:
+    """
+    :return: source and bytecode size of every frozen module. Bytecode size is the .mpy by mpy-cross, None if
+        it's not installed. It's about the heap taken when importing the module from the filesystem.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for index, relative in enumerate(frozen):
+            source = os.path.join(modules_dir, relative)
+            bytecode = None
+            if mpy_cross is not None:
+                output, _, error = compile_file(source, os.path.join(directory, f"{index}.mpy"), opt, None)
+                bytecode = os.path.getsize(output) if error is None else None
+            results.append({"name": os.path.splitext(relative)[0].replace(os.sep, "."),
+                            "source_bytes": os.path.getsize(source), "bytecode_bytes": bytecode})
+    return results
+
+
+def report(result:dict, errors:list, warnings:list) -> str:
+    lines = [f"wrote {result['manifest']}", f"  {'frozen module':<44}{'src B':>8}{'mpy B':>8}"]
+    for module in result["modules"]:
+        bytecode = "-" if module["bytecode_bytes"] is None else module["bytecode_bytes"]
+        lines.append(f"  {module['name']:<44}{module['source_bytes']:>8}{bytecode:>8}")
+
+    total = sum(module["bytecode_bytes"] or 0 for module in result["modules"])
+    lines.append(f"  {'sum':<44}{sum(module['source_bytes'] for module in result['modules']):>8}"
+                 f"{total if mpy_cross is not None else '-':>8}")
+    lines.append(f"about {total} bytes of heap are saved at import" if mpy_cross is not None else
+                 "install mpy-cross to report bytecode size, about the heap saved at import")
+    lines.append(f"copy to filesystem: {', '.join(result['fs'])}")
+
+    lines.extend(f"error: {message}" for message in errors)
+    lines.extend(f"warning: {message}" for message in warnings)
+    return "\n".join(lines)
+
+
+def main(argv:list|None = None) -> tuple:
+    parser = argparse.ArgumentParser(prog="python tools/freeze_program.py",
+                                     description="Generate a manifest.py to freeze program/ into firmware.")
+    parser.add_argument("-s", "--source", default=PROGRAM_DIR, help="program directory. Default is program/.")
+    parser.add_argument("-o", "--output", default="./build/frozen", help="output directory, removed first. "
+                                                                         "Default is ./build/frozen")
+    parser.add_argument("--opt", type=int, default=3, choices=[0, 1, 2, 3],
+                        help="As same as mpy-cross -O[N]. Default is 3.")
+    parser.add_argument("--char-sets", action="store_true", help="freeze char-set tables of HD44780_Driver too.")
+    parser.add_argument("--check", metavar="MANIFEST", help="only check a manifest against the import graph.")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        errors, warnings = check(args.check, args.source)
+        print("\n".join([f"error: {message}" for message in errors] +
+                        [f"warning: {message}" for message in warnings] or ["consistent"]))
+        result = None
+    else:
+        result = freeze(args.source, args.output, args.opt, args.char_sets)
+        errors, warnings = check(result["manifest"], args.source, result["fs_dir"])
+        print(report(result, errors, warnings))
+
+    if errors:
+        sys.exit(1)
+    return result, errors, warnings
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# Copyright (c) Gao Shibo. All rights reserved.
+# Licensed under the MIT License, see LICENSE in repo's root
+
+"""
+**Make an over-the-air update of a built tree, and serve it by HTTP**
+
+program/ota.py on the board downloads files listed in manifest.json chunk by chunk, verifying their size
+and SHA-256, then swaps them in at the next boot and rolls back if the new main.py doesn't upload in time.
+Run in the repo's root after tools/build_program.py:
+
+    python tools/ota_bundle.py build/program -o build/ota --serve 8000
+
+Then send the update command to a board by MQTT, its client id is in the discovery topic:
+
+    mosquitto_pub -h <MQTT_BROKER_IP> -q 1 -t micropy/<client id>/command \\
+        -m '{"id": 1, "update": "http://<this host>:8000/manifest.json"}'
+
+boot.py and ota.py run the rollback, so they're never updated over the air, and JSON files are settings
+of the board like config.json, so they're skipped too.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+MANIFEST_FILE = "manifest.json"
+
+SKIPPED = ("boot.py", "ota.py", "ota.mpy")
+"""**Files never updated over the air**, refused by ota.PROTECTED on the board"""
+
+_REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def is_bundled(path:str) -> bool:
+    """
+    :param path: relative path with "/".
+    :return: False for SKIPPED, JSON files, and hidden files or directories like .ota_new.
+    """
+    return path not in SKIPPED and not path.endswith(".json") and \
+        not any(part.startswith(".") or part == "__pycache__" for part in path.split("/"))
+
+
+def sha256_file(path:str, chunk_size:int = 65536) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def bundle(source_dir:str, output_dir:str, version:str) -> dict:
+    """
+    **Copy files of a tree to output_dir and write manifest.json of them**
+
+    :param source_dir: tree to deploy, like build/program or program/.
+    :param output_dir: removed first.
+    :param version: reported by the board after the update is kept.
+    :return: the manifest.
+    """
+    shutil.rmtree(output_dir, ignore_errors=True)
+    files = []
+
+    for directory, dirs, names in os.walk(source_dir):
+        dirs.sort()
+        for name in sorted(names):
+            source = os.path.join(directory, name)
+            path = os.path.relpath(source, source_dir).replace(os.sep, "/")
+            if not is_bundled(path): continue
+
+            output = os.path.join(output_dir, path)
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+            shutil.copyfile(source, output)
+            files.append({"path": path, "size": os.path.getsize(output), "sha256": sha256_file(output)})
+
+    manifest = {"version": version, "files": files}
+    with open(os.path.join(output_dir, MANIFEST_FILE), "w", encoding="UTF-8") as file:
+        json.dump(manifest, file, separators=(",", ":"))    # parsed on the board, read at most 4KB
+
+    return manifest
+
+
+def serve(directory:str, port:int = 8000, host:str = "") -> ThreadingHTTPServer:
+    """
+    **Create an HTTP server of a bundle**, call serve_forever() of it.
+
+    :param port: 0 is any free port, see server_address of the server.
+    """
+    class QuietHandler(SimpleHTTPRequestHandler):
+        def log_message(self, format:str, *args) -> None:
+            pass
+
+    return ThreadingHTTPServer((host, port), partial(QuietHandler, directory=directory))
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=_REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main(argv:list|None = None) -> dict:
+    parser = argparse.ArgumentParser(prog="python tools/ota_bundle.py",
+                                     description="Make an over-the-air update of a built tree.")
+    parser.add_argument("source", nargs="?", default="./build/program", help="tree to deploy. Default is "
+                                                                              "./build/program")
+    parser.add_argument("-o", "--output", default="./build/ota", help="output directory, removed first. "
+                                                                      "Default is ./build/ota")
+    parser.add_argument("--version", help="version reported by the board. Default is the git commit.")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="serve the bundle by HTTP until Ctrl+C.")
+    args = parser.parse_args(argv)
+
+    manifest = bundle(args.source, args.output, args.version or _commit())
+    for entry in manifest["files"]:
+        print(f"  {entry['path']:<48}{entry['size']:>8} B  {entry['sha256'][:16]}")
+    print(f"version {manifest['version']}, {len(manifest['files'])} files, "
+          f"{sum(entry['size'] for entry in manifest['files'])} B")
+
+    if args.serve is not None:
+        server = serve(args.output, args.serve)
+        print(f"serving http://<this host>:{args.serve}/{MANIFEST_FILE}, Ctrl+C to stop")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+    return manifest
+
+
+if __name__ == "__main__":
+    main()